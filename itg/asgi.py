@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'itg.settings')
+# под ASGI подключаем асинхронные версии читающих представлений (news/async_views.py)
+os.environ.setdefault('NEWS_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
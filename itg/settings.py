@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,12 +46,15 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
 
     'django_extensions',
-    'debug_toolbar',
 
     'news',
 ]
 
 MIDDLEWARE = [
+    # первым, чтобы время total в Server-Timing включало остальные middleware
+    'news.metrics.RequestMetricsMiddleware',
+    # до всех, кто может читать из БД: включает чтение с реплик для запроса (news/db_router.py)
+    'news.db_router.ReplicaStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,17 +62,25 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# debug_toolbar только для разработки: в продакшене метрики запросов даёт news.metrics
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'itg.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, который засекает время рендера для news.metrics
+        'BACKEND': 'news.metrics.TimedDjangoTemplates',
         'DIRS': [
             BASE_DIR / 'templates'
         ],
+        # без явного 'loaders' Django оборачивает загрузчики в django.template.loaders.cached.Loader
+        # и при DEBUG = False, и при DEBUG = True (изменения шаблонов подхватывает автоперезагрузка),
+        # поэтому список загрузчиков не задаём: с APP_DIRS он всё равно несовместим
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -76,6 +88,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'news.context_processors.navigation',
             ],
         },
     },
@@ -98,6 +111,18 @@ DATABASES = {
     }
 }
 
+# Реплики PostgreSQL только для чтения: хосты через запятую, например NEWS_DB_REPLICA_HOSTS=db-replica-1,db-replica-2.
+# Чтение статей, категорий и тегов идёт на реплики, запись — в default (news/db_router.py)
+for number, host in enumerate(filter(None, os.environ.get('NEWS_DB_REPLICA_HOSTS', '').split(',')), start=1):
+    # в тестах реплика смотрит в тестовую базу default, отдельная база для неё не создаётся
+    DATABASES[f'replica{number}'] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+NEWS_DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['news.db_router.PrimaryReplicaRouter']
+# сколько секунд после записи браузер читает из основной базы (больше типичного отставания реплики)
+NEWS_REPLICA_STICKY_SECONDS = 5
+# через сколько секунд снова пробовать реплику, к которой не удалось подключиться
+NEWS_REPLICA_RETRY_INTERVAL = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -140,6 +165,94 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Кэш
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# LocMemCache живёт внутри процесса; чтобы кэш был общим для всех воркеров без внешних сервисов,
+# можно использовать файловый бэкенд:
+# 'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': BASE_DIR / 'cache'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Кэш страниц каталога (news/page_cache.py)
+NEWS_PAGE_CACHE = 'default'
+# сколько секунд страница может жить в кэше (просмотры и лайки на ней обновятся не позже)
+NEWS_PAGE_CACHE_TIMEOUT = 300
+
+# Кэш карточек статей в списках (news/fragment_cache.py). Карточки версионируются метками page_cache,
+# поэтому могут жить долго: устаревшая версия просто перестаёт читаться
+NEWS_CARD_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Отложенный счётчик просмотров (news/view_counter.py)
+# кэш, в котором копятся просмотры; для нескольких воркеров нужен общий кэш
+# (manage.py check --deploy предупреждает, если это LocMemCache)
+VIEW_COUNTER_CACHE = 'default'
+# раз во сколько секунд накопленные просмотры записываются в БД
+VIEW_COUNTER_FLUSH_INTERVAL = 30
+
+# Навигация для всех страниц (news/navigation.py): сколько секунд меню, категории и счётчики
+# живут в памяти процесса, если их раньше не сбросил page_cache.purge('sidebar').
+# purge сбрасывает навигацию только в своём процессе: остальные воркеры показывают старые
+# категории и облако тегов, пока не истечёт этот таймаут
+NEWS_NAVIGATION_TIMEOUT = 60
+# сколько самых популярных тегов показывать в облаке тегов (news/tag_cloud.py)
+NEWS_TAG_CLOUD_SIZE = 30
+
+# Рейтинг «в тренде» (news/trending.py), пересчитывается командой refresh_trending — например, раз в 5 минут по cron.
+# за сколько часов вес просмотра, лайка или добавления в избранное уменьшается вдвое
+NEWS_TRENDING_HALF_LIFE_HOURS = 24
+# вес одного просмотра, лайка и добавления в избранное
+NEWS_TRENDING_WEIGHTS = {'views': 1, 'likes': 10, 'favorites': 20}
+
+# Похожие новости на детальной странице (news/related.py); таблица пересчитывается командой build_related_articles
+# (например, раз в сутки) и обновляется при сохранении статьи
+NEWS_RELATED_COUNT = 5
+# доля сходства по тегам, остальное — сходство заголовка и текста
+NEWS_RELATED_TAG_WEIGHT = 0.5
+# кэш со статистикой слов последнего полного пересчёта; чтобы её видели веб-процессы, нужен общий кэш
+NEWS_RELATED_CACHE = 'default'
+# пересчитывать похожие после сохранения статьи; False — только командой build_related_articles
+# (например, при массовом импорте или частой правке текстов)
+NEWS_RELATED_UPDATE_ON_SAVE = True
+
+# Список статей в админке для больших таблиц (news/large_changelist.py): с какого числа строк в Articles
+# (по статистике БД) включаются оценка количества, курсорная пагинация, иерархия дат по ArticleMonths
+# и полнотекстовый поиск
+NEWS_ADMIN_LARGE_TABLE_ROWS = 200_000
+# не PostgreSQL: количество статей с фильтрами считается не дальше этого числа строк
+NEWS_ADMIN_COUNT_LIMIT = 10_000
+
+# Метрики запросов (news/metrics.py): заголовок Server-Timing и бюджет SQL-запросов на представление.
+# Превышение бюджета пишется в лог news.metrics с уровнем WARNING
+NEWS_SERVER_TIMING = True
+NEWS_QUERY_BUDGET = 15
+NEWS_QUERY_BUDGETS = {
+    'index': 5,
+    'about': 5,
+    'news:catalog': 9,
+    'news:detail_article_by_id': 10,
+    'news:detail_article_by_title': 10,
+    'news:search_news': 9,
+    'news:favorites': 9,
+    'news:api_articles': 3,
+    'news:api_article': 3,
+    'news:api_category_articles': 3,
+    'news:api_tag_articles': 3,
+    'news:api_search': 4,
+}
+
+# JSON API (news/api.py): кэш готовых ответов и сколько секунд ответ может жить в нём
+# (просмотры и лайки в ответе обновятся не позже)
+NEWS_API_CACHE = 'default'
+NEWS_API_CACHE_TIMEOUT = 60
+
+# Асинхронные версии каталога, детальной страницы, поиска и избранного (news/async_views.py).
+# itg/asgi.py включает их через переменную окружения, под WSGI остаются синхронные представления
+NEWS_ASYNC_VIEWS = os.environ.get('NEWS_ASYNC_VIEWS') == '1'
+
 
 JAZZMIN_SETTINGS = {
     "site_title": "Info to Go Admin",  # Заголовок административной панели
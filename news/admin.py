@@ -1,8 +1,13 @@
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.html import format_html
 from django.contrib.admin import SimpleListFilter
+from django.contrib.admin.views.main import ChangeList
 
-from .models import Article, Category, Tag
+from . import content_flags, large_changelist, page_cache, related
+from .models import Article, Category, ContentFlag, Tag
+from .pagination import KeysetPaginator
+from .search import get_search_backend
 
 
 admin.site.site_header = "Админка Info to Go"
@@ -10,6 +15,30 @@ admin.site.site_title = "Админка"
 admin.site.index_title = "Привет админ! Не сломай ничего."
 
 
+# курсор страницы в режиме большой таблицы (KeysetPaginator), не фильтр списка
+CURSOR_PARAMS = ('after', 'before')
+
+
+def _is_large_table(request):
+    """Режим большой таблицы для списка статей (news/large_changelist.py), проверяется раз на запрос"""
+    if not hasattr(request, '_large_table'):
+        request._large_table = large_changelist.is_large_table(Article)
+    return request._large_table
+
+
+def _get_flags(request):
+    """Ключевые слова админки {id: ContentFlag}, один запрос на запрос к админке: их читают фильтры и колонка"""
+    if not hasattr(request, '_content_flags'):
+        request._content_flags = {flag.pk: flag for flag in ContentFlag.objects.all()}
+    return request._content_flags
+
+
+def _get_spiders_flag(request):
+    return next(
+        (flag for flag in _get_flags(request).values() if flag.keyword == content_flags.SPIDERS_KEYWORD), None,
+    )
+
+
 class ArticleSpiderFilter(SimpleListFilter):
     title = 'Внутри пауки'
     parameter_name = 'has_spiders'
@@ -21,18 +50,103 @@ class ArticleSpiderFilter(SimpleListFilter):
         )
 
     def queryset(self, request, queryset):
-        if self.value() == 'yes':
-            return queryset.filter(content__contains='пауки')
-        if self.value() == 'no':
-            return queryset.exclude(content__contains='пауки')
+        if self.value() in ('yes', 'no'):
+            return content_flags.filter_flagged(
+                queryset, _get_spiders_flag(request), present=self.value() == 'yes',
+                keyword=content_flags.SPIDERS_KEYWORD,
+            )
         return queryset
 
 
+class ContentFlagFilter(SimpleListFilter):
+    # ключевые слова, которые заводит админ (news/content_flags.py)
+    title = 'Ключевое слово'
+    parameter_name = 'content_flag'
+
+    def lookups(self, request, model_admin):
+        return [(str(pk), flag.name) for pk, flag in _get_flags(request).items()]
+
+    def queryset(self, request, queryset):
+        flag = _get_flags(request).get(int(self.value())) if (self.value() or '').isdigit() else None
+        if flag is not None:
+            return content_flags.filter_flagged(queryset, flag)
+        return queryset
+
+
+class ArticleChangeList(ChangeList):
+    def __init__(self, request, *args, **kwargs):
+        self.large_table = _is_large_table(request)
+        self.keyset_page = None
+        self.result_count_label = None
+        super().__init__(request, *args, **kwargs)
+        # иначе курсор попадёт в скрытые поля формы поиска и фильтров
+        for name in CURSOR_PARAMS:
+            self.params.pop(name, None)
+            self.filter_params.pop(name, None)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        for name in CURSOR_PARAMS:
+            lookup_params.pop(name, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # ссылки фильтров, иерархии дат и сортировки ведут на первую страницу
+        return super().get_query_string(new_params, [*(remove or ()), *CURSOR_PARAMS])
+
+    def get_results(self, request):
+        if self.large_table:
+            self._get_keyset_results(request)
+        else:
+            super().get_results(request)
+        # колонка has_spiders: флаги только для статей страницы, одним запросом по индексу ArticleFlags
+        flag = _get_spiders_flag(request)
+        flagged = content_flags.flagged_ids(flag, [article.pk for article in self.result_list])
+        for article in self.result_list:
+            if flagged is None:
+                # совпадения ещё не посчитаны (или флаг удалён) — текст статьи уже загружен
+                article.has_spiders_flag = content_flags.SPIDERS_KEYWORD in article.content
+            else:
+                article.has_spiders_flag = article.pk in flagged
+
+    def _get_keyset_results(self, request):
+        """Страница по курсору и оценка количества вместо Paginator с двумя COUNT(*)"""
+        page = KeysetPaginator(self.queryset, 'publication_date', 'desc', per_page=self.list_per_page).get_page(request)
+        self.result_count, self.result_count_label = large_changelist.estimate_count(self.queryset)
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.result_list = page.object_list
+        self.can_show_all = False
+        self.multi_page = page.has_other_pages()
+        self.paginator = None
+        self.keyset_page = page
+
+
 class TagInline(admin.TabularInline):
     model = Article.tags.through
     extra = 1
 
 
+def _set_active(queryset, is_active):
+    """
+    update() не вызывает сигналы, поэтому то, что при сохранении статьи делают обработчики
+    из news/signals.py, делаем сами: счётчики категорий и тегов, кэш страниц и карточек,
+    updated_at для ETag/Last-Modified и похожие статьи
+    """
+    changed = list(queryset.exclude(is_active=is_active).values_list('pk', 'category_id'))
+    if not changed:
+        return
+    article_ids = [article_id for article_id, _ in changed]
+    category_ids = {category_id for _, category_id in changed}
+    tag_ids = set(Article.tags.through.objects.filter(article_id__in=article_ids).values_list('tag_id', flat=True))
+    Article.all_objects.filter(pk__in=article_ids).update(is_active=is_active, updated_at=timezone.now())
+    Category.objects.refresh_articles_count(category_ids)
+    Tag.objects.refresh_articles_count(tag_ids)
+    page_cache.purge_categories(category_ids, article_ids)
+    related.schedule_updates(article_ids)
+
+
 @admin.register(Article)
 class ArticleAdmin(admin.ModelAdmin):
     # list_display отображает поля в таблице
@@ -40,7 +154,7 @@ class ArticleAdmin(admin.ModelAdmin):
     # list_display_links позволяет указать в качестве ссылок на объект другие поля
     list_display_links = ('pk',)
     # list_filter позволяет фильтровать по полям
-    list_filter = ('category', 'is_active', 'status', ArticleSpiderFilter)
+    list_filter = ('category', 'is_active', 'status', ArticleSpiderFilter, ContentFlagFilter)
     # сортировка, возможна по нескольким полям, по возрастанию или по убыванию
     ordering = ('category', '-is_active')
     # search_fields позволяет искать по полям
@@ -70,17 +184,30 @@ class ArticleAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return Article.all_objects.get_queryset()
 
+    def get_changelist(self, request, **kwargs):
+        return ArticleChangeList
+
+    def get_sortable_by(self, request):
+        # большая таблица листается курсором по дате публикации, другие сортировки без индекса не нужны
+        return () if _is_large_table(request) else super().get_sortable_by(request)
+
+    def get_search_results(self, request, queryset, search_term):
+        if search_term and _is_large_table(request):
+            # полнотекстовый индекс вместо LIKE '%...%' по title и content на всю таблицу
+            return get_search_backend().filter(queryset, search_term), False
+        return super().get_search_results(request, queryset, search_term)
+
     @admin.display(description='Пауки внутри')
     def has_spiders(self, article):
-        return 'Да' if 'пауки' in article.content else 'Нет'
+        return 'Да' if article.has_spiders_flag else 'Нет'
 
     @admin.action(description='Сделать неактивными выбранные статьи')
     def make_inactive(modeladmin, request, queryset):
-        queryset.update(is_active=False)
+        _set_active(queryset, False)
 
     @admin.action(description='Сделать активными выбранные статьи')
     def make_active(modeladmin, request, queryset):
-        queryset.update(is_active=True)
+        _set_active(queryset, True)
 
     @admin.action(description='Отметить статьи как проверенные')
     def set_checked(self, request, queryset):
@@ -93,5 +220,23 @@ class ArticleAdmin(admin.ModelAdmin):
         self.message_user(request, f'{updated} статей было отмечено как не проверенные', 'warning')
 
 
+@admin.register(ContentFlag)
+class ContentFlagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'keyword', 'is_ready')
+
+    def get_readonly_fields(self, request, obj=None):
+        # совпадения посчитаны для этого слова; другое слово — другой флаг
+        return ('keyword',) if obj is not None else ()
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            self.message_user(
+                request, 'Совпадения для уже загруженных статей посчитает команда '
+                f'manage.py backfill_content_flags --flag {obj.pk}; до этого фильтр ищет слово в тексте статей.',
+                'warning',
+            )
+
+
 admin.site.register(Category)
 admin.site.register(Tag)
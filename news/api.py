@@ -0,0 +1,236 @@
+"""
+JSON API только для чтения: лента статей, статья, статьи категории и тега, поиск.
+
+Строки читаются через values() только с нужными колонками (?fields=id,title,...), поэтому полный
+текст загружается, только если запрошено поле content; для списков есть excerpt, который обрезает
+сама БД. Теги всей страницы приходят одним запросом. Ленты листаются курсором по publication_date
+(KeysetPaginator: ?after=/?before=, ?order=asc|desc, ?limit=), поиск — по номеру страницы.
+
+Готовое тело ответа хранится в кэше с версиями меток page_cache, как страницы каталога: его сбрасывают
+изменения статей, категорий и тегов, а просмотры и лайки в нём обновляются не реже NEWS_API_CACHE_TIMEOUT.
+У каждого ответа есть ETag (хэш тела) и Last-Modified (момент, когда тело в последний раз изменилось),
+поэтому повторный запрос с If-None-Match или If-Modified-Since получает 304 без тела и без запросов к БД.
+"""
+import hashlib
+import json
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.functions import Substr
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from . import page_cache
+from .models import Article, Category, Tag
+from .pagination import KeysetPaginator, paginate_by_number
+from .search import get_search_backend
+from .view_counter import register_view
+
+EXCERPT_LENGTH = 200
+MAX_LIMIT = 100
+# поле ответа -> колонки values(), которые для него нужны
+FIELDS = {
+    'id': ('id',),
+    'title': ('title',),
+    'slug': ('slug',),
+    'excerpt': ('excerpt',),
+    'content': ('content',),
+    'publication_date': ('publication_date',),
+    'updated_at': ('updated_at',),
+    'category': ('category_id', 'category__name'),
+    'tags': (),
+    'views': ('views',),
+    'like_count': ('like_count',),
+    'favorite_count': ('favorite_count',),
+    'url': (),
+}
+LIST_FIELDS = ('id', 'title', 'slug', 'excerpt', 'publication_date', 'category', 'tags',
+               'views', 'like_count', 'favorite_count', 'url')
+DETAIL_FIELDS = ('id', 'title', 'slug', 'content', 'publication_date', 'updated_at', 'category', 'tags',
+                 'views', 'like_count', 'favorite_count', 'url')
+# метки page_cache для списков: 'catalog' сбрасывается при любом изменении статей и их тегов,
+# 'sidebar' — при изменении категорий и тегов (их названия есть в ответе)
+FEED_TAGS = ('catalog', 'sidebar')
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _get_cache():
+    return caches[getattr(settings, 'NEWS_API_CACHE', 'default')]
+
+
+def _error_response(error):
+    return JsonResponse({'error': str(error)}, status=error.status, json_dumps_params={'ensure_ascii': False})
+
+
+def _parse_fields(request, default):
+    raw = request.GET.get('fields')
+    if not raw:
+        return default
+    fields = tuple(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in FIELDS]
+    if unknown or not fields:
+        raise ApiError(f'Неизвестные поля: {", ".join(unknown)}. Доступны: {", ".join(FIELDS)}')
+    return fields
+
+
+def _parse_limit(request):
+    try:
+        limit = int(request.GET.get('limit', 15))
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def _project(queryset, fields):
+    """values() только с колонками для полей ответа; id и publication_date нужны для курсора"""
+    columns = {'id', 'publication_date'}
+    for name in fields:
+        columns.update(FIELDS[name])
+    if 'excerpt' in columns:
+        queryset = queryset.annotate(excerpt=Substr('content', 1, EXCERPT_LENGTH))
+    return queryset.values(*columns)
+
+
+def _load_tags(article_ids):
+    """Теги всех статей страницы одним запросом: {id статьи: [{'id', 'name'}, ...]}"""
+    tags = {}
+    links = (
+        Article.tags.through.objects.filter(article_id__in=article_ids)
+        .order_by('tag__name')
+        .values_list('article_id', 'tag_id', 'tag__name')
+    )
+    for article_id, tag_id, name in links:
+        tags.setdefault(article_id, []).append({'id': tag_id, 'name': name})
+    return tags
+
+
+def _serialize(rows, fields):
+    tags = _load_tags([row['id'] for row in rows]) if 'tags' in fields else {}
+    results = []
+    for row in rows:
+        item = {}
+        for name in fields:
+            if name == 'category':
+                item[name] = {'id': row['category_id'], 'name': row['category__name']}
+            elif name == 'tags':
+                item[name] = tags.get(row['id'], [])
+            elif name == 'url':
+                item[name] = reverse('news:detail_article_by_id', args=[row['id']])
+            else:
+                item[name] = row[name]
+        results.append(item)
+    return results
+
+
+def _json_response(request, tags, build_payload):
+    """
+    JSON из кэша, пока не изменились версии меток tags (page_cache), иначе собирается build_payload().
+    Ответ несёт ETag и Last-Modified; при совпадении валидаторов — 304 без тела.
+    """
+    cache = _get_cache()
+    key = f'news:api:entry:{hashlib.md5(request.get_full_path().encode()).hexdigest()}'
+    versions = page_cache.current_versions(tags)
+    entry = cache.get(key)
+    if entry is None or entry['versions'] != versions:
+        body = json.dumps(build_payload(), cls=DjangoJSONEncoder, ensure_ascii=False).encode()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        # тело не изменилось (например, сбросили метку из-за другой статьи) — Last-Modified остаётся прежним
+        last_modified = entry['last_modified'] if entry and entry['etag'] == etag else int(time.time())
+        entry = {'body': body, 'etag': etag, 'last_modified': last_modified, 'versions': versions}
+        cache.set(key, entry, timeout=getattr(settings, 'NEWS_API_CACHE_TIMEOUT', 60))
+
+    response = get_conditional_response(request, etag=entry['etag'], last_modified=entry['last_modified'])
+    if response is None:
+        response = HttpResponse(entry['body'], content_type='application/json; charset=utf-8')
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    return response
+
+
+def _page_payload(request, page, fields):
+    return {
+        'results': _serialize(page.object_list, fields),
+        'next': f'{request.path}?{page.next_query}' if page.has_next() else None,
+        'previous': f'{request.path}?{page.previous_query}' if page.has_previous() else None,
+    }
+
+
+def _article_feed(request, queryset, tags):
+    fields = _parse_fields(request, LIST_FIELDS)
+    order = 'asc' if request.GET.get('order') == 'asc' else 'desc'
+    paginator = KeysetPaginator(_project(queryset, fields), 'publication_date', order, per_page=_parse_limit(request))
+    return _json_response(request, tags, lambda: _page_payload(request, paginator.get_page(request), fields))
+
+
+def _api_view(view):
+    """Только GET/HEAD; ApiError превращается в JSON с описанием ошибки"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return _error_response(error)
+    return require_safe(wrapper)
+
+
+@_api_view
+def article_list(request):
+    """Лента активных статей: /news/api/articles/?fields=&order=&limit=&after=&before="""
+    return _article_feed(request, Article.objects.all(), FEED_TAGS)
+
+
+@_api_view
+def category_articles(request, category_id):
+    if not Category.objects.filter(pk=category_id).exists():
+        raise ApiError('Категория не найдена', status=404)
+    return _article_feed(request, Article.objects.filter(category_id=category_id), FEED_TAGS)
+
+
+@_api_view
+def tag_articles(request, tag_id):
+    if not Tag.objects.filter(pk=tag_id).exists():
+        raise ApiError('Тег не найден', status=404)
+    return _article_feed(request, Article.objects.filter(tags=tag_id), FEED_TAGS)
+
+
+@_api_view
+def article_detail(request, article_id):
+    """Статья целиком (по умолчанию с полным текстом); просмотр учитывается, как на HTML-странице"""
+    fields = _parse_fields(request, DETAIL_FIELDS)
+
+    def build_payload():
+        rows = list(_project(Article.objects.filter(pk=article_id), fields))
+        if not rows:
+            raise ApiError('Статья не найдена', status=404)
+        return _serialize(rows, fields)[0]
+
+    response = _json_response(request, (f'card:article:{article_id}', 'sidebar'), build_payload)
+    register_view(article_id)
+    return response
+
+
+@_api_view
+def search(request):
+    """Поиск по релевантности: /news/api/search/?q=&fields=&page=&limit="""
+    query = request.GET.get('q', '').strip()
+    if not query:
+        raise ApiError('Не задан поисковый запрос q')
+    fields = _parse_fields(request, LIST_FIELDS)
+    limit = _parse_limit(request)
+
+    def build_payload():
+        results = get_search_backend().search(_project(Article.objects.all(), fields), query)
+        return _page_payload(request, paginate_by_number(request, results, per_page=limit), fields)
+
+    return _json_response(request, FEED_TAGS, build_payload)
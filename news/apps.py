@@ -6,3 +6,7 @@ class NewsConfig(AppConfig):
     name = 'news'
     verbose_name = 'Новость'
     verbose_name_plural = 'Новости'
+
+    def ready(self):
+        # подключаем обработчики сигналов (счётчики статей в категориях и т.д.)
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,126 @@
+"""
+Асинхронные версии «читающих» представлений для запуска под ASGI (uvicorn, daphne).
+
+Данные читаются через асинхронный ORM (aget, async for), поэтому, пока база отвечает, поток
+воркера свободен и event loop обслуживает другие запросы. Синхронные представления из views.py
+остаются для WSGI; какие из них подключать, решает настройка NEWS_ASYNC_VIEWS (см. news/urls.py).
+Логика и контекст шаблонов у обеих версий одинаковые.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.shortcuts import render
+
+from .conditional import anot_modified, is_conditional, set_validators
+from .models import Article
+from .navigation import get_navigation
+from .page_cache import cache_page_with_tags, depends_on_articles
+from .pagination import KeysetPaginator, apaginate_by_number, get_sort_params
+from .related import arelated_articles
+from .search import get_search_backend
+from .trending import depends_on_sort
+from .view_counter import register_view
+from .visitor_state import VisitorState
+
+
+async def _aload_navigation(request):
+    # контекстный процессор навигации может сходить в БД на холодном кэше, а в async-контексте
+    # шаблон этого сделать не может: загружаем навигацию заранее, процессор возьмёт её с request
+    await sync_to_async(get_navigation)(request)
+
+
+async def _aget_article_or_404(**lookup):
+    # в шаблоне детальной страницы выводятся категория и теги, загружаем их сразу:
+    # ленивый запрос из шаблона в async-контексте запрещён
+    queryset = Article.objects.select_related('category').prefetch_related('tags')
+    try:
+        return await queryset.aget(**lookup)
+    except Article.DoesNotExist:
+        raise Http404('Статья не найдена')
+
+
+@cache_page_with_tags('catalog', 'sidebar')
+async def get_all_news(request):
+    """Асинхронная версия views.get_all_news"""
+    sort, order = get_sort_params(request)
+    await sync_to_async(depends_on_sort)(request, sort)
+
+    articles = Article.objects.select_related('category').prefetch_related('tags')
+    paginated_news = await KeysetPaginator(articles, sort, order).aget_page(request)
+    # версии меток лежат в кэше, а его бэкенд может ходить по сети
+    await sync_to_async(depends_on_articles)(request, paginated_news)
+    await _aload_navigation(request)
+    context = {'news': paginated_news,
+               'visitor_state': await VisitorState.aload(request.META.get('REMOTE_ADDR'), paginated_news),
+               'user_ip': request.META.get('REMOTE_ADDR'),
+               }
+    return render(request, 'news/catalog.html', context=context)
+
+
+async def get_detail_article_by_id(request, article_id):
+    """Асинхронная версия views.get_detail_article_by_id"""
+    if is_conditional(request):
+        response = await anot_modified(request, id=article_id)
+        if response is not None:
+            await sync_to_async(register_view)(article_id)
+            return response
+    article = await _aget_article_or_404(id=article_id)
+    await sync_to_async(register_view)(article.pk)
+    await _aload_navigation(request)
+    context = {'article': article,
+               'related_articles': await arelated_articles(article.pk),
+               'visitor_state': await VisitorState.aload(request.META.get('REMOTE_ADDR'), [article]),
+               'user_ip': request.META.get('REMOTE_ADDR'), }
+    response = render(request, 'news/article_detail.html', context=context)
+    return set_validators(response, article.pk, article.updated_at)
+
+
+async def get_detail_article_by_title(request, title):
+    """Асинхронная версия views.get_detail_article_by_title"""
+    if is_conditional(request):
+        response = await anot_modified(request, slug=title)
+        if response is not None:
+            return response
+    article = await _aget_article_or_404(slug=title)
+
+    await _aload_navigation(request)
+    context = {'article': article,
+               'related_articles': await arelated_articles(article.pk),
+               'visitor_state': await VisitorState.aload(request.META.get('REMOTE_ADDR'), [article]),
+               'user_ip': request.META.get('REMOTE_ADDR'), }
+    response = render(request, 'news/article_detail.html', context=context)
+    return set_validators(response, article.pk, article.updated_at)
+
+
+async def search_news(request):
+    """Асинхронная версия views.search_news"""
+    query = request.GET.get('q')
+    articles = Article.objects.select_related('category').prefetch_related('tags')
+
+    if query:
+        # индекс в памяти ранжирует результаты на CPU и при первом поиске строится из БД — уносим это в поток
+        articles = await sync_to_async(get_search_backend().search)(articles, query)
+    else:
+        articles = articles.order_by('-publication_date', '-id')
+    paginated_news = await apaginate_by_number(request, articles)
+    await _aload_navigation(request)
+    context = {
+        'news': paginated_news,
+        'query': query,
+        'visitor_state': await VisitorState.aload(request.META.get('REMOTE_ADDR'), paginated_news),
+        'user_ip': request.META.get('REMOTE_ADDR'),
+    }
+    return render(request, 'news/catalog.html', context=context)
+
+
+async def favorites(request):
+    """Асинхронная версия views.favorites"""
+    ip_address = request.META.get('REMOTE_ADDR')
+    favorite_articles = [
+        article async for article in
+        Article.objects.filter(favorites__ip_address=ip_address).select_related('category').prefetch_related('tags')
+    ]
+    await _aload_navigation(request)
+    context = {'news': favorite_articles, 'news_count': len(favorite_articles),
+               'visitor_state': await VisitorState.aload(ip_address, favorite_articles),
+               'user_ip': ip_address, }
+    return render(request, 'news/catalog.html', context=context)
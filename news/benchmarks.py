@@ -0,0 +1,116 @@
+"""
+Общие части бенчмарков: слова для синтетических текстов, HTTP-нагрузка и статистика задержек.
+
+Используются командами benchmark_views (полный прогон с JSON-отчётом для сравнения коммитов),
+load_test (только HTTP-нагрузка на запущенный сервер) и benchmark_search.
+"""
+import math
+import re
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+WORDS = (
+    'кошки собаки учёные город новости спорт политика экономика погода пауки технологии '
+    'компьютер интернет музыка кино театр выставка президент правительство рынок акции '
+    'футбол хоккей чемпионат победа поражение открытие исследование космос ракета планета '
+    'говорить научились вчера сегодня завтра неожиданно впервые снова жители района'
+).split()
+
+SERVER_TIMING_QUERIES_RE = re.compile(r'db;[^,]*desc="(\d+) queries"')
+SERVER_TIMING_TEMPLATES_RE = re.compile(r'tpl;dur=([\d.]+)')
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга; values должны быть отсортированы"""
+    if not values:
+        return 0.0
+    index = max(math.ceil(percent / 100 * len(values)) - 1, 0)
+    return values[index]
+
+
+def summarize(latencies, wall, errors=0, queries=(), template_times=()):
+    """Сводка по прогону: задержки в мс, запросов в секунду, SQL-запросы и время рендера шаблонов на ответ"""
+    latencies = sorted(latencies)
+    queries = sorted(queries)
+    template_times = sorted(template_times)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': len(latencies) / wall if wall else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        'queries_p50': percentile(queries, 50) if queries else None,
+        'queries_max': queries[-1] if queries else None,
+        'template_p50_ms': percentile(template_times, 50) * 1000 if template_times else None,
+        'template_p95_ms': percentile(template_times, 95) * 1000 if template_times else None,
+    }
+
+
+def queries_from_server_timing(header):
+    """Количество SQL-запросов из заголовка Server-Timing (см. news/metrics.py)"""
+    match = SERVER_TIMING_QUERIES_RE.search(header or '')
+    return int(match.group(1)) if match else None
+
+
+def template_ms_from_server_timing(header):
+    """Время рендера шаблонов в мс из заголовка Server-Timing"""
+    match = SERVER_TIMING_TEMPLATES_RE.search(header or '')
+    return float(match.group(1)) if match else None
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def http_load(url, concurrency, requests, timeout=30, follow_redirects=True):
+    """Отправляет requests GET-запросов на url из concurrency потоков одновременно"""
+    latencies = []
+    queries = []
+    template_times = []
+    errors = 0
+    lock = threading.Lock()
+    # кириллица в пути и параметрах должна уйти в запрос в percent-encoding
+    url = urllib.parse.quote(url, safe=':/?&=%')
+    opener = urllib.request.build_opener() if follow_redirects else urllib.request.build_opener(_NoRedirect)
+
+    def fetch(_):
+        nonlocal errors
+        started = time.perf_counter()
+        server_timing = None
+        try:
+            with opener.open(url, timeout=timeout) as response:
+                response.read()
+                server_timing = response.headers.get('Server-Timing')
+            ok = True
+        except urllib.error.HTTPError as error:
+            # без перехода по редиректу 302 приходит как HTTPError, но это успешный ответ
+            ok = 300 <= error.code < 400
+            server_timing = error.headers.get('Server-Timing')
+        except (urllib.error.URLError, OSError):
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+                query_count = queries_from_server_timing(server_timing)
+                if query_count is not None:
+                    queries.append(query_count)
+                template_ms = template_ms_from_server_timing(server_timing)
+                if template_ms is not None:
+                    template_times.append(template_ms / 1000)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(fetch, range(requests)))
+    return summarize(latencies, time.perf_counter() - started, errors, queries, template_times)
+
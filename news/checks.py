@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# бэкенды, у которых своё содержимое в каждом процессе (или его нет вовсе)
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_view_counter_cache(app_configs, **kwargs):
+    """Буфер просмотров (news/view_counter.py) должен быть общим для всех воркеров"""
+    alias = getattr(settings, 'VIEW_COUNTER_CACHE', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        f'Кэш VIEW_COUNTER_CACHE ({alias!r}) использует {backend}: у каждого воркера свой буфер просмотров, '
+        'команда flush_view_counts видит только свой процесс, а при перезапуске несброшенные просмотры теряются.',
+        hint='Укажите в VIEW_COUNTER_CACHE общий кэш: memcached, redis, FileBasedCache или DatabaseCache.',
+        id='news.W001',
+    )]
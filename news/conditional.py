@@ -0,0 +1,60 @@
+"""
+Условные GET-запросы к детальной странице статьи.
+
+Ответ несёт ETag и Last-Modified из Article.updated_at. Если браузер пришёл с If-None-Match
+или If-Modified-Since, сначала читается только (id, updated_at) по индексу первичного ключа
+или слага, и при совпадении отдаётся 304 без загрузки статьи, навигации и рендера шаблона.
+
+updated_at меняется при сохранении статьи, лайке, избранном и смене тегов — всём, что видно
+на странице, кроме счётчика просмотров: он копится в буфере (news/view_counter.py) и на 304
+не влияет, иначе повторных посещений популярных статей без полного рендера не было бы.
+Страница зависит от посетителя (отметки лайка и избранного), поэтому Cache-Control: private:
+общие прокси её не хранят, а браузер каждый раз переспрашивает сервер.
+"""
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import Article
+
+
+def is_conditional(request):
+    return 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META
+
+
+def _etag(pk, updated_at):
+    # слабый ETag: страницы одной версии статьи отличаются CSRF-токеном в формах
+    return f'W/"{pk}-{int(updated_at.timestamp() * 1_000_000)}"'
+
+
+def _not_modified(request, version):
+    if version is None:
+        return None
+    pk, updated_at = version
+    response = get_conditional_response(
+        request, etag=_etag(pk, updated_at), last_modified=int(updated_at.timestamp()),
+    )
+    if response is not None:
+        set_validators(response, pk, updated_at)
+    return response
+
+
+def not_modified(request, **lookup):
+    """
+    304, если версия активной статьи совпадает с валидаторами запроса, иначе None.
+    Стоит одного индексного запроса (id, updated_at).
+    """
+    version = Article.objects.filter(**lookup).values_list('pk', 'updated_at').first()
+    return _not_modified(request, version)
+
+
+async def anot_modified(request, **lookup):
+    """Асинхронный вариант not_modified для async views"""
+    version = await Article.objects.filter(**lookup).values_list('pk', 'updated_at').afirst()
+    return _not_modified(request, version)
+
+
+def set_validators(response, pk, updated_at):
+    response['ETag'] = _etag(pk, updated_at)
+    response['Last-Modified'] = http_date(int(updated_at.timestamp()))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
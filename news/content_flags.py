@@ -0,0 +1,104 @@
+"""
+Ключевые слова для списка статей в админке («Пауки внутри» и другие, которые заводит админ).
+
+Для каждого ContentFlag в таблице ArticleFlags хранятся статьи, в тексте которых есть его слово.
+Совпадения считаются при сохранении статьи (сигнал в news/signals.py) и при массовой загрузке
+(news/ingest.py), поэтому колонка и фильтр админки проверяют строку ArticleFlags по индексу,
+а не ищут подстроку в тексте каждой статьи (LIKE по всей таблице).
+
+Для нового флага совпадения по уже загруженным статьям заполняет команда backfill_content_flags;
+пока она не отработала (ContentFlag.is_ready), фильтр и колонка ищут слово прямо в тексте.
+Слово флага после создания не меняется: для другого слова заводится новый флаг.
+"""
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Article, ArticleFlag, ContentFlag
+
+SPIDERS_KEYWORD = 'пауки'
+CHUNK_SIZE = 1000
+
+
+def matching_flags(content, flags):
+    """id флагов из пар (id, слово), слово которых встречается в тексте"""
+    return [pk for pk, keyword in flags if keyword in content]
+
+
+def _load_flags():
+    return list(ContentFlag.objects.values_list('pk', 'keyword'))
+
+
+def update_article(article):
+    """Пересчитывает флаги одной статьи после сохранения"""
+    flags = _load_flags()
+    if not flags:
+        return
+    matched = matching_flags(article.content, flags)
+    ArticleFlag.objects.filter(article_id=article.pk).exclude(flag_id__in=matched).delete()
+    ArticleFlag.objects.bulk_create(
+        [ArticleFlag(article_id=article.pk, flag_id=flag_id) for flag_id in matched], ignore_conflicts=True,
+    )
+
+
+def flag_new_articles(articles):
+    """Флаги для только что вставленных статей (bulk_create не вызывает сигналы)"""
+    flags = _load_flags()
+    if not flags:
+        return
+    ArticleFlag.objects.bulk_create([
+        ArticleFlag(article_id=article.pk, flag_id=flag_id)
+        for article in articles for flag_id in matching_flags(article.content, flags)
+    ], ignore_conflicts=True)
+
+
+def backfill(flags=None, chunk_size=CHUNK_SIZE, log=None):
+    """
+    Пересчитывает совпадения флагов (по умолчанию всех) для всех статей пачками по chunk_size,
+    листая таблицу по первичному ключу, и отмечает флаги посчитанными. Возвращает число совпадений.
+    """
+    flags = list(ContentFlag.objects.all() if flags is None else flags)
+    if not flags:
+        return 0
+    pairs = [(flag.pk, flag.keyword) for flag in flags]
+    flag_ids = [pk for pk, _ in pairs]
+    last_pk, total, processed = 0, 0, 0
+    while True:
+        rows = list(
+            Article.all_objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'content')[:chunk_size]
+        )
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+        links = [
+            ArticleFlag(article_id=pk, flag_id=flag_id)
+            for pk, content in rows for flag_id in matching_flags(content, pairs)
+        ]
+        with transaction.atomic():
+            ArticleFlag.objects.filter(flag_id__in=flag_ids, article_id__gte=rows[0][0], article_id__lte=last_pk).delete()
+            ArticleFlag.objects.bulk_create(links, ignore_conflicts=True)
+        total += len(links)
+        processed += len(rows)
+        if log:
+            log(f'Статей: {processed}, совпадений: {total}')
+    ContentFlag.objects.filter(pk__in=flag_ids).update(is_ready=True)
+    return total
+
+
+def _condition(flag, keyword):
+    # пока флаг не посчитан (или его нет вовсе) — поиск подстроки в тексте
+    if flag is None or not flag.is_ready:
+        return Q(content__contains=keyword if flag is None else flag.keyword)
+    return Exists(ArticleFlag.objects.filter(article=OuterRef('pk'), flag=flag))
+
+
+def filter_flagged(queryset, flag, present=True, keyword=None):
+    """Статьи, в которых есть (present) или нет слова флага; keyword — слово на случай, если флага нет"""
+    condition = _condition(flag, keyword)
+    return queryset.filter(condition if present else ~condition)
+
+
+def flagged_ids(flag, article_ids):
+    """id статей из article_ids со словом флага или None, если совпадения ещё не посчитаны"""
+    if flag is None or not flag.is_ready:
+        return None
+    return set(ArticleFlag.objects.filter(flag=flag, article_id__in=article_ids).values_list('article_id', flat=True))
@@ -0,0 +1,10 @@
+from .navigation import get_navigation
+
+
+def navigation(request):
+    """Меню, категории с количеством статей, облако тегов, news_count и users_count для base.html и страниц сайта"""
+    match = getattr(request, 'resolver_match', None)
+    if match is not None and match.app_name == 'admin':
+        # шаблоны админки навигацию сайта не выводят
+        return {}
+    return get_navigation(request)
@@ -0,0 +1,225 @@
+"""
+Генератор синтетических новостей для нагрузочного тестирования (команда generate_news_data).
+
+Данные детерминированы: при одном и том же seed получаются те же статьи, теги, лайки и избранное
+(даты публикации отсчитываются от момента запуска, их порядок тоже повторяется).
+Популярность распределена по закону Ципфа — как в реальной базе, несколько категорий, тегов и статей
+собирают большую часть публикаций, просмотров и реакций, а остальные образуют длинный хвост.
+Статьи пишутся через news.ingest пачками bulk_create, лайки и избранное — прямым bulk_create.
+"""
+import bisect
+import itertools
+import random
+import re
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from functools import lru_cache
+
+import unidecode
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .ingest import ingest_articles
+from .models import Article, Favorite, Like
+from .trending import refresh_trending
+
+CATEGORY_NAMES = (
+    'Политика', 'Экономика', 'Общество', 'Происшествия', 'Спорт', 'Наука', 'Технологии', 'Культура',
+    'Здоровье', 'Образование', 'Путешествия', 'Авто', 'Недвижимость', 'Погода', 'Развлечения',
+)
+TAG_WORDS = (
+    'выборы', 'бюджет', 'налоги', 'рубль', 'нефть', 'биржа', 'стартапы', 'искусственный интеллект', 'космос',
+    'медицина', 'вакцины', 'школа', 'университеты', 'футбол', 'хоккей', 'теннис', 'олимпиада', 'кино', 'театр',
+    'музыка', 'выставки', 'книги', 'транспорт', 'метро', 'дороги', 'экология', 'климат', 'животные', 'пауки',
+    'кошки', 'собаки', 'туризм', 'рестораны', 'мода', 'смартфоны', 'интернет', 'кибербезопасность', 'энергетика',
+    'строительство', 'ипотека', 'пенсии', 'здравоохранение', 'армия', 'суд', 'полиция', 'пожары', 'наводнения',
+    'археология', 'физика', 'биология',
+)
+SUBJECTS = (
+    'Учёные', 'Жители города', 'Власти региона', 'Спортсмены', 'Эксперты', 'Депутаты', 'Студенты', 'Врачи',
+    'Инженеры', 'Музыканты', 'Туристы', 'Фермеры', 'Программисты', 'Археологи', 'Волонтёры', 'Пожарные',
+    'Кошки', 'Собаки', 'Пауки', 'Астрономы',
+)
+VERBS = (
+    'открыли', 'обнаружили', 'представили', 'обсудили', 'запустили', 'построили', 'раскритиковали',
+    'поддержали', 'выиграли', 'отменили', 'перенесли', 'объявили', 'исследовали', 'показали', 'организовали',
+    'нашли', 'предложили', 'проверили', 'научились понимать', 'сфотографировали',
+)
+OBJECTS = (
+    'новый проект', 'необычное явление', 'план развития', 'рекордный урожай', 'космический аппарат',
+    'выставку современного искусства', 'турнир по хоккею', 'реформу образования', 'мобильное приложение',
+    'древнее поселение', 'новую вакцину', 'маршрут для туристов', 'городской парк', 'фестиваль джаза',
+    'электрический автобус', 'редкий вид пауков', 'систему искусственного интеллекта', 'бюджет на следующий год',
+    'чемпионат по футболу', 'новую линию метро',
+)
+PLACES = (
+    'в Москве', 'в Санкт-Петербурге', 'в Казани', 'в Новосибирске', 'в Екатеринбурге', 'в Самаре',
+    'в Нижнем Новгороде', 'во Владивостоке', 'в Калининграде', 'в Сочи', 'в Рейкьявике', 'в Акурейри',
+    'в пригороде', 'в соседней области', 'на Урале', 'в Сибири',
+)
+TIMES = (
+    'вчера', 'сегодня', 'на этой неделе', 'в прошлом месяце', 'впервые за десять лет', 'неожиданно',
+    'накануне', 'в выходные',
+)
+COMMENTS = (
+    'Эксперты считают, что это только начало.',
+    'По словам организаторов, интерес превзошёл ожидания.',
+    'Местные жители отнеслись к новости с осторожностью.',
+    'Подробности обещают сообщить в ближайшее время.',
+    'Аналитики ожидают, что событие повлияет на рынок.',
+    'В социальных сетях новость вызвала оживлённое обсуждение.',
+    'Официальные лица пока воздерживаются от комментариев.',
+    'Ранее подобное наблюдалось лишь однажды.',
+)
+
+
+@dataclass
+class GenerationResult:
+    articles: int = 0
+    skipped: int = 0
+    likes: int = 0
+    favorites: int = 0
+    seconds: float = 0.0
+
+
+def zipf_cum_weights(count, exponent):
+    """Накопленные веса закона Ципфа для рангов 1..count — для random.choices(cum_weights=...)"""
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def _pick(rng, population, cum_weights):
+    """Один элемент по накопленным весам: бинарный поиск, как в random.choices, но без создания списка"""
+    return population[bisect.bisect(cum_weights, rng.random() * cum_weights[-1], 0, len(population) - 1)]
+
+
+def _phrases(rng):
+    return rng.choice(SUBJECTS), rng.choice(PLACES), rng.choice(TIMES), rng.choice(VERBS), rng.choice(OBJECTS)
+
+
+def _sentence(rng):
+    return ' '.join(_phrases(rng)) + '.'
+
+
+@lru_cache(maxsize=None)
+def _slug_part(phrase):
+    # транслитерация — самая дорогая часть подготовки статьи, а фраз в словаре всего около сотни
+    return slugify(unidecode.unidecode(phrase))
+
+
+def _category_names(count):
+    names = list(CATEGORY_NAMES[:count])
+    names += [f'{CATEGORY_NAMES[i % len(CATEGORY_NAMES)]} {i // len(CATEGORY_NAMES) + 1}'
+              for i in range(len(names), count)]
+    return names
+
+
+def _tag_names(count):
+    names = list(TAG_WORDS[:count])
+    names += [f'{TAG_WORDS[i % len(TAG_WORDS)]}-{i // len(TAG_WORDS) + 1}' for i in range(len(names), count)]
+    return names
+
+
+def visitor_ip(number):
+    return f'10.{number // 62500 % 250}.{number // 250 % 250}.{number % 250 + 1}'
+
+
+def generate_news_data(articles, seed=42, categories=15, tags=500, visitors=50_000, max_reactions=2000,
+                       favorite_ratio=0.3, inactive_ratio=0.05, days=3 * 365, exponent=1.1, batch_size=5000,
+                       log=None):
+    """
+    Создаёт articles статей и реакции visitors посетителей. Популярность категорий, тегов, статей
+    и активность посетителей распределены по Ципфу с показателем exponent: самый активный посетитель
+    ставит max_reactions лайков, следующие — всё меньше. Слаги статей содержат seed, articles и номер
+    статьи, поэтому повторный запуск с теми же параметрами пропускает уже созданные статьи
+    и не дублирует реакции.
+    """
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    now = timezone.now()
+    category_names = _category_names(categories)
+    tag_names = _tag_names(tags)
+    category_weights = zipf_cum_weights(len(category_names), exponent)
+    tag_weights = zipf_cum_weights(len(tag_names), exponent)
+    # ранг популярности статьи: от него зависят просмотры и вероятность лайка
+    ranks = list(range(1, articles + 1))
+    rng.shuffle(ranks)
+    result = GenerationResult()
+    # номер статьи в слаге: по нему статьи сопоставляются с рангами популярности
+    marker = f'-{seed}-{articles}-'
+    slug_length = Article._meta.get_field('slug').max_length
+    suffix_re = re.compile(rf'{marker}(\d+)$')
+
+    def rows():
+        for number, rank in enumerate(ranks):
+            phrases = _phrases(rng)
+            title = ' '.join(phrases)
+            content = ' '.join(
+                [_sentence(rng) for _ in range(rng.randint(2, 5))] + rng.sample(COMMENTS, k=rng.randint(1, 3))
+            )
+            suffix = f'{marker}{number}'
+            base_slug = '-'.join(map(_slug_part, phrases))[:slug_length - len(suffix)]
+            article_tags = {_pick(rng, tag_names, tag_weights) for _ in range(rng.randint(1, 5))}
+            yield {
+                'title': title,
+                'content': content,
+                'slug': base_slug.rstrip('-') + suffix,
+                'publication_date': now - timedelta(seconds=rng.randrange(days * 24 * 60 * 60)),
+                'views': int(100_000 / rank ** exponent) + rng.randrange(50),
+                'is_active': rng.random() >= inactive_ratio,
+                'category': _pick(rng, category_names, category_weights),
+                'tags': sorted(article_tags),
+            }
+            if log and number and number % 100_000 == 0:
+                log(f'  подготовлено статей: {number}')
+
+    ingest = ingest_articles(rows(), batch_size=batch_size)
+    result.articles, result.skipped = ingest.created, ingest.skipped
+    if log:
+        log(f'Статьи: создано {ingest.created}, пропущено {ingest.skipped} ({ingest.rows_per_second:.0f} статей/с)')
+
+    # статьи этого seed в порядке номера — тот же порядок, что у рангов популярности
+    article_ids = [None] * articles
+    for pk, slug in Article.all_objects.filter(slug__contains=marker).values_list('pk', 'slug').iterator():
+        match = suffix_re.search(slug)
+        if match and int(match.group(1)) < articles:
+            article_ids[int(match.group(1))] = pk
+    by_popularity = [pk for _, pk in sorted(zip(ranks, article_ids)) if pk is not None]
+    if not result.articles or not by_popularity:
+        # все статьи этого seed уже были в базе — реакции созданы прошлым запуском
+        result.seconds = time.perf_counter() - started
+        return result
+    article_weights = zipf_cum_weights(len(by_popularity), exponent)
+
+    likes, favorites = [], []
+    # ignore_conflicts пропускает реакции, оставшиеся от прошлого запуска, поэтому созданные
+    # считаются по разнице количества строк, а не по длине пачек
+    likes_before, favorites_before = Like.objects.count(), Favorite.objects.count()
+
+    def flush():
+        Like.objects.bulk_create(likes, batch_size=batch_size, ignore_conflicts=True)
+        Favorite.objects.bulk_create(favorites, batch_size=batch_size, ignore_conflicts=True)
+        likes.clear()
+        favorites.clear()
+
+    for visitor in range(visitors):
+        ip_address = visitor_ip(visitor)
+        reactions = max(1, min(int(max_reactions / (visitor + 1) ** exponent), len(by_popularity)))
+        liked = {_pick(rng, by_popularity, article_weights) for _ in range(reactions)}
+        for article_id in sorted(liked):
+            likes.append(Like(article_id=article_id, ip_address=ip_address))
+            if rng.random() < favorite_ratio:
+                favorites.append(Favorite(article_id=article_id, ip_address=ip_address))
+        if len(likes) >= batch_size:
+            flush()
+    flush()
+    result.likes = Like.objects.count() - likes_before
+    result.favorites = Favorite.objects.count() - favorites_before
+
+    Article.all_objects.refresh_reaction_counts()
+    # чтобы страница ?sort=trending сразу была заполнена
+    refresh_trending()
+    result.seconds = time.perf_counter() - started
+    if log:
+        log(f'Лайков: {result.likes}, в избранном: {result.favorites}')
+    return result
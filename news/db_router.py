@@ -0,0 +1,155 @@
+"""
+Чтение каталога с реплик, запись — в основную базу.
+
+PrimaryReplicaRouter отправляет чтение статей, категорий и тегов (и таблицы связей статей с тегами)
+на одну из реплик NEWS_DATABASE_REPLICAS, а всё остальное и любую запись — в 'default'.
+Лайки, избранное, сессии и пользователи всегда читаются из основной базы: они меняются
+по действиям посетителя, и отставание реплики было бы сразу заметно.
+
+Реплики используются только внутри HTTP-запроса (ReplicaStickinessMiddleware). Команды
+управления, миграции и фоновые задачи читают из основной базы, как и код внутри transaction.atomic.
+
+Read-your-writes: если запрос что-то записал (add_article, like_toggle, toggle_favorite, админка),
+middleware ставит cookie, и следующие NEWS_REPLICA_STICKY_SECONDS секунд запросы этого браузера
+читают из основной базы — посетитель сразу видит свой лайк или статью. Внутри самого запроса
+после записи чтение тоже идёт в основную базу. Cookie не подписана: подделав её, можно только
+заставить свои же запросы читать из основной базы.
+
+Если к реплике не удаётся подключиться, она исключается на NEWS_REPLICA_RETRY_INTERVAL секунд,
+а чтение идёт на другую реплику или в основную базу.
+"""
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger('news.db_router')
+
+REPLICATED_MODELS = {'news.article', 'news.category', 'news.tag', 'news.article_tags'}
+STICKY_COOKIE = 'news_primary_until'
+
+_current = ContextVar('news_db_router_state', default=None)
+_lock = threading.Lock()
+# псевдоним реплики -> time.monotonic(), до которого она считается недоступной
+_unavailable_until = {}
+
+
+class _RequestState:
+    __slots__ = ('pinned', 'wrote', 'replica')
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+
+def _get_replicas():
+    return getattr(settings, 'NEWS_DATABASE_REPLICAS', [])
+
+
+def _get_sticky_seconds():
+    return getattr(settings, 'NEWS_REPLICA_STICKY_SECONDS', 5)
+
+
+def _is_available(alias):
+    if _unavailable_until.get(alias, 0) > time.monotonic():
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError as error:
+        with _lock:
+            _unavailable_until[alias] = time.monotonic() + getattr(settings, 'NEWS_REPLICA_RETRY_INTERVAL', 30)
+        logger.warning('Реплика %s недоступна, читаем из основной базы: %s', alias, error)
+        return False
+    return True
+
+
+def _choose_replica():
+    """Случайная доступная реплика или основная база, если доступных нет"""
+    replicas = list(_get_replicas())
+    random.shuffle(replicas)
+    for alias in replicas:
+        if _is_available(alias):
+            return alias
+    return DEFAULT_DB_ALIAS
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower not in REPLICATED_MODELS:
+            return DEFAULT_DB_ALIAS
+        state = _current.get()
+        if state is None or state.pinned or state.wrote or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            # одна реплика на весь запрос: страница видит согласованный снимок данных
+            state.replica = _choose_replica()
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # на репликах те же данные, что и в основной базе
+        databases = {DEFAULT_DB_ALIAS, *_get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+def _finish(request, response, state):
+    if state.wrote:
+        seconds = _get_sticky_seconds()
+        response.set_cookie(
+            STICKY_COOKIE, str(int(time.time()) + seconds), max_age=seconds, httponly=True, samesite='Lax',
+        )
+    return response
+
+
+def _is_pinned(request):
+    try:
+        return int(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReplicaStickinessMiddleware:
+    """Включает чтение с реплик для запроса и закрепляет браузер за основной базой после записи"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = _RequestState(pinned=_is_pinned(request))
+        token = _current.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return _finish(request, response, state)
+
+    async def __acall__(self, request):
+        state = _RequestState(pinned=_is_pinned(request))
+        token = _current.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return _finish(request, response, state)
@@ -0,0 +1,95 @@
+"""
+Потоковая выгрузка статей в JSON Lines и CSV.
+
+В отличие от dumpdata, статьи читаются из БД порциями через iterator(chunk_size=...)
+и сразу отдаются строками генератора, поэтому расход памяти не зависит от размера таблицы.
+Используется командой export_articles и view export_articles (только для персонала).
+"""
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from .models import Article
+
+FORMATS = ('jsonl', 'csv')
+CONTENT_TYPES = {'jsonl': 'application/x-ndjson', 'csv': 'text/csv'}
+EXPORT_FIELDS = (
+    'id', 'title', 'slug', 'content', 'publication_date', 'views', 'like_count', 'favorite_count',
+    'is_active', 'status', 'category', 'tags',
+)
+CHUNK_SIZE = 2000
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_articles(category_id=None, date_from=None, date_to=None, is_active=None):
+    """
+    Статьи для выгрузки в порядке id. date_from и date_to — даты (включительно),
+    is_active=None выгружает и активные, и неактивные статьи.
+    """
+    queryset = Article.all_objects.select_related('category').prefetch_related('tags').order_by('pk')
+    if category_id is not None:
+        queryset = queryset.filter(category_id=category_id)
+    # диапазон по самому полю, а не publication_date__date, чтобы запрос мог идти по индексу
+    if date_from is not None:
+        queryset = queryset.filter(publication_date__gte=_start_of_day(date_from))
+    if date_to is not None:
+        queryset = queryset.filter(publication_date__lt=_start_of_day(date_to + timedelta(days=1)))
+    if is_active is not None:
+        queryset = queryset.filter(is_active=is_active)
+    return queryset
+
+
+def _article_row(article):
+    return {
+        'id': article.pk,
+        'title': article.title,
+        'slug': article.slug,
+        'content': article.content,
+        'publication_date': article.publication_date.isoformat(),
+        'views': article.views,
+        'like_count': article.like_count,
+        'favorite_count': article.favorite_count,
+        'is_active': article.is_active,
+        'status': int(article.status),
+        'category': article.category.name,
+        'tags': [tag.name for tag in article.tags.all()],
+    }
+
+
+def iter_rows(queryset, chunk_size=CHUNK_SIZE):
+    """Словари статей; prefetch тегов выполняется отдельно для каждой порции"""
+    for article in queryset.iterator(chunk_size=chunk_size):
+        yield _article_row(article)
+
+
+def iter_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    """Файлоподобный объект для csv.writer: возвращает записанную строку вместо буферизации"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        row['tags'] = ','.join(row['tags'])
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+
+
+def export_lines(queryset, export_format, chunk_size=CHUNK_SIZE):
+    """Строки выгрузки в формате jsonl или csv"""
+    rows = iter_rows(queryset, chunk_size=chunk_size)
+    if export_format == 'csv':
+        return iter_csv(rows)
+    return iter_jsonl(rows)
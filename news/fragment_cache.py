@@ -0,0 +1,72 @@
+"""
+Кэш HTML-фрагментов карточек статей в списках новостей (include/article_card.html).
+
+Заголовок, начало текста, категория, теги и дата в карточке одинаковы на всех страницах
+(каталог, категория, тег, поиск, избранное) и у всех посетителей, поэтому карточка рендерится
+один раз на версию статьи. Лайк, избранное, CSRF-токен и часто меняющиеся счётчики остаются
+в include/article_preview.html и рендерятся каждый раз.
+
+Версия карточки складывается из версий меток page_cache 'card:article:<id>', 'card:category:<id>'
+и 'card:tag:<id>'. Их сбрасывают сигналы при сохранении статьи, смене её тегов и изменении
+категории или тега (news/signals.py). Отдельные метки нужны, чтобы новая статья в категории
+или с тегом не сбрасывала карточки всех остальных статей. Для страницы версии и фрагменты
+читаются двумя запросами get_many, а отрендеренные заново фрагменты пишутся одним set_many.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import page_cache
+
+KEY_PREFIX = 'news:card'
+TEMPLATE_NAME = 'include/article_card.html'
+
+
+def _get_cache():
+    # тот же кэш, что у страниц: версии меток хранятся там
+    return caches[getattr(settings, 'NEWS_PAGE_CACHE', 'default')]
+
+
+def _get_timeout():
+    return getattr(settings, 'NEWS_CARD_CACHE_TIMEOUT', 24 * 60 * 60)
+
+
+def card_tags(article):
+    """Метки, от которых зависит карточка; теги статьи должны быть загружены prefetch_related"""
+    return [
+        f'card:article:{article.pk}',
+        f'card:category:{article.category_id}',
+        *(f'card:tag:{tag.pk}' for tag in article.tags.all()),
+    ]
+
+
+def _card_key(article, tags, versions):
+    raw = '|'.join(f'{tag}={versions[tag]}' for tag in tags)
+    return f'{KEY_PREFIX}:{article.pk}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def render_cards(articles):
+    """Пары (статья, HTML карточки) для списка статей: из кэша или отрендеренные заново"""
+    articles = list(articles)
+    if not articles:
+        return []
+    tags_by_article = [card_tags(article) for article in articles]
+    versions = page_cache.current_versions({tag for tags in tags_by_article for tag in tags})
+    keys = [_card_key(article, tags, versions) for article, tags in zip(articles, tags_by_article)]
+
+    cache = _get_cache()
+    cached = cache.get_many(keys)
+    missing = {}
+    cards = []
+    for article, key in zip(articles, keys):
+        html = cached.get(key)
+        if html is None:
+            html = missing[key] = render_to_string(TEMPLATE_NAME, {'article': article})
+        cards.append((article, mark_safe(html)))
+    if missing:
+        cache.set_many(missing, timeout=_get_timeout())
+    return cards
+
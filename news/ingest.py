@@ -0,0 +1,170 @@
+"""
+Массовая загрузка статей (фикстуры articles*.json, ночные фиды).
+
+В отличие от Article.save по одной статье, здесь всё делается пачками:
+слаги генерируются до вставки, статьи пишутся через bulk_create, категории и теги
+создаются/находятся одним запросом на пачку, связи с тегами вставляются прямо в промежуточную таблицу.
+Так как bulk_create не вызывает сигналы, после загрузки отдельно обновляются счётчики категорий,
+поисковый индекс, ключевые слова и месяцы публикаций для админки и кэш страниц.
+"""
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+from django.db import transaction
+
+from . import content_flags, large_changelist, page_cache
+from .models import Article, Category, Tag, generate_slug
+from .search import get_search_backend
+
+ARTICLE_FIELDS = ('title', 'content', 'publication_date', 'views', 'is_active', 'status', 'slug')
+
+
+@dataclass
+class IngestResult:
+    created: int = 0
+    skipped: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.created / self.seconds if self.seconds else 0.0
+
+
+def _resolve_categories(names):
+    """Возвращает {название: id}, создавая недостающие категории одним bulk_create"""
+    names = set(names)
+    if not names:
+        return {}
+    existing = {}
+    for pk, name in Category.objects.filter(name__in=names).order_by('pk').values_list('pk', 'name'):
+        # у категорий имя не уникально — берём самую раннюю
+        existing.setdefault(name, pk)
+    missing = [Category(name=name) for name in names - existing.keys()]
+    if missing:
+        Category.objects.bulk_create(missing)
+        existing.update(Category.objects.filter(name__in=[c.name for c in missing]).values_list('name', 'pk'))
+    return existing
+
+
+def _resolve_tags(names):
+    """Возвращает {название: id}; имя тега уникально, поэтому это upsert через ignore_conflicts"""
+    names = set(names)
+    if not names:
+        return {}
+    Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+    return dict(Tag.objects.filter(name__in=names).values_list('name', 'pk'))
+
+
+def _generate_slugs(articles, taken):
+    """
+    Слаги для статей без слага. Совпадение случайного слага с существующим или с другим слагом пачки
+    (taken) уронило бы весь bulk_create пачки, поэтому такие слаги генерируются заново.
+    """
+    pending = articles
+    while pending:
+        for article in pending:
+            article.slug = generate_slug(article.title)
+        existing = set(
+            Article.all_objects.filter(slug__in=[article.slug for article in pending]).values_list('slug', flat=True)
+        )
+        clashes = []
+        for article in pending:
+            if article.slug in existing or article.slug in taken:
+                clashes.append(article)
+            else:
+                taken.add(article.slug)
+        pending = clashes
+
+
+def _ingest_batch(rows, result, months):
+    """Загружает одну пачку; возвращает id затронутых категорий и тегов, месяцы публикаций добавляет в months"""
+    # статьи с уже существующим слагом считаем загруженными ранее (повторный запуск импорта),
+    # а повтор слага внутри пачки — дублем в фиде: остаётся первая строка
+    explicit_slugs = [row['slug'] for row in rows if row.get('slug')]
+    seen_slugs = set(Article.all_objects.filter(slug__in=explicit_slugs).values_list('slug', flat=True))
+    unique_rows = []
+    for row in rows:
+        slug = row.get('slug')
+        if slug in seen_slugs:
+            continue
+        if slug:
+            seen_slugs.add(slug)
+        unique_rows.append(row)
+    result.skipped += len(rows) - len(unique_rows)
+    rows = unique_rows
+    if not rows:
+        return set(), set()
+
+    category_ids = _resolve_categories(row['category'] for row in rows if row.get('category'))
+    tag_ids = _resolve_tags(name for row in rows for name in row.get('tags', ()))
+    default_category_id = Article._meta.get_field('category').get_default()
+
+    articles = []
+    for row in rows:
+        article = Article(**{field: row[field] for field in ARTICLE_FIELDS if row.get(field) is not None})
+        if row.get('category'):
+            article.category_id = category_ids[row['category']]
+        else:
+            article.category_id = row.get('category_id') or default_category_id
+        articles.append(article)
+    _generate_slugs([article for article in articles if not article.slug],
+                    {article.slug for article in articles if article.slug})
+
+    with transaction.atomic():
+        Article.all_objects.bulk_create(articles)
+        Through = Article.tags.through
+        Through.objects.bulk_create(
+            [
+                Through(article_id=article.pk, tag_id=tag_ids[name])
+                for article, row in zip(articles, rows)
+                for name in set(row.get('tags', ()))
+            ],
+            ignore_conflicts=True,
+        )
+        content_flags.flag_new_articles(articles)
+    # bulk_create не вызывает сигналы, поэтому индекс обновляем сами — по пачке за раз
+    get_search_backend().update_articles([article.pk for article in articles])
+    # дата публикации из фида может быть строкой, поэтому месяцы считает БД
+    months.update(large_changelist.month_counts([article.pk for article in articles]))
+
+    result.created += len(articles)
+    return {article.category_id for article in articles}, set(tag_ids.values())
+
+
+def ingest_articles(rows, batch_size=1000):
+    """
+    Загружает статьи из итерируемого набора словарей с ключами из ARTICLE_FIELDS, а также
+    category (название категории) или category_id и tags (список названий тегов).
+    Возвращает IngestResult с количеством созданных и пропущенных статей и скоростью загрузки.
+    """
+    result = IngestResult()
+    started = time.perf_counter()
+    touched_categories = set()
+    touched_tags = set()
+    months = Counter()
+
+    def flush(batch):
+        category_ids, tag_ids = _ingest_batch(batch, result, months)
+        touched_categories.update(category_ids)
+        touched_tags.update(tag_ids)
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    if result.created:
+        # счётчики категорий и тегов и кэш страниц обновляем один раз на всю загрузку
+        Category.objects.refresh_articles_count(touched_categories)
+        Tag.objects.refresh_articles_count(touched_tags)
+        large_changelist.add_months(months)
+        page_cache.purge_categories(touched_categories)
+        page_cache.purge(*(f'tag:{tag_id}' for tag_id in touched_tags))
+
+    result.seconds = time.perf_counter() - started
+    return result
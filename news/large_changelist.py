@@ -0,0 +1,186 @@
+"""
+Список статей в админке для очень больших таблиц.
+
+Когда в Articles не меньше NEWS_ADMIN_LARGE_TABLE_ROWS строк (по статистике БД), ArticleAdmin
+переходит в режим большой таблицы:
+
+- количество статей не считается через COUNT(*). Без фильтров оно берётся из статистики таблицы
+  (pg_class.reltuples в PostgreSQL, sqlite_stat1 в SQLite), с фильтрами — из оценки планировщика (EXPLAIN)
+  в PostgreSQL, а в остальных БД считается не дальше NEWS_ADMIN_COUNT_LIMIT строк. Общее количество
+  без фильтров (show_full_result_count) не считается вовсе;
+- страницы листаются курсором по (publication_date, id) через KeysetPaginator (news/pagination.py):
+  любая страница — один запрос по индексу articles_pub_date_idx, сортировка по колонкам отключена;
+- годы и месяцы в иерархии дат читаются из ArticleMonths, а не DISTINCT по всей таблице; дни выбранного
+  месяца — из самой таблицы, но только в пределах месяца. Месяцы не учитывают фильтры списка;
+- поиск идёт через полнотекстовый бэкенд (news/search.py) вместо LIKE по title и content.
+"""
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.db import DatabaseError, connections, router, transaction
+from django.db.models import Case, Count, F, Value, When
+from django.db.models.functions import Greatest, TruncMonth
+from django.utils import formats, timezone
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+from .models import Article, ArticleMonth
+
+# размер таблицы меняется медленно: проверка режима кэшируется на столько секунд
+LARGE_TABLE_CHECK_TIMEOUT = 600
+
+
+def _get_threshold():
+    return getattr(settings, 'NEWS_ADMIN_LARGE_TABLE_ROWS', 200_000)
+
+
+def _get_count_limit():
+    return getattr(settings, 'NEWS_ADMIN_COUNT_LIMIT', 10_000)
+
+
+def _format_number(number):
+    return f'{number:,}'.replace(',', ' ')
+
+
+def table_rows(model):
+    """Количество строк таблицы по статистике БД, без COUNT(*); None, если статистики ещё нет"""
+    connection = connections[router.db_for_read(model)]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)',
+                           [connection.ops.quote_name(table)])
+            row = cursor.fetchone()
+            # -1 — таблицу ещё ни разу не анализировали
+            return int(row[0]) if row and row[0] >= 0 else None
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            except DatabaseError:
+                # sqlite_stat1 появляется после первого ANALYZE
+                return None
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+    return None
+
+
+def count_up_to(queryset, limit):
+    """COUNT(*), который перестаёт считать после limit строк"""
+    return queryset.order_by()[:limit].count()
+
+
+def is_large_table(model):
+    threshold = _get_threshold()
+    key = f'news:admin:large_table:{model._meta.db_table}:{threshold}'
+    large = cache.get(key)
+    if large is None:
+        rows = table_rows(model)
+        if rows is None:
+            rows = count_up_to(model._base_manager.all(), threshold)
+        large = rows >= threshold
+        cache.set(key, large, LARGE_TABLE_CHECK_TIMEOUT)
+    return large
+
+
+def estimate_count(queryset):
+    """
+    Оценка количества строк queryset и подпись для списка: (число, '≈ 1 234 567').
+    Точное число получается только там, где его можно посчитать не дальше NEWS_ADMIN_COUNT_LIMIT строк.
+    """
+    if not queryset.query.where:
+        rows = table_rows(queryset.model)
+        if rows is not None:
+            return rows, f'≈ {_format_number(rows)}'
+    if connections[queryset.db].vendor == 'postgresql':
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        rows = int(plan[0]['Plan']['Plan Rows'])
+        return rows, f'≈ {_format_number(rows)}'
+    limit = _get_count_limit()
+    rows = count_up_to(queryset, limit + 1)
+    if rows > limit:
+        return limit, f'больше {_format_number(limit)}'
+    return rows, _format_number(rows)
+
+
+# --- месяцы публикаций ---
+
+def month_of(value):
+    """Первый день месяца публикации в текущем часовом поясе — как в фильтрах иерархии дат"""
+    return timezone.localtime(value).date().replace(day=1)
+
+
+def add_months(counts):
+    """Прибавляет к месяцам количество новых статей: {первый день месяца: сколько}, два запроса"""
+    counts = {month: delta for month, delta in counts.items() if delta}
+    if not counts:
+        return
+    ArticleMonth.objects.bulk_create([ArticleMonth(month=month) for month in counts], ignore_conflicts=True)
+    ArticleMonth.objects.filter(month__in=counts).update(articles_count=F('articles_count') + Case(
+        *(When(month=month, then=Value(delta)) for month, delta in counts.items()), default=Value(0),
+    ))
+
+
+def month_counts(article_ids):
+    """Сколько статей из article_ids опубликовано в каждом месяце: {первый день месяца: сколько}"""
+    rows = (
+        Article.all_objects.filter(pk__in=article_ids).annotate(month=TruncMonth('publication_date')).order_by()
+        .values_list('month').annotate(total=Count('pk'))
+    )
+    return {month.date(): total for month, total in rows}
+
+
+def remove_month(value):
+    """Не ниже нуля: статьи из loaddata (raw) в месяцах не учтены, а их удаление счётчик уменьшает"""
+    ArticleMonth.objects.filter(month=month_of(value)).update(articles_count=Greatest(F('articles_count') - 1, 0))
+
+
+def rebuild_months():
+    """Пересчитывает ArticleMonths с нуля одним проходом по таблице статей, возвращает количество месяцев"""
+    rows = (
+        Article.all_objects.annotate(month=TruncMonth('publication_date')).order_by()
+        .values_list('month').annotate(total=Count('pk'))
+    )
+    months = [ArticleMonth(month=month.date(), articles_count=total) for month, total in rows]
+    with transaction.atomic():
+        ArticleMonth.objects.all().delete()
+        ArticleMonth.objects.bulk_create(months)
+    return len(months)
+
+
+def month_hierarchy(cl):
+    """
+    Иерархия дат списка статей (как date_hierarchy из admin_list) по месяцам из ArticleMonths.
+    Дни выбранного месяца и выбранный день отдаёт обычная date_hierarchy: запрос ограничен месяцем.
+    """
+    field_name = cl.date_hierarchy
+    year_field, month_field = f'{field_name}__year', f'{field_name}__month'
+    year_lookup = cl.params.get(year_field)
+    if cl.params.get(month_field):
+        return date_hierarchy(cl)
+
+    def link(filters):
+        return cl.get_query_string(filters, [f'{field_name}__'])
+
+    months = list(ArticleMonth.objects.filter(articles_count__gt=0).values_list('month', flat=True))
+    years = sorted({month.year for month in months})
+    if not year_lookup and len(years) == 1:
+        year_lookup = years[0]
+    if year_lookup:
+        return {
+            'show': True,
+            'back': {'link': link({}), 'title': _('All dates')},
+            'choices': [
+                {
+                    'link': link({year_field: year_lookup, month_field: month.month}),
+                    'title': capfirst(formats.date_format(month, 'YEAR_MONTH_FORMAT')),
+                }
+                for month in months if str(month.year) == str(year_lookup)
+            ],
+        }
+    return {
+        'show': True,
+        'back': None,
+        'choices': [{'link': link({year_field: str(year)}), 'title': str(year)} for year in years],
+    }
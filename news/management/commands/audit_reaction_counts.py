@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from news.models import Article
+
+
+class Command(BaseCommand):
+    help = 'Сверяет Article.like_count и Article.favorite_count с таблицами Likes и Favorite и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только показать расхождения, ничего не исправлять')
+
+    def handle(self, *args, **options):
+        like_count, favorite_count = Article.all_objects.reaction_count_subqueries()
+        mismatched = (
+            Article.all_objects
+            .annotate(actual_likes=like_count, actual_favorites=favorite_count)
+            .filter(~Q(like_count=F('actual_likes')) | ~Q(favorite_count=F('actual_favorites')))
+            .values_list('pk', 'like_count', 'actual_likes', 'favorite_count', 'actual_favorites')
+        )
+        article_ids = []
+        for pk, likes, actual_likes, favorites, actual_favorites in mismatched.iterator():
+            article_ids.append(pk)
+            self.stdout.write(
+                f'Статья {pk}: лайки {likes} -> {actual_likes}, избранное {favorites} -> {actual_favorites}'
+            )
+
+        if not article_ids:
+            self.stdout.write(self.style.SUCCESS('Счётчики совпадают'))
+            return
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Расхождений: {len(article_ids)}'))
+            return
+        updated = Article.all_objects.refresh_reaction_counts(article_ids)
+        self.stdout.write(self.style.SUCCESS(f'Исправлено статей: {updated}'))
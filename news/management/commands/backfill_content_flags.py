@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from news.content_flags import CHUNK_SIZE, backfill
+from news.models import ContentFlag
+
+
+class Command(BaseCommand):
+    help = 'Считает ключевые слова админки (ContentFlag) для уже загруженных статей, пачками по первичному ключу'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flag', type=int, action='append', dest='flags',
+                            help='id флага (можно несколько раз); по умолчанию все флаги')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Сколько статей читать за раз')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть положительным')
+        flags = ContentFlag.objects.all()
+        if options['flags']:
+            flags = flags.filter(pk__in=options['flags'])
+            missing = set(options['flags']) - set(flags.values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f'Нет флагов с id: {", ".join(map(str, sorted(missing)))}')
+        matches = backfill(flags, chunk_size=options['chunk_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'Готово, совпадений: {matches}'))
@@ -0,0 +1,76 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from news.benchmarks import WORDS
+from news.models import Article, Category
+from news.search import get_search_backend
+
+PAGE_SIZE = 15
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск через icontains и через поисковый бэкенд на синтетических статьях. '
+        'Статьи создаются внутри транзакции, которая в конце откатывается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--articles', type=int, default=100_000, help='Сколько статей сгенерировать')
+        parser.add_argument('--repeat', type=int, default=5, help='Сколько раз повторять каждый запрос')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--query', action='append', dest='queries',
+                            help='Поисковый запрос (можно указать несколько раз)')
+
+    def handle(self, *args, **options):
+        queries = options['queries'] or ['кошки', 'пауки город', 'чемпионат по футболу', 'ракеты']
+        with transaction.atomic():
+            self.seed(options['articles'], options['seed'])
+            backend = get_search_backend()
+            started = time.perf_counter()
+            backend.rebuild()
+            self.stdout.write(f'{type(backend).__name__}: индекс построен за {time.perf_counter() - started:.2f} с')
+
+            self.stdout.write(f'{"запрос":<25}{"icontains, мс":>16}{"бэкенд, мс":>14}{"найдено":>10}')
+            for query in queries:
+                icontains_ms, _ = self.measure(lambda: self.icontains(query), options['repeat'])
+                backend_ms, found = self.measure(
+                    lambda: backend.search(Article.objects.all(), query), options['repeat']
+                )
+                self.stdout.write(f'{query:<25}{icontains_ms:>16.1f}{backend_ms:>14.1f}{found:>10}')
+            transaction.set_rollback(True)
+
+    def seed(self, count, seed):
+        rng = random.Random(seed)
+        category = Category.objects.create(name='benchmark')
+        batch = []
+        for i in range(count):
+            batch.append(Article(
+                title=' '.join(rng.choices(WORDS, k=5)),
+                content=' '.join(rng.choices(WORDS, k=60)),
+                category=category,
+                slug=f'benchmark-search-{i}',
+            ))
+            if len(batch) == 5000:
+                Article.objects.bulk_create(batch)
+                batch = []
+        Article.objects.bulk_create(batch)
+
+    @staticmethod
+    def icontains(query):
+        # прежняя реализация search_news
+        return Article.objects.filter(Q(title__icontains=query) | Q(content__icontains=query)).distinct()
+
+    @staticmethod
+    def measure(make_queryset, repeat):
+        """Среднее время в мс на COUNT и первую страницу, как это делает Paginator"""
+        found = 0
+        started = time.perf_counter()
+        for _ in range(repeat):
+            queryset = make_queryset()
+            found = queryset.count()
+            list(queryset[:PAGE_SIZE])
+        return (time.perf_counter() - started) * 1000 / repeat, found
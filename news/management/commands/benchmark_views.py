@@ -0,0 +1,191 @@
+import json
+import math
+import platform
+import subprocess
+import time
+from urllib.parse import parse_qs
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.utils import timezone
+
+from news.benchmarks import http_load, queries_from_server_timing, summarize, template_ms_from_server_timing
+from news.datagen import generate_news_data, visitor_ip
+from news.models import Article, Favorite
+from news.pagination import SORT_FIELDS, KeysetPaginator
+
+SEARCH_QUERIES = ('кошки', 'пауки город', 'чемпионат по футболу')
+# IP без лайков и избранного: его страницы берутся из общего кэша
+ANONYMOUS_IP = '192.0.2.1'
+
+
+class Command(BaseCommand):
+    help = (
+        'Бенчмарк представлений news: каталог (все сортировки и глубокие страницы), детальная страница, '
+        'поиск, лайк и избранное. Запросы идут через тестовый клиент и, если задан --base-url, через HTTP '
+        'с одновременными клиентами. Результат — p50/p95/p99, запросов в секунду, количество SQL-запросов '
+        'и время рендера шаблонов на страницу '
+        'в JSON для сравнения между коммитами. С --seed-articles сначала заполняет БД синтетическими данными '
+        '(данные остаются в БД — используйте отдельную базу).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-articles', type=int, default=0,
+                            help='Сгенерировать столько статей с тегами, лайками и избранным перед прогоном')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора данных')
+        parser.add_argument('--visitors', type=int, default=1000, help='Сколько посетителей ставят лайки при генерации')
+        parser.add_argument('--repeat', type=int, default=20, help='Сколько раз выполнить каждый сценарий')
+        parser.add_argument('--depth', type=int, default=50, help='Номер «глубокой» страницы каталога')
+        parser.add_argument('--anonymous', action='store_true',
+                            help='Запросы от посетителя без лайков: страницы каталога берутся из кэша страниц')
+        parser.add_argument('--base-url', help='Адрес запущенного сервера для HTTP-нагрузки')
+        parser.add_argument('--concurrency', type=int, default=20, help='Одновременных клиентов при HTTP-нагрузке')
+        parser.add_argument('--http-requests', type=int, default=200, help='HTTP-запросов на каждый сценарий')
+        parser.add_argument('--label', default='', help='Подпись прогона в JSON')
+        parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON-файл')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or options['depth'] < 1:
+            raise CommandError('--repeat и --depth должны быть положительными')
+        if options['seed_articles']:
+            generate_news_data(
+                options['seed_articles'], seed=options['seed'], visitors=options['visitors'], log=self.stdout.write,
+            )
+        if not Article.objects.exists():
+            raise CommandError('В БД нет статей: запустите с --seed-articles N')
+
+        self.ip_address = ANONYMOUS_IP if options['anonymous'] else self.visitor_with_state()
+        scenarios = self.build_scenarios(options)
+
+        report = {
+            'label': options['label'],
+            'commit': self.git_commit(),
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'articles': Article.all_objects.count(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'options': {name: options[name] for name in ('repeat', 'depth', 'anonymous', 'concurrency', 'http_requests')},
+            'client': {},
+            'http': {},
+        }
+
+        self.stdout.write(
+            f'{"сценарий":<36}{"запр/с":>9}{"p50, мс":>10}{"p95, мс":>10}{"p99, мс":>10}{"SQL":>6}{"шабл., мс":>11}'
+        )
+        client = Client(HTTP_HOST='localhost')
+        for name, method, paths in scenarios:
+            result = self.run_client(client, method, paths, options['repeat'])
+            report['client'][name] = result
+            self.write_row(name, result)
+
+        if options['base_url']:
+            self.stdout.write(f'HTTP: {options["base_url"]}, клиентов: {options["concurrency"]}')
+            # POST-сценарии требуют CSRF-токена и меняют данные, поэтому в HTTP-нагрузку не входят
+            report['http_excluded'] = [name for name, method, _ in scenarios if method != 'get']
+            if report['http_excluded']:
+                self.stdout.write(f'Без HTTP-нагрузки (POST): {", ".join(report["http_excluded"])}')
+            for name, method, paths in scenarios:
+                if method != 'get':
+                    continue
+                result = http_load(
+                    options['base_url'].rstrip('/') + paths[0],
+                    options['concurrency'], options['http_requests'],
+                    follow_redirects=False,
+                )
+                report['http'][name] = result
+                self.write_row(name, result)
+
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Результаты сохранены в {options["json_path"]}'))
+
+    def write_row(self, name, result):
+        queries = '-' if result['queries_p50'] is None else result['queries_p50']
+        templates = '-' if result['template_p50_ms'] is None else f'{result["template_p50_ms"]:.1f}'
+        self.stdout.write(
+            f'{name:<36}{result["throughput"]:>9.1f}{result["p50_ms"]:>10.1f}'
+            f'{result["p95_ms"]:>10.1f}{result["p99_ms"]:>10.1f}{queries:>6}{templates:>11}'
+        )
+
+    @staticmethod
+    def git_commit():
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    @staticmethod
+    def visitor_with_state():
+        """IP посетителя с избранным: его страницы персональные и не попадают в кэш страниц"""
+        ip_address = Favorite.objects.order_by('pk').values_list('ip_address', flat=True).first()
+        return ip_address or visitor_ip(0)
+
+    def build_scenarios(self, options):
+        """Список (имя, метод, пути); пути перебираются по кругу, чтобы не мерить одну и ту же запись"""
+        scenarios = []
+        for sort in SORT_FIELDS:
+            for order in ('desc', 'asc'):
+                scenarios.append((f'catalog:{sort}:{order}', 'get', [f'/news/catalog/?sort={sort}&order={order}']))
+
+        depth = options['depth']
+        scenarios.append((f'catalog:cursor_page_{depth}', 'get', [f'/news/catalog/?{self.deep_cursor_query(depth)}']))
+        scenarios.append((f'catalog:offset_page_{depth}', 'get', [f'/news/catalog/?page={depth}']))
+
+        article_ids = list(
+            Article.objects.order_by('-publication_date', '-pk').values_list('pk', flat=True)[:options['repeat']]
+        )
+        scenarios.append(('detail', 'get', [f'/news/catalog/{article_id}/' for article_id in article_ids]))
+        for query in SEARCH_QUERIES:
+            scenarios.append((f'search:{query}', 'get', [f'/news/search_news?q={query}']))
+        scenarios.append(('favorites', 'get', ['/news/favorites/']))
+        # JSON API (news/api.py) для сравнения с HTML-страницами
+        scenarios.append(('api:articles', 'get', ['/news/api/articles/']))
+        scenarios.append((f'api:articles_page_{depth}', 'get', [f'/news/api/articles/?{self.deep_cursor_query(depth)}']))
+        scenarios.append(('api:detail', 'get', [f'/news/api/articles/{article_id}/' for article_id in article_ids]))
+        scenarios.append(('api:search', 'get', [f'/news/api/search/?q={SEARCH_QUERIES[0]}']))
+        # каждая статья лайкается и сразу снимается лайк, так что данные после прогона не меняются
+        # (run_client проходит POST-пути только целыми кругами)
+        scenarios.append(('like_toggle', 'post', [
+            f'/news/like_toggle/{article_id}' for article_id in article_ids for _ in range(2)
+        ]))
+        return scenarios
+
+    @staticmethod
+    def deep_cursor_query(depth):
+        """Строка запроса с курсором ?after= для страницы номер depth (сортировка по умолчанию)"""
+        paginator = KeysetPaginator(Article.objects.all())
+        factory = RequestFactory()
+        query = ''
+        for _ in range(depth - 1):
+            page = paginator.get_page(factory.get('/news/catalog/', parse_qs(query)))
+            if not page.has_next():
+                break
+            query = page.next_query
+        return query
+
+    def run_client(self, client, method, paths, repeat):
+        latencies = []
+        queries = []
+        template_times = []
+        count = max(repeat, len(paths))
+        if method == 'post':
+            # целое число кругов по путям: каждый лайк снят, и следующий прогон мерит то же состояние
+            count = math.ceil(count / len(paths)) * len(paths)
+        started = time.perf_counter()
+        for i in range(count):
+            request_started = time.perf_counter()
+            response = getattr(client, method)(paths[i % len(paths)], REMOTE_ADDR=self.ip_address)
+            latencies.append(time.perf_counter() - request_started)
+            query_count = queries_from_server_timing(response.get('Server-Timing'))
+            if query_count is not None:
+                queries.append(query_count)
+            template_ms = template_ms_from_server_timing(response.get('Server-Timing'))
+            if template_ms is not None:
+                template_times.append(template_ms / 1000)
+        return summarize(latencies, time.perf_counter() - started, queries=queries, template_times=template_times)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from news.related import build_related
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает похожие статьи для детальных страниц по тегам и тексту'
+
+    def handle(self, *args, **options):
+        relations = build_related(log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'Записано пар похожих статей: {relations}'))
@@ -0,0 +1,40 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from news.export import CHUNK_SIZE, FORMATS, export_lines, filter_articles
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка статей в JSON Lines или CSV (память не зависит от размера таблицы)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='jsonl', help='Формат выгрузки')
+        parser.add_argument('--output', '-o', help='Файл для выгрузки (по умолчанию stdout)')
+        parser.add_argument('--category', type=int, help='id категории')
+        parser.add_argument('--date-from', type=date.fromisoformat, help='Дата публикации от (YYYY-MM-DD)')
+        parser.add_argument('--date-to', type=date.fromisoformat, help='Дата публикации до, включительно')
+        active = parser.add_mutually_exclusive_group()
+        active.add_argument('--active', dest='is_active', action='store_const', const=True,
+                            help='Только активные статьи')
+        active.add_argument('--inactive', dest='is_active', action='store_const', const=False,
+                            help='Только неактивные статьи')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Сколько статей читать из БД за раз')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть положительным')
+        queryset = filter_articles(
+            category_id=options['category'],
+            date_from=options['date_from'],
+            date_to=options['date_to'],
+            is_active=options['is_active'],
+        )
+        lines = export_lines(queryset, options['format'], chunk_size=options['chunk_size'])
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as file:
+            file.writelines(lines)
+        self.stderr.write(self.style.SUCCESS(f'Выгрузка сохранена в {options["output"]}'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from news.view_counter import flush_views
+
+
+class Command(BaseCommand):
+    help = 'Принудительно записывает накопленные в буфере просмотры в Article.views'
+
+    def handle(self, *args, **options):
+        updated = flush_views()
+        self.stdout.write(self.style.SUCCESS(f'Обновлено статей: {updated}'))
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from news.datagen import generate_news_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует синтетические русскоязычные новости для нагрузочного тестирования: категории, теги, '
+        'связи с тегами, лайки и избранное с разных IP. Популярность распределена по Ципфу, '
+        'при одинаковом --seed получаются одинаковые данные. Данные остаются в БД — используйте отдельную базу.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--articles', type=int, default=100_000, help='Сколько статей создать')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора')
+        parser.add_argument('--categories', type=int, default=15, help='Количество категорий')
+        parser.add_argument('--tags', type=int, default=500, help='Количество тегов')
+        parser.add_argument('--visitors', type=int, default=50_000, help='Количество посетителей (разных IP)')
+        parser.add_argument('--max-reactions', type=int, default=2000,
+                            help='Сколько лайков ставит самый активный посетитель')
+        parser.add_argument('--favorite-ratio', type=float, default=0.3, help='Доля лайков, добавленных в избранное')
+        parser.add_argument('--inactive-ratio', type=float, default=0.05, help='Доля неактивных статей')
+        parser.add_argument('--days', type=int, default=3 * 365, help='За сколько последних дней публикации')
+        parser.add_argument('--exponent', type=float, default=1.1, help='Показатель распределения Ципфа')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Размер пачки bulk_create')
+
+    def handle(self, *args, **options):
+        for name in ('articles', 'categories', 'tags', 'visitors', 'max_reactions', 'days', 'batch_size'):
+            if options[name] < 1:
+                raise CommandError(f'--{name.replace("_", "-")} должен быть положительным')
+        if not 0 <= options['favorite_ratio'] <= 1:
+            raise CommandError('--favorite-ratio должен быть от 0 до 1')
+        if not 0 <= options['inactive_ratio'] <= 1:
+            raise CommandError('--inactive-ratio должен быть от 0 до 1')
+
+        result = generate_news_data(
+            options['articles'],
+            seed=options['seed'],
+            categories=options['categories'],
+            tags=options['tags'],
+            visitors=options['visitors'],
+            max_reactions=options['max_reactions'],
+            favorite_ratio=options['favorite_ratio'],
+            inactive_ratio=options['inactive_ratio'],
+            days=options['days'],
+            exponent=options['exponent'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {result.seconds:.1f} с: статей {result.articles} (пропущено {result.skipped}), '
+            f'лайков {result.likes}, в избранном {result.favorites}'
+        ))
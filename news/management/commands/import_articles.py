@@ -0,0 +1,67 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from news.ingest import ARTICLE_FIELDS
+from news.models import Article
+
+
+def _read_records(path):
+    """Читает JSON-список или JSON Lines (по одному объекту на строку)"""
+    with open(path, encoding='utf-8') as file:
+        if path.endswith('.jsonl'):
+            return [json.loads(line) for line in file if line.strip()]
+        data = json.load(file)
+    return data if isinstance(data, list) else [data]
+
+
+def _rows_from_fixture(records):
+    """
+    Фикстура Django (вывод dumpdata): категории и теги ссылаются на pk из того же файла,
+    поэтому переводим их в названия — в базе у них будут другие id.
+    """
+    names = {'news.category': {}, 'news.tag': {}}
+    for record in records:
+        if record['model'] in names:
+            names[record['model']][record['pk']] = record['fields']['name']
+    for record in records:
+        if record['model'] != 'news.article':
+            continue
+        fields = record['fields']
+        row = {field: fields[field] for field in ARTICLE_FIELDS if field in fields}
+        category = fields.get('category')
+        if category in names['news.category']:
+            row['category'] = names['news.category'][category]
+        elif category is not None:
+            row['category_id'] = category
+        row['tags'] = [names['news.tag'][tag] for tag in fields.get('tags', ()) if tag in names['news.tag']]
+        yield row
+
+
+class Command(BaseCommand):
+    help = (
+        'Массовая загрузка статей из фикстур Django (articles*.json) или фида '
+        '(JSON-список или .jsonl со словарями title, content, category, tags, ...)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Файлы для загрузки')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Размер пачки для bulk_create')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным')
+        for path in options['paths']:
+            try:
+                records = _read_records(path)
+            except (OSError, ValueError) as error:
+                raise CommandError(f'Не удалось прочитать {path}: {error}')
+            if records and 'model' in records[0]:
+                rows = _rows_from_fixture(records)
+            else:
+                rows = records
+            result = Article.all_objects.bulk_ingest(rows, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{path}: создано {result.created}, пропущено {result.skipped}, '
+                f'{result.seconds:.2f} с ({result.rows_per_second:.0f} статей/с)'
+            ))
@@ -0,0 +1,59 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from news.benchmarks import http_load
+
+DEFAULT_PATHS = (
+    '/news/catalog/',
+    '/news/catalog/?sort=views&order=asc',
+    '/news/catalog/1/',
+    '/news/search_news?q=кошки',
+    '/news/favorites/',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест запущенного сервера: N одновременных клиентов по HTTP. '
+        'Для сравнения WSGI и ASGI запустите один и тот же проект под gunicorn itg.wsgi и '
+        'под uvicorn itg.asgi:application и прогоните команду против обоих с одинаковыми параметрами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Адрес сервера')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Путь для запросов (можно указать несколько раз)')
+        parser.add_argument('--concurrency', type=int, default=50, help='Сколько клиентов работают одновременно')
+        parser.add_argument('--requests', type=int, default=500, help='Сколько запросов отправить на каждый путь')
+        parser.add_argument('--timeout', type=float, default=30, help='Таймаут одного запроса, секунды')
+        parser.add_argument('--label', default='', help='Подпись прогона в JSON (например, wsgi или asgi)')
+        parser.add_argument('--json', dest='json_path', help='Сохранить результаты в JSON-файл')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError('--concurrency и --requests должны быть положительными')
+        results = []
+        self.stdout.write(
+            f'{"путь":<40}{"запр/с":>9}{"p50, мс":>10}{"p95, мс":>10}{"p99, мс":>10}{"ошибки":>8}'
+        )
+        for path in options['paths'] or DEFAULT_PATHS:
+            result = http_load(
+                options['base_url'].rstrip('/') + path,
+                options['concurrency'], options['requests'], timeout=options['timeout'],
+            )
+            result['path'] = path
+            results.append(result)
+            self.stdout.write(
+                f'{path:<40}{result["throughput"]:>9.1f}{result["p50_ms"]:>10.1f}'
+                f'{result["p95_ms"]:>10.1f}{result["p99_ms"]:>10.1f}{result["errors"]:>8}'
+            )
+        if options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'label': options['label'],
+                    'base_url': options['base_url'],
+                    'concurrency': options['concurrency'],
+                    'requests': options['requests'],
+                    'results': results,
+                }, file, ensure_ascii=False, indent=2)
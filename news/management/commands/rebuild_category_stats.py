@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from news import large_changelist, page_cache
+from news.models import Category, Tag
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает с нуля количество активных статей в каждой категории и у каждого тега, '
+        'а также месяцы публикаций для иерархии дат в админке'
+    )
+
+    def handle(self, *args, **options):
+        updated = Category.objects.refresh_articles_count()
+        updated_tags = Tag.objects.refresh_articles_count()
+        months = large_changelist.rebuild_months()
+        page_cache.purge('sidebar')
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано категорий: {updated}, тегов: {updated_tags}, месяцев: {months}'))
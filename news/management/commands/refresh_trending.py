@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from news.trending import refresh_trending
+
+
+class Command(BaseCommand):
+    help = 'Добавляет в рейтинг «в тренде» просмотры, лайки и избранное, накопившиеся с прошлого запуска'
+
+    def handle(self, *args, **options):
+        updated = refresh_trending()
+        self.stdout.write(self.style.SUCCESS(f'Обновлено статей в рейтинге: {updated}'))
@@ -0,0 +1,209 @@
+"""
+Лёгкие метрики каждого запроса для продакшена: количество SQL-запросов, время в БД,
+время рендера шаблонов и размер ответа.
+
+Метрики текущего запроса хранятся в ContextVar, поэтому учитываются и запросы к БД
+из async views (asgiref копирует контекст в потоки sync_to_async). Запросы к БД считает
+execute_wrapper, который ставится на каждое новое соединение, время шаблонов — бэкенд
+TimedDjangoTemplates. Вне запроса обёртки сводятся к одной проверке ContextVar.
+
+RequestMetricsMiddleware пишет данные в заголовок Server-Timing (NEWS_SERVER_TIMING)
+и в лог news.metrics, если представление превысило бюджет запросов:
+NEWS_QUERY_BUDGETS = {'news:catalog': 10, ...} по имени маршрута, иначе NEWS_QUERY_BUDGET.
+
+Тело потокового ответа (выгрузка статей) читается уже после выхода из middleware, поэтому
+его содержимое оборачивается: запросы, выполненные при отдаче тела, тоже учитываются, а бюджет
+проверяется, когда поток отдан целиком. Server-Timing такого ответа уходит вместе с заголовками
+и показывает только работу представления до начала потока.
+"""
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger('news.metrics')
+
+_current = ContextVar('news_request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('started', 'queries', 'db_time', 'template_time', 'template_depth')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        # вложенность рендера: render_to_string внутри шаблона (карточки из news/fragment_cache.py)
+        # уже входит во время внешнего шаблона и второй раз не считается
+        self.template_depth = 0
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """Обработчик connection_created: подключает счётчик запросов к новому соединению"""
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(install_query_recorder, dispatch_uid='news_metrics_query_recorder')
+
+
+class _TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    @property
+    def origin(self):
+        return self.template.origin
+
+    def render(self, context=None, request=None):
+        metrics = _current.get()
+        if metrics is None or metrics.template_depth:
+            return self.template.render(context, request)
+        metrics.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - started
+            metrics.template_depth -= 1
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Обычный бэкенд шаблонов Django, который засекает время рендера страницы"""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
+
+
+def _get_budget(request):
+    budgets = getattr(settings, 'NEWS_QUERY_BUDGETS', {})
+    match = getattr(request, 'resolver_match', None)
+    view_name = match.view_name if match else None
+    return view_name, budgets.get(view_name, getattr(settings, 'NEWS_QUERY_BUDGET', None))
+
+
+def _check_budget(request, metrics, size):
+    view_name, budget = _get_budget(request)
+    if budget is not None and metrics.queries > budget:
+        logger.warning(
+            'Превышен бюджет запросов: %s %s (%s) — %d запросов при бюджете %d, '
+            'БД %.1f мс, шаблоны %.1f мс, всего %.1f мс, ответ %s байт',
+            request.method, request.path, view_name, metrics.queries, budget,
+            metrics.db_time * 1000, metrics.template_time * 1000, metrics.total_time * 1000, size,
+        )
+
+
+def _stream(request, content, metrics):
+    """Отдаёт тело потокового ответа, считая запросы каждой порции в метриках запроса"""
+    size = 0
+    iterator = iter(content)
+    try:
+        while True:
+            token = _current.set(metrics)
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                _current.reset(token)
+            size += len(chunk)
+            yield chunk
+    finally:
+        _check_budget(request, metrics, size)
+
+
+async def _astream(request, content, metrics):
+    size = 0
+    iterator = aiter(content)
+    try:
+        while True:
+            token = _current.set(metrics)
+            try:
+                chunk = await anext(iterator)
+            except StopAsyncIteration:
+                break
+            finally:
+                _current.reset(token)
+            size += len(chunk)
+            yield chunk
+    finally:
+        _check_budget(request, metrics, size)
+
+
+def _finish(request, response, metrics):
+    size = None if response.streaming else len(response.content)
+    if getattr(settings, 'NEWS_SERVER_TIMING', True):
+        timings = [
+            f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+            f'tpl;dur={metrics.template_time * 1000:.1f}',
+            f'total;dur={metrics.total_time * 1000:.1f}',
+        ]
+        if size is not None:
+            timings.append(f'size;desc="{size} bytes"')
+        response['Server-Timing'] = ', '.join(timings)
+
+    if response.streaming:
+        stream = _astream if response.is_async else _stream
+        response.streaming_content = stream(request, response.streaming_content, metrics)
+    else:
+        _check_budget(request, metrics, size)
+    return response
+
+
+class RequestMetricsMiddleware:
+    """Собирает RequestMetrics для запроса; работает и под WSGI, и под ASGI"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # соединения, открытые до загрузки middleware (например, проверками при запуске)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(None, connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return _finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return _finish(request, response, metrics)
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:06
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_articles_count(apps, schema_editor):
+    Article = apps.get_model('news', 'Article')
+    Category = apps.get_model('news', 'Category')
+    active_count = (
+        Article.objects.filter(category=OuterRef('pk'), is_active=True)
+        .order_by()
+        .values('category')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Category.objects.update(articles_count=Coalesce(Subquery(active_count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0008_favorite'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='articles_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество статей'),
+        ),
+        migrations.RunPython(fill_articles_count, migrations.RunPython.noop),
+    ]
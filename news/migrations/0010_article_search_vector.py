@@ -0,0 +1,41 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:31
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # GIN индекс и заполнение вектора нужны только в PostgreSQL,
+    # в SQLite поиск работает через индекс в памяти (news/search.py)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS "articles_search_vector_gin" ON "Articles" USING gin ("search_vector")'
+    )
+    schema_editor.execute(
+        """UPDATE "Articles" SET "search_vector" =
+               setweight(to_tsvector('russian', coalesce("title", '')), 'A')
+               || setweight(to_tsvector('russian', coalesce("content", '')), 'B')"""
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS "articles_search_vector_gin"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0009_category_articles_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0010_article_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['publication_date', 'id'], name='articles_active_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['views', 'id'], name='articles_active_views_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', 'publication_date', 'id'], name='articles_active_cat_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', 'views', 'id'], name='articles_active_cat_views_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['ip_address', 'article'], name='favorite_ip_article_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['ip_address', 'article'], name='likes_ip_article_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:16
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_reaction_counts(apps, schema_editor):
+    Article = apps.get_model('news', 'Article')
+    Like = apps.get_model('news', 'Like')
+    Favorite = apps.get_model('news', 'Favorite')
+
+    def count_for(model):
+        return Coalesce(Subquery(
+            model.objects.filter(article=OuterRef('pk'))
+            .order_by()
+            .values('article')
+            .annotate(total=Count('pk'))
+            .values('total')
+        ), 0)
+
+    Article.objects.update(like_count=count_for(Like), favorite_count=count_for(Favorite))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0011_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='favorite_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Лайки'),
+        ),
+        migrations.RunPython(fill_reaction_counts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['like_count', 'id'], name='articles_active_likes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['category', 'like_count', 'id'], name='articles_active_cat_likes_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0012_article_reaction_counts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='article',
+            name='publication_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Дата публикации'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_articles_count(apps, schema_editor):
+    Article = apps.get_model('news', 'Article')
+    Tag = apps.get_model('news', 'Tag')
+    active_count = (
+        Article.tags.through.objects.filter(tag=OuterRef('pk'), article__is_active=True)
+        .order_by()
+        .values('tag')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    Tag.objects.update(articles_count=Coalesce(Subquery(active_count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0013_article_publication_date_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='articles_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество статей'),
+        ),
+        migrations.RunPython(fill_articles_count, migrations.RunPython.noop),
+    ]
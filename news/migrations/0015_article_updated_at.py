@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:40
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_updated_at(apps, schema_editor):
+    # для уже опубликованных статей точное время изменения неизвестно, берём дату публикации
+    Article = apps.get_model('news', 'Article')
+    Article.objects.update(updated_at=F('publication_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0014_tag_articles_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Дата изменения'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_updated_at, migrations.RunPython.noop),
+    ]
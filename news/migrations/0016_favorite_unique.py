@@ -0,0 +1,43 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:20
+
+from django.db import migrations
+from django.db.models import Count, Min, OuterRef, Subquery
+
+
+def remove_duplicate_favorites(apps, schema_editor):
+    # до уникальности двойной клик мог добавить статью в избранное дважды: оставляем первую запись
+    Article = apps.get_model('news', 'Article')
+    Favorite = apps.get_model('news', 'Favorite')
+    db = schema_editor.connection.alias
+    duplicates = (
+        Favorite.objects.using(db).values('article_id', 'ip_address')
+        .annotate(total=Count('id'), first_id=Min('id'))
+        .filter(total__gt=1)
+    )
+    article_ids = set()
+    for row in duplicates:
+        Favorite.objects.using(db).filter(
+            article_id=row['article_id'], ip_address=row['ip_address'],
+        ).exclude(pk=row['first_id']).delete()
+        article_ids.add(row['article_id'])
+    if article_ids:
+        favorite_count = (
+            Favorite.objects.filter(article=OuterRef('pk')).order_by().values('article')
+            .annotate(total=Count('pk')).values('total')
+        )
+        Article.objects.using(db).filter(pk__in=article_ids).update(favorite_count=Subquery(favorite_count))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0015_article_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_favorites, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='favorite',
+            unique_together={('article', 'ip_address')},
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.5 on 2026-10-18 10:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0016_favorite_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleTrend',
+            fields=[
+                ('article', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trend', serialize=False, to='news.article')),
+                ('score', models.FloatField(verbose_name='Рейтинг')),
+                ('views_seen', models.PositiveIntegerField(default=0)),
+                ('likes_seen', models.PositiveIntegerField(default=0)),
+                ('favorites_seen', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Рейтинг статьи',
+                'verbose_name_plural': 'Рейтинги статей',
+                'db_table': 'ArticleTrends',
+                'indexes': [models.Index(fields=['score', 'article'], name='article_trends_score_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_spiders_flag(apps, schema_editor):
+    # флаг для колонки «Пауки внутри» и фильтра ArticleSpiderFilter; совпадения заполнит backfill_content_flags
+    ContentFlag = apps.get_model('news', 'ContentFlag')
+    ContentFlag.objects.using(schema_editor.connection.alias).get_or_create(
+        keyword='пауки', defaults={'name': 'Пауки внутри'},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0018_related_article'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentFlag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Название')),
+                ('keyword', models.CharField(max_length=100, unique=True, verbose_name='Ключевое слово')),
+                ('is_ready', models.BooleanField(default=False, editable=False, verbose_name='Посчитано')),
+            ],
+            options={
+                'verbose_name': 'Ключевое слово',
+                'verbose_name_plural': 'Ключевые слова',
+                'db_table': 'ContentFlags',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArticleFlag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flag_links', to='news.article')),
+                ('flag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='article_links', to='news.contentflag')),
+            ],
+            options={
+                'verbose_name': 'Ключевое слово статьи',
+                'verbose_name_plural': 'Ключевые слова статей',
+                'db_table': 'ArticleFlags',
+                'indexes': [models.Index(fields=['flag', 'article'], name='article_flags_flag_idx')],
+                'unique_together': {('article', 'flag')},
+            },
+        ),
+        migrations.RunPython(create_spiders_flag, migrations.RunPython.noop),
+    ]
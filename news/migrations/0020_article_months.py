@@ -0,0 +1,48 @@
+# Generated by Django 5.1.5 on 2026-10-18 11:17
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+
+def fill_article_months(apps, schema_editor):
+    # один проход по таблице статей; дальше месяцы поддерживают сигналы и массовая загрузка
+    Article = apps.get_model('news', 'Article')
+    ArticleMonth = apps.get_model('news', 'ArticleMonth')
+    db = schema_editor.connection.alias
+    months = (
+        Article.objects.using(db).annotate(month=TruncMonth('publication_date')).order_by()
+        .values('month').annotate(total=Count('id'))
+    )
+    ArticleMonth.objects.using(db).bulk_create(
+        [ArticleMonth(month=row['month'].date(), articles_count=row['total']) for row in months],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0019_content_flags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True, verbose_name='Месяц')),
+                ('articles_count', models.PositiveIntegerField(default=0, verbose_name='Количество статей')),
+            ],
+            options={
+                'verbose_name': 'Месяц публикаций',
+                'verbose_name_plural': 'Месяцы публикаций',
+                'db_table': 'ArticleMonths',
+                'ordering': ['month'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['publication_date', 'id'], name='articles_pub_date_idx'),
+        ),
+        migrations.RunPython(fill_article_months, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,66 @@
+import secrets
+
 import unidecode
 
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.utils.text import slugify
 
 
+def generate_slug(title):
+    """
+    Слаг из заголовка со случайным 64-битным суффиксом: уникален без знания id,
+    поэтому его можно посчитать до вставки (и для целой пачки статей в bulk_create).
+    При миллионах статей с одинаковыми заголовками 32 бит было бы мало: совпадения становятся реальными.
+    """
+    max_length = Article._meta.get_field('slug').max_length
+    suffix = secrets.token_hex(8)
+    base_slug = slugify(unidecode.unidecode(title or ''))[:max_length - len(suffix) - 1].strip('-')
+    return f'{base_slug}-{suffix}' if base_slug else suffix
+
+
 class AllArticleManager(models.Manager):
     def get_queryset(self):
         return super().get_queryset()
 
+    def bulk_ingest(self, rows, batch_size=1000):
+        """Массовая загрузка статей пачками, см. news/ingest.py"""
+        # импорт внутри метода: ingest.py сам импортирует модели
+        from .ingest import ingest_articles
+        return ingest_articles(rows, batch_size=batch_size)
+
+    def reaction_count_subqueries(self):
+        """Подзапросы, считающие лайки и избранное статьи по таблицам Likes и Favorite"""
+        like_count = (
+            Like.objects.filter(article=OuterRef('pk'))
+            .order_by()
+            .values('article')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        favorite_count = (
+            Favorite.objects.filter(article=OuterRef('pk'))
+            .order_by()
+            .values('article')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return Coalesce(Subquery(like_count), 0), Coalesce(Subquery(favorite_count), 0)
+
+    def refresh_reaction_counts(self, article_ids=None):
+        """
+        Пересчитывает like_count и favorite_count одним UPDATE с подзапросами.
+        Если article_ids не передан, пересчитываются все статьи.
+        """
+        like_count, favorite_count = self.reaction_count_subqueries()
+        queryset = self.get_queryset()
+        if article_ids is not None:
+            queryset = queryset.filter(pk__in=article_ids)
+        return queryset.update(like_count=like_count, favorite_count=favorite_count)
+
 
 class ArticleManager(models.Manager):
     def get_queryset(self):
@@ -16,8 +69,31 @@ class ArticleManager(models.Manager):
         return self.get_queryset().all().order_by('-title')
 
 
+class CategoryManager(models.Manager):
+    def refresh_articles_count(self, category_ids=None):
+        """
+        Пересчитывает количество активных статей в категориях одним UPDATE с подзапросом.
+        Если category_ids не передан, пересчитываются все категории.
+        """
+        active_count = (
+            Article.objects.filter(category=OuterRef('pk'))
+            .order_by()
+            .values('category')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        queryset = self.get_queryset()
+        if category_ids is not None:
+            queryset = queryset.filter(pk__in=category_ids)
+        return queryset.update(articles_count=Coalesce(Subquery(active_count), 0))
+
+
 class Category(models.Model):
     name = models.CharField(max_length=255, verbose_name='Категория')
+    # количество активных статей, поддерживается сигналами из news/signals.py
+    articles_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество статей')
+
+    objects = CategoryManager()
 
     def __str__(self):
         return self.name
@@ -29,8 +105,31 @@ class Category(models.Model):
         ordering = ['name']  # указывает порядок сортировки модели по умолчанию
 
 
+class TagManager(models.Manager):
+    def refresh_articles_count(self, tag_ids=None):
+        """
+        Пересчитывает количество активных статей с тегом одним UPDATE с подзапросом по таблице связей.
+        Если tag_ids не передан, пересчитываются все теги.
+        """
+        active_count = (
+            Article.tags.through.objects.filter(tag=OuterRef('pk'), article__is_active=True)
+            .order_by()
+            .values('tag')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        queryset = self.get_queryset()
+        if tag_ids is not None:
+            queryset = queryset.filter(pk__in=tag_ids)
+        return queryset.update(articles_count=Coalesce(Subquery(active_count), 0))
+
+
 class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True, verbose_name='Тег')
+    # количество активных статей с тегом для облака тегов, поддерживается сигналами из news/signals.py
+    articles_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество статей')
+
+    objects = TagManager()
 
     def __str__(self):
         return self.name
@@ -49,12 +148,21 @@ class Article(models.Model):
 
     title = models.CharField(max_length=255, verbose_name='Заголовок')
     content = models.TextField(verbose_name='Содержание')
-    publication_date = models.DateTimeField(auto_now_add=True, verbose_name='Дата публикации')
+    # default вместо auto_now_add: иначе bulk_create затирает дату публикации из фида текущим временем
+    publication_date = models.DateTimeField(default=timezone.now, editable=False, verbose_name='Дата публикации')
+    # время последнего изменения статьи для ETag/Last-Modified детальной страницы (news/conditional.py);
+    # лайки, избранное и смена тегов тоже обновляют его, а просмотры — нет
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')
     views = models.IntegerField(default=0, verbose_name='Просмотры')
     category = models.ForeignKey('Category', on_delete=models.CASCADE, default=1, verbose_name='Категория')
     tags = models.ManyToManyField('Tag', related_name='article', verbose_name='Теги')
     slug = models.SlugField(unique=True, blank=True, verbose_name='Слаг')
     is_active = models.BooleanField(default=True, verbose_name='Активна')
+    # денормализованные счётчики, меняются в той же транзакции, что и like_toggle/toggle_favorite
+    like_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Лайки')
+    favorite_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном')
+    # tsvector заголовка и текста для полнотекстового поиска в PostgreSQL (см. news/search.py)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     status = models.BooleanField(default=0,
                                  choices=(map(lambda x: (bool(x[0]), x[1]), Status.choices)),
@@ -64,16 +172,10 @@ class Article(models.Model):
     all_objects = AllArticleManager()
 
     def save(self, *args, **kwargs):
-        # Сохраняем статью, чтобы получить id
-        super().save(*args, **kwargs)
+        # Слаг генерируется до вставки, поэтому статья записывается в БД одним запросом
         if not self.slug:
-            print(f"Title before slugify: {self.title}")  # Отладочное сообщение
-            base_slug = slugify(unidecode.unidecode(self.title))
-            self.slug = f"{base_slug}-{self.id}"
-            print(f"Generated slug: {self.slug}")  # Отладочное сообщение
-        # Сохраняем статью снова, чтобы обновить слаг
+            self.slug = generate_slug(self.title)
         super().save(*args, **kwargs)
-        print(f"Saved article with slug: {self.slug}")  # Отладочное сообщение
 
     class Meta:
         db_table = 'Articles'  # без указания этого параметра, таблица в БД будет называться 'news_artcile'
@@ -82,7 +184,25 @@ class Article(models.Model):
         # ordering = ['publication_date']  # указывает порядок сортировки модели по умолчанию
         # unique_together = (...)  # устанавливает уникальность для комбинации полей
         # index_together = (...)  # создаёт для нескольких полей
-        # indexes = (...)  # определяет пользовательские индексы
+        # indexes определяет пользовательские индексы. Частичные индексы (condition) покрывают только активные
+        # статьи — ровно то, что выбирает ArticleManager, — и отдают строки уже в порядке сортировки каталога,
+        # включая курсорную пагинацию по (поле сортировки, id)
+        indexes = [
+            models.Index(fields=['publication_date', 'id'], condition=models.Q(is_active=True),
+                         name='articles_active_pub_date_idx'),
+            models.Index(fields=['views', 'id'], condition=models.Q(is_active=True),
+                         name='articles_active_views_idx'),
+            models.Index(fields=['like_count', 'id'], condition=models.Q(is_active=True),
+                         name='articles_active_likes_idx'),
+            models.Index(fields=['category', 'publication_date', 'id'], condition=models.Q(is_active=True),
+                         name='articles_active_cat_date_idx'),
+            models.Index(fields=['category', 'views', 'id'], condition=models.Q(is_active=True),
+                         name='articles_active_cat_views_idx'),
+            models.Index(fields=['category', 'like_count', 'id'], condition=models.Q(is_active=True),
+                         name='articles_active_cat_likes_idx'),
+            # все статьи, включая неактивные: список статей в админке и его иерархия дат (news/large_changelist.py)
+            models.Index(fields=['publication_date', 'id'], name='articles_pub_date_idx'),
+        ]
         # abstract = True/False  # делает модель абстрактной, не создаёт таблицу БД, нужна только для наследования другими моделями данных
         # managed = True/False  # будет ли эта модель управляться (создание, удаление, изменение) с помощью Django или нет
         # permissions = [...]  # определяет пользовательские разрешения для модели
@@ -100,6 +220,10 @@ class Like(models.Model):
         verbose_name = "Лайк"
         verbose_name_plural = "Лайки"
         unique_together = ('article', 'ip_address')
+        # лайки посетителя: has_liked/VisitorState и проверка персонализации в кэше страниц
+        indexes = [
+            models.Index(fields=['ip_address', 'article'], name='likes_ip_article_idx'),
+        ]
 
     def __str__(self):
         return f"{self.ip_address} likes {self.article.title}"
@@ -109,6 +233,122 @@ class Favorite(models.Model):
     article = models.ForeignKey("Article", on_delete=models.CASCADE, related_name='favorites')
     ip_address = models.GenericIPAddressField()
 
+    class Meta:
+        # как у лайков: двойной клик не добавит статью в избранное дважды
+        unique_together = ('article', 'ip_address')
+        # избранное посетителя: страница favorites, has_favorited/VisitorState, toggle_favorite
+        indexes = [
+            models.Index(fields=['ip_address', 'article'], name='favorite_ip_article_idx'),
+        ]
+
     def __str__(self):
         return f'Favorite by {self.ip_address} on {self.article}'
 
+
+
+class ArticleTrend(models.Model):
+    """
+    Рейтинг «в тренде»: одна узкая строка на статью, у которой были просмотры, лайки или избранное.
+    Пересчитывается командой refresh_trending (news/trending.py), страница тренда читает её по индексу.
+    """
+    article = models.OneToOneField('Article', on_delete=models.CASCADE, primary_key=True, related_name='trend')
+    # логарифм затухающей суммы активности, приведённой к TRENDING_EPOCH: порядок строк совпадает
+    # с порядком текущих рейтингов, поэтому старые строки не нужно пересчитывать при каждом запуске
+    score = models.FloatField(verbose_name='Рейтинг')
+    # значения счётчиков статьи при прошлом пересчёте: прирост с тех пор — новая активность
+    views_seen = models.PositiveIntegerField(default=0)
+    likes_seen = models.PositiveIntegerField(default=0)
+    favorites_seen = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'ArticleTrends'
+        verbose_name = 'Рейтинг статьи'
+        verbose_name_plural = 'Рейтинги статей'
+        indexes = [
+            models.Index(fields=['score', 'article'], name='article_trends_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.article_id}: {self.score:.3f}'
+
+
+class RelatedArticle(models.Model):
+    """
+    «Похожие новости» для детальной страницы: NEWS_RELATED_COUNT ближайших статей по тегам и тексту.
+    Строится командой build_related_articles и обновляется при сохранении статьи (news/related.py).
+    """
+    article = models.ForeignKey('Article', on_delete=models.CASCADE, related_name='related_links')
+    related = models.ForeignKey('Article', on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        db_table = 'RelatedArticles'
+        verbose_name = 'Похожая статья'
+        verbose_name_plural = 'Похожие статьи'
+        unique_together = ('article', 'related')
+        # список похожих для детальной страницы — один проход по индексу
+        indexes = [
+            models.Index(fields=['article', '-score'], name='related_article_score_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.article_id} -> {self.related_id}: {self.score:.3f}'
+
+
+class ArticleMonth(models.Model):
+    """
+    Месяцы, в которых опубликованы статьи (в часовом поясе TIME_ZONE), и количество статей за месяц.
+    Иерархия дат в админке для больших таблиц читает годы и месяцы отсюда (news/large_changelist.py).
+    """
+    month = models.DateField(unique=True, verbose_name='Месяц')
+    # все статьи, включая неактивные; поддерживается сигналами из news/signals.py и массовой загрузкой
+    articles_count = models.PositiveIntegerField(default=0, verbose_name='Количество статей')
+
+    class Meta:
+        db_table = 'ArticleMonths'
+        verbose_name = 'Месяц публикаций'
+        verbose_name_plural = 'Месяцы публикаций'
+        ordering = ['month']
+
+    def __str__(self):
+        return f'{self.month:%Y-%m}: {self.articles_count}'
+
+
+class ContentFlag(models.Model):
+    """
+    Ключевое слово, которое админ хочет видеть отдельной колонкой и фильтром в списке статей.
+    Совпадения хранятся в ArticleFlags и обновляются при сохранении и загрузке статей (news/content_flags.py).
+    """
+    name = models.CharField(max_length=100, verbose_name='Название')
+    # ищется в тексте статьи как подстрока, с учётом регистра
+    keyword = models.CharField(max_length=100, unique=True, verbose_name='Ключевое слово')
+    # совпадения посчитаны для всех статей (команда backfill_content_flags); до этого фильтр ищет по тексту
+    is_ready = models.BooleanField(default=False, editable=False, verbose_name='Посчитано')
+
+    class Meta:
+        db_table = 'ContentFlags'
+        verbose_name = 'Ключевое слово'
+        verbose_name_plural = 'Ключевые слова'
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
+class ArticleFlag(models.Model):
+    """Статья содержит ключевое слово флага"""
+    article = models.ForeignKey('Article', on_delete=models.CASCADE, related_name='flag_links')
+    flag = models.ForeignKey('ContentFlag', on_delete=models.CASCADE, related_name='article_links')
+
+    class Meta:
+        db_table = 'ArticleFlags'
+        verbose_name = 'Ключевое слово статьи'
+        verbose_name_plural = 'Ключевые слова статей'
+        unique_together = ('article', 'flag')
+        # фильтр админки «есть / нет слова»: статьи флага по индексу, без просмотра текстов
+        indexes = [
+            models.Index(fields=['flag', 'article'], name='article_flags_flag_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.article_id}: {self.flag_id}'
@@ -0,0 +1,90 @@
+"""
+Данные навигации, общие для всех страниц: меню, категории с количеством статей, облако тегов
+и счётчики сайта.
+
+Хранятся в памяти процесса не дольше NEWS_NAVIGATION_TIMEOUT секунд и сбрасываются при каждом
+page_cache.purge('sidebar') — то есть при тех же изменениях, после которых устаревает боковая панель
+в кэше страниц. На прогретом кэше шаблоны получают навигацию без запросов к БД.
+
+Сброс виден только процессу, в котором он произошёл. Остальные воркеры (gunicorn, uvicorn) до
+истечения NEWS_NAVIGATION_TIMEOUT показывают старые категории, счётчики и облако тегов — и на страницах,
+которые они рендерят, и в кэше страниц, куда эти страницы попадают. Если такая задержка недопустима,
+уменьшите таймаут.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from .models import Category
+from .tag_cloud import load_tag_cloud
+
+MENU = (
+    {"title": "Главная",
+     "url": "/",
+     "url_name": "index"},
+    {"title": "О проекте",
+     "url": "/about/",
+     "url_name": "about"},
+    {"title": "Каталог",
+     "url": "/news/catalog/",
+     "url_name": "news:catalog"},
+    {"title": "Избранное",
+     "url": "/news/favorites/",
+     "url_name": "news:favorites"},
+)
+
+_lock = threading.Lock()
+# (данные, момент устаревания по time.monotonic()) или None
+_entry = None
+# увеличивается при каждом сбросе: данные, прочитанные до сброса, не попадут в кэш
+_generation = 0
+
+
+def _get_timeout():
+    return getattr(settings, 'NEWS_NAVIGATION_TIMEOUT', 60)
+
+
+def _load():
+    categories_with_count = [
+        {'category': category, 'news_count': category.articles_count}
+        for category in Category.objects.all()
+    ]
+    return {
+        'menu': MENU,
+        'categories_with_count': categories_with_count,
+        # сумма счётчиков категорий равна количеству активных статей
+        'news_count': sum(item['news_count'] for item in categories_with_count),
+        'users_count': get_user_model().objects.filter(is_active=True).count(),
+        'tag_cloud': load_tag_cloud(),
+    }
+
+
+def get_navigation(request=None):
+    """
+    Возвращает навигацию из кэша процесса, при необходимости загружая её из БД.
+    Если передан request, результат запоминается на нём: все шаблоны запроса видят одни и те же данные.
+    """
+    global _entry
+    if request is not None and hasattr(request, '_news_navigation'):
+        return request._news_navigation
+    entry = _entry
+    if entry is None or entry[1] <= time.monotonic():
+        with _lock:
+            entry = _entry
+            if entry is None or entry[1] <= time.monotonic():
+                generation = _generation
+                entry = (_load(), time.monotonic() + _get_timeout())
+                if generation == _generation:
+                    _entry = entry
+    if request is not None:
+        request._news_navigation = entry[0]
+    return entry[0]
+
+
+def invalidate():
+    """Сбрасывает навигацию в текущем процессе (вызывается из page_cache.purge('sidebar'))"""
+    global _entry, _generation
+    _generation += 1
+    _entry = None
@@ -0,0 +1,205 @@
+"""
+Кэш целых страниц каталога для посетителей без лайков и избранного.
+
+Каждая запись помечается метками зависимостей ('catalog', 'sidebar', 'category:<id>', 'tag:<id>').
+У каждой метки в кэше хранится номер версии; запись считается актуальной, только если
+версии всех её меток не изменились с момента сохранения. Сброс метки — это увеличение её версии,
+поэтому инвалидируются только зависящие от неё страницы, а бэкенду кэша не нужен поиск по шаблону
+ключей: подходят и LocMemCache, и FileBasedCache.
+"""
+import hashlib
+import re
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+from . import navigation
+from .models import Like, Favorite
+
+KEY_PREFIX = 'news:page'
+# параметры GET, от которых зависит содержимое страницы
+VARY_PARAMS = ('sort', 'order', 'page', 'after', 'before')
+CSRF_PLACEHOLDER = '__news_page_cache_csrf_token__'
+CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def _get_cache():
+    return caches[getattr(settings, 'NEWS_PAGE_CACHE', 'default')]
+
+
+def _get_timeout():
+    return getattr(settings, 'NEWS_PAGE_CACHE_TIMEOUT', 300)
+
+
+def _tag_version_key(tag):
+    return f'{KEY_PREFIX}:tag:{tag}'
+
+
+def _page_key(request, view_name, args, kwargs):
+    params = '&'.join(f'{name}={request.GET.get(name, "")}' for name in VARY_PARAMS)
+    raw = f'{view_name}|{args}|{sorted(kwargs.items())}|{params}'
+    return f'{KEY_PREFIX}:entry:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def _get_tag_versions(cache, tags):
+    keys = {_tag_version_key(tag): tag for tag in tags}
+    stored = cache.get_many(keys)
+    versions = {}
+    for key, tag in keys.items():
+        if key not in stored:
+            # у новой (или вытесненной из кэша) метки версии нет — заводим её от текущего времени,
+            # чтобы она не совпала с версией, записанной в старых страницах
+            initial = time.time_ns()
+            cache.add(key, initial, timeout=None)
+            stored[key] = cache.get(key, initial)
+        versions[tag] = stored[key]
+    return versions
+
+
+def current_versions(tags):
+    """Текущие версии меток — для других кэшей, которые сбрасываются теми же purge (см. fragment_cache)"""
+    return _get_tag_versions(_get_cache(), tags)
+
+
+def depends_on(request, *tags):
+    """
+    Добавляет метки зависимостей для страницы, которая сейчас рендерится.
+    Версии меток запоминаются в момент вызова, поэтому метки стоит добавлять до чтения данных из БД:
+    если страницу инвалидируют во время рендера, сохранённая запись сразу окажется устаревшей.
+    """
+    versions = getattr(request, '_page_cache_versions', None)
+    if versions is None:
+        return
+    new_tags = [tag for tag in tags if tag not in versions]
+    if new_tags:
+        versions.update(_get_tag_versions(_get_cache(), new_tags))
+
+
+def depends_on_articles(request, articles):
+    """Страница зависит от категорий и тегов показанных на ней статей"""
+    for article in articles:
+        depends_on(request, f'category:{article.category_id}')
+        depends_on(request, *(f'tag:{tag.pk}' for tag in article.tags.all()))
+
+
+def purge(*tags):
+    """Инвалидирует все страницы, помеченные хотя бы одной из меток"""
+    if 'sidebar' in tags:
+        # навигация в памяти процесса зависит от тех же данных, что и боковая панель
+        navigation.invalidate()
+    cache = _get_cache()
+    for tag in set(tags):
+        try:
+            cache.incr(_tag_version_key(tag))
+        except ValueError:
+            # версии не было — значит, и страниц с этой меткой в кэше нет
+            pass
+
+
+def purge_categories(category_ids, article_ids=()):
+    """Для массовых изменений статей через update(), которые не вызывают сигналы; article_ids — чьи карточки сбросить"""
+    purge('catalog', 'sidebar', *(f'category:{category_id}' for category_id in category_ids),
+          *(f'card:article:{article_id}' for article_id in article_ids))
+
+
+def mark_visitor_state_changed(ip_address):
+    """Вызывается при лайке/избранном: посетитель мог перейти в категорию персонализированных"""
+    _get_cache().delete(f'{KEY_PREFIX}:visitor:{ip_address}')
+
+
+def _visitor_has_state(ip_address):
+    """Есть ли у посетителя лайки или избранное; результат кэшируется, чтобы не ходить в БД на каждый запрос"""
+    cache = _get_cache()
+    key = f'{KEY_PREFIX}:visitor:{ip_address}'
+    has_state = cache.get(key)
+    if has_state is None:
+        has_state = (
+            Like.objects.filter(ip_address=ip_address).exists()
+            or Favorite.objects.filter(ip_address=ip_address).exists()
+        )
+        cache.set(key, has_state, timeout=_get_timeout())
+    return has_state
+
+
+def _is_cacheable_request(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    # страницы с отмеченными лайками и избранным у каждого посетителя свои
+    return not _visitor_has_state(request.META.get('REMOTE_ADDR'))
+
+
+def _cached_response(request, key):
+    """Ответ из кэша, если версии всех меток записи не изменились"""
+    cache = _get_cache()
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    current_versions = _get_tag_versions(cache, entry['versions'])
+    if current_versions != entry['versions']:
+        return None
+    content = entry['content'].replace(CSRF_PLACEHOLDER, get_token(request))
+    response = HttpResponse(content, content_type=entry['content_type'])
+    response['X-Page-Cache'] = 'hit'
+    return response
+
+
+def _store_response(request, key, response):
+    if response.status_code == 200 and not response.streaming:
+        content = CSRF_INPUT_RE.sub(rf'\g<1>{CSRF_PLACEHOLDER}\g<2>', response.content.decode(response.charset))
+        _get_cache().set(key, {
+            'content': content,
+            'content_type': response['Content-Type'],
+            'versions': request._page_cache_versions,
+        }, timeout=_get_timeout())
+        response['X-Page-Cache'] = 'miss'
+    return response
+
+
+def _start_recording(request, static_tags):
+    request._page_cache_versions = {}
+    depends_on(request, *static_tags)
+
+
+def cache_page_with_tags(*static_tags):
+    """
+    Декоратор view: кэширует ответ целиком с метками static_tags и метками,
+    добавленными во время рендера через depends_on/depends_on_articles.
+    CSRF-токен в формах подставляется заново для каждого посетителя.
+    Подходит и для обычных, и для async views.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                # проверка посетителя ходит в БД (сессия, лайки), поэтому выполняется в потоке
+                if not await sync_to_async(_is_cacheable_request)(request):
+                    return await view(request, *args, **kwargs)
+                key = _page_key(request, view.__name__, args, kwargs)
+                response = await sync_to_async(_cached_response)(request, key)
+                if response is not None:
+                    return response
+                await sync_to_async(_start_recording)(request, static_tags)
+                response = await view(request, *args, **kwargs)
+                return await sync_to_async(_store_response)(request, key, response)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _is_cacheable_request(request):
+                return view(request, *args, **kwargs)
+            key = _page_key(request, view.__name__, args, kwargs)
+            response = _cached_response(request, key)
+            if response is not None:
+                return response
+            _start_recording(request, static_tags)
+            response = view(request, *args, **kwargs)
+            return _store_response(request, key, response)
+        return wrapper
+    return decorator
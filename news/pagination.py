@@ -0,0 +1,254 @@
+"""
+Курсорная (keyset) пагинация для каталога.
+
+Django Paginator делает COUNT(*) и OFFSET, поэтому глубокие страницы становятся всё медленнее.
+KeysetPaginator листает по ключу (поле сортировки, id): ссылки «следующая»/«предыдущая»
+содержат курсор ?after=/?before= и стоят одного индексного запроса на любой глубине.
+Старые ссылки вида ?page=N продолжают работать через OFFSET без COUNT — для первых страниц это дёшево.
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q, QuerySet
+
+from .trending import TRENDING_SORT, with_trending_score
+
+PER_PAGE = 15
+# параметры GET, которые отвечают за страницу и не переносятся в новые ссылки
+PAGE_PARAMS = ('page', 'after', 'before')
+SORT_FIELDS = ('publication_date', 'views', 'like_count', TRENDING_SORT)
+
+
+def get_sort_params(request):
+    """Читает и проверяет параметры sort и order из GET-запроса"""
+    sort = request.GET.get('sort', 'publication_date')  # по умолчанию сортируем по дате загрузки
+    order = request.GET.get('order', 'desc')  # по умолчанию сортируем по убыванию
+    if sort not in SORT_FIELDS:
+        sort = 'publication_date'
+    if order != 'asc':
+        order = 'desc'
+    return sort, order
+
+
+class KeysetPage:
+    """Страница результатов; в шаблоне используется так же, как Page из Paginator"""
+
+    def __init__(self, object_list, request, number=None, next_params=None, previous_params=None):
+        self.object_list = object_list
+        self.number = number
+        self.next_query = self._build_query(request, next_params)
+        self.previous_query = self._build_query(request, previous_params)
+
+    @staticmethod
+    def _build_query(request, params):
+        if params is None:
+            return None
+        query = request.GET.copy()
+        for name in PAGE_PARAMS:
+            query.pop(name, None)
+        query.update(params)
+        return query.urlencode()
+
+    def has_next(self):
+        return self.next_query is not None
+
+    def has_previous(self):
+        return self.previous_query is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+def _number_from_request(request):
+    try:
+        return max(int(request.GET.get('page', 1)), 1)
+    except (TypeError, ValueError):
+        # Если параметр page не является числом, выводим первую страницу
+        return 1
+
+
+def _page_by_number(request, rows, number, per_page):
+    return KeysetPage(
+        rows[:per_page],
+        request,
+        number=number,
+        next_params={'page': number + 1} if len(rows) > per_page else None,
+        previous_params={'page': number - 1} if number > 1 else None,
+    )
+
+
+def paginate_by_number(request, results, per_page=PER_PAGE):
+    """
+    Пагинация по номеру страницы без COUNT(*): берём на одну запись больше,
+    чтобы узнать, есть ли следующая страница. Подходит для результатов поиска,
+    которые отсортированы по релевантности и не имеют ключа для курсора.
+    """
+    number = _number_from_request(request)
+    offset = (number - 1) * per_page
+    return _page_by_number(request, list(results[offset:offset + per_page + 1]), number, per_page)
+
+
+async def apaginate_by_number(request, results, per_page=PER_PAGE):
+    """Асинхронный вариант paginate_by_number для queryset или RankedSearchResults"""
+    number = _number_from_request(request)
+    offset = (number - 1) * per_page
+    if isinstance(results, QuerySet):
+        rows = [row async for row in results[offset:offset + per_page + 1]]
+    else:
+        # RankedSearchResults читает статьи из БД синхронно прямо при взятии среза
+        rows = await sync_to_async(lambda: list(results[offset:offset + per_page + 1]))()
+    return _page_by_number(request, rows, number, per_page)
+
+
+class KeysetPaginator:
+    def __init__(self, queryset, sort='publication_date', order='desc', per_page=PER_PAGE):
+        # второй ключ сортировки, чтобы порядок был однозначным при равных значениях поля
+        self.tiebreaker = 'pk'
+        if sort == TRENDING_SORT:
+            # рейтинг лежит в отдельной таблице ArticleTrends (news/trending.py); при равенстве сортируем
+            # по её article_id (он равен id статьи), чтобы хватило индекса (score, article_id)
+            queryset = with_trending_score(queryset)
+            self.tiebreaker = 'trend__article'
+        self.queryset = queryset
+        self.sort = sort
+        self.descending = order != 'asc'
+        self.per_page = per_page
+
+    # --- курсоры ---
+
+    def encode_cursor(self, article):
+        # article — статья или строка values() из JSON API (news/api.py)
+        if isinstance(article, dict):
+            value, pk = article[self.sort], article['id']
+        else:
+            value, pk = getattr(article, self.sort), article.pk
+        raw = f'{value.isoformat() if isinstance(value, datetime) else value}|{pk}'
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает (значение поля сортировки, id) или None, если курсор испорчен"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            value, pk = raw.rsplit('|', 1)
+            if self.sort == 'publication_date':
+                value = datetime.fromisoformat(value)
+            else:
+                value = float(value) if self.sort == TRENDING_SORT else int(value)
+            return value, int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            return None
+
+    # --- запросы ---
+
+    def _ordered(self, reverse=False):
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        return self.queryset.order_by(f'{prefix}{self.sort}', f'{prefix}{self.tiebreaker}')
+
+    def _seek(self, key, reverse=False):
+        """Фильтр «строго после ключа» в направлении сортировки (или против него при reverse)"""
+        value, pk = key
+        descending = self.descending != reverse
+        lookup = 'lt' if descending else 'gt'
+        # отдельное условие «<=»/«>=» по полю сортировки даёт индексу границу диапазона,
+        # иначе из-за OR база сканирует индекс с самого начала
+        bound = Q(**{f'{self.sort}__{lookup}e': value})
+        return bound & (Q(**{f'{self.sort}__{lookup}': value}) | Q(**{f'{self.tiebreaker}__{lookup}': pk}))
+
+    def get_page(self, request):
+        """Выбирает страницу по параметрам after, before или page из GET-запроса"""
+        queryset, build_page = self._plan(request)
+        page = build_page(list(queryset))
+        if page is None:
+            queryset, build_page = self._last_page_plan(request)
+            page = build_page(list(queryset))
+        return page
+
+    async def aget_page(self, request):
+        """То же, что get_page, но через асинхронный ORM — для async views под ASGI"""
+        queryset, build_page = self._plan(request)
+        page = build_page([row async for row in queryset])
+        if page is None:
+            queryset, build_page = self._last_page_plan(request)
+            page = build_page([row async for row in queryset])
+        return page
+
+    # Каждая страница — это один запрос и функция, которая строит KeysetPage из его строк.
+    # Запрос выполняют get_page/aget_page, поэтому логика пагинации общая для sync и async views.
+
+    def _plan(self, request):
+        for param, plan in (('after', self._after_plan), ('before', self._before_plan)):
+            cursor = request.GET.get(param)
+            if cursor:
+                key = self.decode_cursor(cursor)
+                if key is not None:
+                    return plan(request, key)
+        return self._number_plan(request, _number_from_request(request))
+
+    def _number_plan(self, request, number):
+        offset = (number - 1) * self.per_page
+
+        def build_page(rows):
+            if not rows and number > 1:
+                # Если страница выходит за пределы доступных, выводим последнюю
+                return None
+            items = rows[:self.per_page]
+            return KeysetPage(
+                items,
+                request,
+                number=number,
+                next_params={'after': self.encode_cursor(items[-1])} if len(rows) > self.per_page else None,
+                previous_params={'before': self.encode_cursor(items[0])} if number > 1 else None,
+            )
+        return self._ordered()[offset:offset + self.per_page + 1], build_page
+
+    def _after_plan(self, request, key):
+        def build_page(rows):
+            items = rows[:self.per_page]
+            return KeysetPage(
+                items,
+                request,
+                next_params={'after': self.encode_cursor(items[-1])} if len(rows) > self.per_page else None,
+                previous_params={'before': self.encode_cursor(items[0])} if items else None,
+            )
+        return self._ordered().filter(self._seek(key))[:self.per_page + 1], build_page
+
+    def _before_plan(self, request, key):
+        def build_page(rows):
+            items = rows[:self.per_page][::-1]
+            if len(rows) <= self.per_page:
+                # дошли до начала списка — это первая страница
+                return KeysetPage(
+                    items,
+                    request,
+                    number=1,
+                    next_params={'after': self.encode_cursor(items[-1])} if items else None,
+                )
+            return KeysetPage(
+                items,
+                request,
+                next_params={'after': self.encode_cursor(items[-1])},
+                previous_params={'before': self.encode_cursor(items[0])},
+            )
+        return self._ordered(reverse=True).filter(self._seek(key, reverse=True))[:self.per_page + 1], build_page
+
+    def _last_page_plan(self, request):
+        def build_page(rows):
+            items = rows[:self.per_page][::-1]
+            return KeysetPage(
+                items,
+                request,
+                previous_params={'before': self.encode_cursor(items[0])} if len(rows) > self.per_page else None,
+            )
+        return self._ordered(reverse=True)[:self.per_page + 1], build_page
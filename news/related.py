@@ -0,0 +1,304 @@
+"""
+«Похожие новости» для детальной страницы статьи.
+
+Сходство двух статей — взвешенная сумма коэффициента Жаккара по тегам и косинусной близости
+TF-IDF векторов заголовка и текста (NEWS_RELATED_TAG_WEIGHT — доля тегов). Для каждой активной
+статьи в таблице RelatedArticles хранятся NEWS_RELATED_COUNT самых похожих, детальная страница
+читает их одним запросом по индексу (article_id, score).
+
+build_related() пересчитывает таблицу целиком (команда build_related_articles, например раз в сутки).
+Вместо сравнения всех пар строятся инвертированные списки «слово → статьи» и «тег → статьи» в порядке id,
+и каждая статья сравнивается только со статьями, у которых есть общее слово или тег: это то же
+произведение разреженных матриц A·Aᵀ, посчитанное по строкам. Чтобы популярные теги и слова
+не превращали расчёт в квадратичный, из каждого списка берутся WINDOW ближайших по id (то есть
+по времени публикации) статей с каждой стороны; для редких признаков это весь список.
+
+update_related() после изменения заголовка, текста, категории, активности или тегов статьи пересчитывает
+её список по кандидатам из тех же тегов, той же категории и текущих соседей, а затем вставляет статью
+в списки кандидатов, где она теперь входит в число самых похожих. Пересчёт читает тексты сотен кандидатов;
+при NEWS_RELATED_UPDATE_ON_SAVE = False он не выполняется, и списки обновляет только build_related_articles. IDF берётся из статистики последнего полного пересчёта.
+Статьи, у которых изменился список, получают новый updated_at: список виден на детальной странице
+(news/conditional.py). После полного пересчёта списки у браузеров обновятся при следующем изменении статьи.
+"""
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Article, RelatedArticle
+
+WORD_RE = re.compile(r'[a-zа-яё]{3,}')
+STOP_WORDS = frozenset((
+    'the', 'and', 'for', 'что', 'это', 'как', 'так', 'его', 'она', 'они', 'оно', 'для', 'или', 'при',
+    'без', 'над', 'под', 'про', 'все', 'всё', 'уже', 'еще', 'ещё', 'был', 'была', 'были', 'было', 'быть',
+    'который', 'которая', 'которые', 'также', 'этот', 'эта', 'эти', 'того', 'чтобы', 'после', 'только',
+))
+# слова заголовка весят больше слов текста
+TITLE_WEIGHT = 2
+# столько самых весомых слов остаётся в векторе статьи
+TERMS_PER_ARTICLE = 10
+# сколько соседей с каждой стороны берётся из списка статей с общим словом или тегом
+WINDOW = 20
+# сколько кандидатов брать на каждый тег и на категорию при инкрементальном пересчёте
+CANDIDATES_PER_SOURCE = 200
+MIN_SCORE = 0.05
+STATS_KEY = 'news:related:stats'
+BATCH_SIZE = 1000
+
+
+def _get_count():
+    return getattr(settings, 'NEWS_RELATED_COUNT', 5)
+
+
+def _get_tag_weight():
+    return getattr(settings, 'NEWS_RELATED_TAG_WEIGHT', 0.5)
+
+
+def _get_cache():
+    return caches[getattr(settings, 'NEWS_RELATED_CACHE', 'default')]
+
+
+def tokenize(text):
+    return [word for word in WORD_RE.findall(text.lower()) if word not in STOP_WORDS]
+
+
+def _term_counts(title, content):
+    counts = Counter(tokenize(content))
+    for word in tokenize(title):
+        counts[word] += TITLE_WEIGHT
+    return counts
+
+
+def _vector(counts, docs, df):
+    """TF-IDF вектор единичной длины: сублинейная частота × log(N / df), только самые весомые слова"""
+    weights = (
+        ((1 + math.log(count)) * math.log(max(docs, df.get(term, 1)) / df.get(term, 1)), term)
+        for term, count in counts.items()
+    )
+    top = heapq.nlargest(TERMS_PER_ARTICLE, (item for item in weights if item[0] > 0))
+    norm = math.sqrt(sum(weight * weight for weight, _ in top))
+    return {term: weight / norm for weight, term in top} if norm else {}
+
+
+def _combine(shared_tags, tags_count, other_tags_count, dot, tag_weight):
+    jaccard = shared_tags / (tags_count + other_tags_count - shared_tags) if shared_tags else 0.0
+    return tag_weight * jaccard + (1 - tag_weight) * dot
+
+
+def _similarity(tags, vector, other_tags, other_vector, tag_weight):
+    if len(vector) > len(other_vector):
+        vector, other_vector = other_vector, vector
+    dot = sum(weight * other_vector.get(term, 0.0) for term, weight in vector.items())
+    return _combine(len(tags & other_tags), len(tags), len(other_tags), dot, tag_weight)
+
+
+def _top(scores, count):
+    """Пары (id, сходство) самых похожих статей не слабее MIN_SCORE"""
+    return [item for item in heapq.nlargest(count, scores.items(), key=itemgetter(1)) if item[1] >= MIN_SCORE]
+
+
+def _load_tags(article_ids=None):
+    links = Article.tags.through.objects.filter(article__is_active=True)
+    if article_ids is not None:
+        links = links.filter(article_id__in=article_ids)
+    tags = defaultdict(set)
+    for article_id, tag_id in links.values_list('article_id', 'tag_id').iterator():
+        tags[article_id].add(tag_id)
+    return tags
+
+
+def build_related(log=None):
+    """Пересчитывает похожие статьи для всех активных статей. Возвращает количество записанных пар."""
+    count, tag_weight = _get_count(), _get_tag_weight()
+    ids, term_counts, df = [], [], Counter()
+    for pk, title, content in Article.objects.order_by('pk').values_list('pk', 'title', 'content').iterator():
+        counts = _term_counts(title, content)
+        ids.append(pk)
+        term_counts.append(counts)
+        df.update(counts.keys())
+    docs = len(ids)
+    tags = _load_tags()
+    if log:
+        log(f'Статей: {docs}, слов: {len(df)}')
+
+    # инвертированные списки признаков в порядке id; у статьи — её позиция в каждом списке
+    postings = defaultdict(list)
+    entries = []
+    for index, (pk, counts) in enumerate(zip(ids, term_counts)):
+        features = []
+        for term, weight in _vector(counts, docs, df).items():
+            posting = postings['w', term]
+            features.append((posting, len(posting), weight))
+            posting.append((index, weight))
+        for tag_id in tags.get(pk, ()):
+            posting = postings['t', tag_id]
+            features.append((posting, len(posting), None))
+            posting.append((index, None))
+        entries.append(features)
+    del term_counts
+
+    tag_counts = [len(tags.get(pk, ())) for pk in ids]
+    text_weight = 1 - tag_weight
+    relations = []
+    for index, pk in enumerate(ids):
+        shared_tags, dot = Counter(), defaultdict(float)
+        for posting, position, weight in entries[index]:
+            neighbours = posting[max(position - WINDOW, 0):position + WINDOW + 1]
+            if weight is None:
+                shared_tags.update(other for other, _ in neighbours)
+            else:
+                for other, other_weight in neighbours:
+                    dot[other] += weight * other_weight
+        # то же, что _combine, но без вызова функции на каждого кандидата
+        tags_count = tag_counts[index]
+        scores = {
+            other: tag_weight * shared / (tags_count + tag_counts[other] - shared)
+            for other, shared in shared_tags.items()
+        }
+        for other, value in dot.items():
+            scores[other] = scores.get(other, 0.0) + text_weight * value
+        scores.pop(index, None)
+        relations.extend(
+            RelatedArticle(article_id=pk, related_id=ids[other], score=score) for other, score in _top(scores, count)
+        )
+
+    with transaction.atomic():
+        RelatedArticle.objects.all().delete()
+        RelatedArticle.objects.bulk_create(relations, batch_size=BATCH_SIZE)
+    # слова, встретившиеся один раз, не сохраняем: для них df = 1 и так по умолчанию
+    _get_cache().set(STATS_KEY, {'docs': docs, 'df': {term: n for term, n in df.items() if n > 1}}, timeout=None)
+    return len(relations)
+
+
+def _replace_lists(lists):
+    """Перезаписывает списки похожих статей: {id статьи: [(id похожей, сходство), ...]}"""
+    if not lists:
+        return
+    RelatedArticle.objects.filter(article_id__in=lists).delete()
+    RelatedArticle.objects.bulk_create([
+        RelatedArticle(article_id=pk, related_id=related_id, score=score)
+        for pk, related in lists.items() for related_id, score in related
+    ], batch_size=BATCH_SIZE)
+
+
+def update_related(article_id):
+    """Пересчитывает похожие для одной статьи и обновляет её место в списках похожих статей"""
+    count, tag_weight = _get_count(), _get_tag_weight()
+    through = Article.tags.through.objects
+    # у кого статья сейчас в списке: их сходство с ней нужно пересчитать в любом случае
+    referrers = set(RelatedArticle.objects.filter(related_id=article_id).values_list('article_id', flat=True))
+    article = Article.objects.filter(pk=article_id).values_list('title', 'content', 'category_id').first()
+
+    with transaction.atomic():
+        if article is None:
+            # статья удалена или снята с публикации — убираем её из всех списков
+            RelatedArticle.objects.filter(Q(article_id=article_id) | Q(related_id=article_id)).delete()
+            changed = referrers
+        else:
+            changed = _update_article(article_id, article, referrers, count, tag_weight, through)
+        changed.discard(article_id)
+        if changed:
+            Article.all_objects.filter(pk__in=changed).update(updated_at=timezone.now())
+
+
+def _update_article(article_id, article, referrers, count, tag_weight, through):
+    title, content, category_id = article
+    tags = set(through.filter(article_id=article_id).values_list('tag_id', flat=True))
+    current = list(RelatedArticle.objects.filter(article_id=article_id).values_list('related_id', flat=True))
+
+    candidates = set(referrers) | set(current)
+    for tag_id in tags:
+        candidates.update(
+            through.filter(tag_id=tag_id).order_by('-article_id')
+            .values_list('article_id', flat=True)[:CANDIDATES_PER_SOURCE]
+        )
+    candidates.update(
+        Article.objects.filter(category_id=category_id).order_by('-pk')
+        .values_list('pk', flat=True)[:CANDIDATES_PER_SOURCE]
+    )
+    candidates.update(RelatedArticle.objects.filter(article_id__in=current).values_list('related_id', flat=True))
+    candidates.discard(article_id)
+
+    rows = list(Article.objects.filter(pk__in=candidates).values_list('pk', 'title', 'content'))
+    counts = {pk: _term_counts(other_title, other_content) for pk, other_title, other_content in rows}
+    counts[article_id] = _term_counts(title, content)
+    stats = _get_cache().get(STATS_KEY)
+    if stats is None:
+        # полного пересчёта ещё не было: IDF по самим кандидатам
+        stats = {'docs': len(counts), 'df': Counter(term for terms in counts.values() for term in terms)}
+    vectors = {pk: _vector(terms, stats['docs'], stats['df']) for pk, terms in counts.items()}
+    candidate_tags = _load_tags(counts.keys())
+
+    vector = vectors.pop(article_id)
+    scores = {
+        pk: _similarity(tags, vector, candidate_tags.get(pk, set()), other_vector, tag_weight)
+        for pk, other_vector in vectors.items()
+    }
+    lists = {article_id: _top(scores, count)}
+
+    existing = defaultdict(dict)
+    for pk, related_id, score in (
+        RelatedArticle.objects.filter(article_id__in=scores).exclude(related_id=article_id)
+        .values_list('article_id', 'related_id', 'score')
+    ):
+        existing[pk][related_id] = score
+    for pk, score in scores.items():
+        neighbours = existing[pk]
+        if pk not in referrers and score < MIN_SCORE:
+            continue
+        if pk not in referrers and len(neighbours) >= count and score <= min(neighbours.values()):
+            continue
+        lists[pk] = _top({**neighbours, article_id: score}, count)
+    _replace_lists(lists)
+    return set(lists)
+
+
+def schedule_update(article):
+    """
+    Пересчёт после коммита транзакции. Админка сохраняет статью, а затем её теги, поэтому
+    пересчёт запускается один раз на сохраняемый объект — уже с новыми тегами.
+    """
+    if not getattr(settings, 'NEWS_RELATED_UPDATE_ON_SAVE', True) or getattr(article, '_related_update_scheduled', False):
+        return
+    article._related_update_scheduled = True
+
+    def run():
+        article._related_update_scheduled = False
+        update_related(article.pk)
+    transaction.on_commit(run)
+
+
+def schedule_updates(article_ids):
+    """Пересчёт после коммита для статей, изменённых через update() без сигналов (действия админки)"""
+    article_ids = list(article_ids)
+    if not getattr(settings, 'NEWS_RELATED_UPDATE_ON_SAVE', True) or not article_ids:
+        return
+
+    def run():
+        for article_id in article_ids:
+            update_related(article_id)
+    transaction.on_commit(run)
+
+
+def related_articles(article_id):
+    """Похожие статьи для детальной страницы: id и заголовок, один запрос"""
+    return list(_related_queryset(article_id))
+
+
+async def arelated_articles(article_id):
+    return [row async for row in _related_queryset(article_id)]
+
+
+def _related_queryset(article_id):
+    return (
+        RelatedArticle.objects.filter(article_id=article_id, related__is_active=True)
+        .order_by('-score')
+        .values('related_id', 'related__title')[:_get_count()]
+    )
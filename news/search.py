@@ -0,0 +1,259 @@
+"""
+Полнотекстовый поиск по статьям.
+
+Бэкенд выбирается настройкой NEWS_SEARCH_BACKEND (путь к классу). Если она не задана,
+для PostgreSQL используется PostgresSearchBackend (tsvector + GIN индекс),
+для остальных БД (SQLite, тесты) — InvertedIndexSearchBackend в памяти процесса.
+Оба бэкенда стеммят русские слова и ранжируют совпадения в заголовке выше, чем в тексте.
+"""
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F
+from django.utils.module_loading import import_string
+
+from .models import Article
+from .stemmer import stem
+
+SEARCH_CONFIG = 'russian'
+# во сколько раз совпадение в заголовке весит больше совпадения в тексте
+TITLE_BOOST = 3
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+# служебные слова не индексируются, как и в конфигурации russian в PostgreSQL
+STOP_WORDS = frozenset('''
+    и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по только ее мне было вот
+    от меня еще нет о из ему теперь когда даже ну вдруг ли если уже или ни быть был него до вас нибудь опять
+    уж вам ведь там потом себя ничего ей может они тут где есть надо ней для мы тебя их чем была сам чтоб
+    без будто чего раз тоже себе под будет ж тогда кто этот того потому этого какой совсем ним здесь этом
+    один почти мой тем чтобы нее были куда зачем всех никогда можно при наконец два об другой хоть после
+    над больше тот через эти нас про всего них какая много разве три эту моя впрочем хорошо свою этой
+    перед иногда лучше чуть том нельзя такой им более всегда конечно всю между
+'''.split())
+
+
+@lru_cache(maxsize=100_000)
+def _stem(word):
+    return stem(word)
+
+
+def tokenize(text):
+    """Разбивает текст на слова, отбрасывает служебные и приводит остальные к основам"""
+    words = TOKEN_RE.findall((text or '').lower())
+    return [_stem(word) for word in words if word not in STOP_WORDS]
+
+
+class BaseSearchBackend:
+    def search(self, queryset, query):
+        """
+        Возвращает статьи из queryset, подходящие под запрос, отсортированные по релевантности.
+        Результат — queryset или последовательность, которую понимает Paginator.
+        """
+        raise NotImplementedError
+
+    def filter(self, queryset, query):
+        """Статьи из queryset, подходящие под запрос, без сортировки по релевантности (поиск в админке)"""
+        raise NotImplementedError
+
+    def update_article(self, article):
+        """Обновляет индекс для одной статьи (вызывается после Article.save)"""
+        raise NotImplementedError
+
+    def update_articles(self, article_ids):
+        """Обновляет индекс для пачки статей (массовая загрузка через bulk_create)"""
+        raise NotImplementedError
+
+    def remove_article(self, article_id):
+        """Убирает статью из индекса (вызывается после удаления)"""
+        raise NotImplementedError
+
+    def rebuild(self):
+        """Перестраивает индекс для всех статей, возвращает количество проиндексированных"""
+        raise NotImplementedError
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Поиск по колонке Article.search_vector с GIN индексом"""
+
+    @staticmethod
+    def vector():
+        return (
+            SearchVector('title', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('content', weight='B', config=SEARCH_CONFIG)
+        )
+
+    def search(self, queryset, query):
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        # веса по умолчанию для D, C, B, A: заголовок (A) весит больше текста (B)
+        weights = [0.1, 0.2, 1.0 / TITLE_BOOST, 1.0]
+        return (
+            queryset.filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F('search_vector'), search_query, weights=weights))
+            .order_by('-rank', '-publication_date', '-id')
+        )
+
+    def filter(self, queryset, query):
+        return queryset.filter(search_vector=SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch'))
+
+    def update_article(self, article):
+        Article.all_objects.filter(pk=article.pk).update(search_vector=self.vector())
+
+    def update_articles(self, article_ids):
+        Article.all_objects.filter(pk__in=article_ids).update(search_vector=self.vector())
+
+    def remove_article(self, article_id):
+        # строка удалена вместе с вектором, делать ничего не нужно
+        pass
+
+    def rebuild(self):
+        return Article.all_objects.update(search_vector=self.vector())
+
+
+class InvertedIndexSearchBackend(BaseSearchBackend):
+    """
+    Инвертированный индекс в памяти процесса: основа слова -> {id статьи: (tf в заголовке, tf в тексте)}.
+    Строится лениво при первом поиске и дальше обновляется по одной статье.
+    """
+    # больше этого количества результатов не отдаём: дальше первых страниц поиска всё равно не листают
+    MAX_RESULTS = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._documents = {}
+
+    def _index_document(self, article_id, title, content):
+        self._unindex_document(article_id)
+        title_terms = Counter(tokenize(title))
+        content_terms = Counter(tokenize(content))
+        for term in title_terms.keys() | content_terms.keys():
+            self._index[term][article_id] = (title_terms[term], content_terms[term])
+        self._documents[article_id] = title_terms.keys() | content_terms.keys()
+
+    def _unindex_document(self, article_id):
+        for term in self._documents.pop(article_id, ()):
+            postings = self._index.get(term)
+            if postings is not None:
+                postings.pop(article_id, None)
+                if not postings:
+                    del self._index[term]
+
+    def _ensure_index(self):
+        if self._index is None:
+            self.rebuild()
+
+    def rebuild(self):
+        with self._lock:
+            self._index = defaultdict(dict)
+            self._documents = {}
+            rows = Article.all_objects.values_list('pk', 'title', 'content').iterator(chunk_size=2000)
+            for article_id, title, content in rows:
+                self._index_document(article_id, title, content)
+            return len(self._documents)
+
+    def update_article(self, article):
+        # пока индекс не построен, обновлять нечего: он прочитает статью из БД при построении
+        if self._index is None:
+            return
+        with self._lock:
+            self._index_document(article.pk, article.title, article.content)
+
+    def update_articles(self, article_ids):
+        if self._index is None:
+            return
+        rows = Article.all_objects.filter(pk__in=article_ids).values_list('pk', 'title', 'content')
+        with self._lock:
+            for article_id, title, content in rows:
+                self._index_document(article_id, title, content)
+
+    def remove_article(self, article_id):
+        if self._index is None:
+            return
+        with self._lock:
+            self._unindex_document(article_id)
+
+    def rank(self, query):
+        """Возвращает id статей, содержащих все слова запроса, по убыванию tf-idf с учётом заголовка"""
+        self._ensure_index()
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            postings = [self._index.get(term, {}) for term in terms]
+            if not all(postings):
+                return []
+            total = len(self._documents)
+            candidates = set.intersection(*(set(p) for p in postings))
+            scores = {}
+            for term_postings in postings:
+                idf = math.log(1 + total / len(term_postings))
+                for article_id in candidates:
+                    title_tf, content_tf = term_postings[article_id]
+                    score = idf * (TITLE_BOOST * title_tf + content_tf)
+                    scores[article_id] = scores.get(article_id, 0) + score
+        ranked = sorted(scores, key=lambda article_id: (-scores[article_id], -article_id))
+        return ranked[:self.MAX_RESULTS]
+
+    def search(self, queryset, query):
+        return RankedSearchResults(queryset, self.rank(query))
+
+    def filter(self, queryset, query):
+        # не больше MAX_RESULTS самых релевантных статей
+        return queryset.filter(pk__in=self.rank(query))
+
+
+class RankedSearchResults:
+    """
+    Результаты поиска по индексу в памяти, совместимые с Paginator.
+    Порядок задаётся списком id, а из БД загружается только запрошенный срез,
+    поэтому страница стоит одного запроса без огромного ORDER BY CASE.
+    """
+
+    def __init__(self, queryset, ranked_ids):
+        self.queryset = queryset
+        if ranked_ids:
+            # отбрасываем статьи, которые не проходят фильтры queryset (например, неактивные)
+            allowed = set(queryset.filter(pk__in=ranked_ids).values_list('pk', flat=True))
+            ranked_ids = [article_id for article_id in ranked_ids if article_id in allowed]
+        self.ranked_ids = ranked_ids
+
+    def count(self):
+        return len(self.ranked_ids)
+
+    def __len__(self):
+        return len(self.ranked_ids)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            page_ids = self.ranked_ids[item]
+            # не in_bulk: queryset может быть values() из JSON API (news/api.py), там строки — словари
+            rows = self.queryset.filter(pk__in=page_ids) if page_ids else ()
+            articles = {row['id'] if isinstance(row, dict) else row.pk: row for row in rows}
+            return [articles[article_id] for article_id in page_ids if article_id in articles]
+        return self[item:item + 1][0]
+
+
+_backend = None
+
+
+def get_search_backend():
+    """Возвращает (и кэширует) экземпляр поискового бэкенда для текущих настроек"""
+    global _backend
+    if _backend is None:
+        backend_path = getattr(settings, 'NEWS_SEARCH_BACKEND', None)
+        if backend_path:
+            backend_class = import_string(backend_path)
+        elif connection.vendor == 'postgresql':
+            backend_class = PostgresSearchBackend
+        else:
+            backend_class = InvertedIndexSearchBackend
+        _backend = backend_class()
+    return _backend
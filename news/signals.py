@@ -0,0 +1,260 @@
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import content_flags, large_changelist, page_cache, related, tag_cloud
+from .models import Article, Category, Tag
+from .search import get_search_backend
+
+
+def _change_articles_count(category_id, delta):
+    """
+    Атомарно меняет счётчик статей категории на delta.
+    Не ниже нуля: статьи из loaddata (raw) в счётчике не учтены, а их удаление его уменьшает.
+    """
+    if category_id and delta:
+        Category.objects.filter(pk=category_id).update(articles_count=Greatest(F('articles_count') + delta, 0))
+
+
+@receiver(pre_save, sender=Article)
+def remember_article_state(sender, instance, raw, **kwargs):
+    """
+    Запоминаем категорию и активность статьи до сохранения, чтобы потом посчитать разницу и сбросить кэш,
+    а заголовок и текст — чтобы не пересчитывать похожие статьи, если они не изменились
+    """
+    instance._old_state = instance._old_text = None
+    if raw or instance.pk is None:
+        return
+    row = (
+        Article.all_objects.filter(pk=instance.pk)
+        .values_list('category_id', 'is_active', 'title', 'content').first()
+    )
+    if row is not None:
+        instance._old_state, instance._old_text = row[:2], row[2:]
+
+
+@receiver(pre_save, sender=Article)
+def fill_updated_at_on_load(sender, instance, raw, **kwargs):
+    """loaddata (raw) не вызывает auto_now, а в фикстурах до updated_at его нет: берём дату публикации"""
+    if raw and instance.updated_at is None:
+        instance.updated_at = instance.publication_date
+
+
+@receiver(post_save, sender=Article)
+def update_category_stats_on_save(sender, instance, created, raw, **kwargs):
+    """Обновляет счётчики категорий при создании статьи, смене категории и переключении is_active"""
+    if raw:
+        # при loaddata счётчики восстанавливаются командой rebuild_category_stats
+        return
+    deltas = {}
+    old_state = getattr(instance, '_old_state', None)
+    if old_state is not None:
+        old_category_id, old_is_active = old_state
+        if old_is_active:
+            deltas[old_category_id] = deltas.get(old_category_id, 0) - 1
+    if instance.is_active:
+        deltas[instance.category_id] = deltas.get(instance.category_id, 0) + 1
+    for category_id, delta in deltas.items():
+        _change_articles_count(category_id, delta)
+
+
+@receiver(post_delete, sender=Article)
+def update_category_stats_on_delete(sender, instance, **kwargs):
+    """Уменьшает счётчик категории при удалении активной статьи"""
+    if instance.is_active:
+        _change_articles_count(instance.category_id, -1)
+
+
+@receiver(post_save, sender=Article)
+def update_tag_stats_on_save(sender, instance, created, raw, **kwargs):
+    """Пересчитывает популярность тегов статьи, если статья стала активной или неактивной"""
+    old_state = getattr(instance, '_old_state', None)
+    if raw or old_state is None or old_state[1] == instance.is_active:
+        # у новой статьи тегов ещё нет, они добавятся через m2m_changed
+        return
+    Tag.objects.refresh_articles_count(instance.tags.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Article)
+def remember_article_tags(sender, instance, **kwargs):
+    """Связи с тегами удаляются каскадом без m2m_changed, поэтому запоминаем теги заранее"""
+    instance._tag_ids = list(instance.tags.values_list('pk', flat=True)) if instance.is_active else []
+
+
+@receiver(post_delete, sender=Article)
+def update_tag_stats_on_delete(sender, instance, **kwargs):
+    tag_ids = getattr(instance, '_tag_ids', None)
+    if tag_ids:
+        Tag.objects.refresh_articles_count(tag_ids)
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def update_tag_stats_on_tags_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Пересчитывает популярность только затронутых тегов.
+    Пересчёт, а не F('articles_count') ± 1: pk_set в remove может содержать теги, которых у статьи не было.
+    Боковая панель (метка 'sidebar', от неё зависят все страницы) сбрасывается, только если изменилось облако тегов.
+    """
+    if not reverse and not instance.is_active:
+        # неактивная статья в облаке тегов не учитывается
+        return
+    if action in ('pre_add', 'pre_remove', 'pre_clear'):
+        if action == 'pre_clear' and not reverse:
+            instance._cleared_tag_ids = list(instance.tags.values_list('pk', flat=True))
+        instance._tag_cloud_state = tag_cloud.cloud_state()
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # instance — тег
+        tag_ids = [instance.pk]
+    elif action == 'post_clear':
+        tag_ids = getattr(instance, '_cleared_tag_ids', [])
+    else:
+        tag_ids = pk_set
+    if tag_ids:
+        Tag.objects.refresh_articles_count(tag_ids)
+        if tag_cloud.cloud_state() != getattr(instance, '_tag_cloud_state', None):
+            page_cache.purge('sidebar')
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def touch_articles_on_tags_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Теги видны на детальной странице, поэтому их смена — новая версия статьи для ETag/Last-Modified"""
+    if action == 'pre_clear' and reverse:
+        # после очистки статьи тега уже не найти
+        instance._cleared_article_ids = list(instance.article.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        article_ids = [instance.pk]
+    elif action == 'post_clear':
+        article_ids = getattr(instance, '_cleared_article_ids', [])
+    else:
+        article_ids = pk_set
+    if article_ids:
+        Article.all_objects.filter(pk__in=article_ids).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Article)
+def update_search_index_on_save(sender, instance, **kwargs):
+    """Инкрементально обновляет поисковый индекс для сохранённой статьи"""
+    get_search_backend().update_article(instance)
+
+
+@receiver(post_delete, sender=Article)
+def update_search_index_on_delete(sender, instance, **kwargs):
+    get_search_backend().remove_article(instance.pk)
+
+
+@receiver(post_save, sender=Article)
+def update_article_months_on_save(sender, instance, created, raw, **kwargs):
+    """Месяц публикации для иерархии дат админки; дата публикации не редактируется, поэтому только при создании"""
+    if created and not raw:
+        large_changelist.add_months({large_changelist.month_of(instance.publication_date): 1})
+
+
+@receiver(post_delete, sender=Article)
+def update_article_months_on_delete(sender, instance, **kwargs):
+    large_changelist.remove_month(instance.publication_date)
+
+
+@receiver(post_save, sender=Article)
+def update_content_flags_on_save(sender, instance, raw, update_fields, **kwargs):
+    """Ключевые слова админки ищутся только в тексте статьи"""
+    if raw or (update_fields is not None and 'content' not in update_fields):
+        return
+    content_flags.update_article(instance)
+
+
+@receiver(post_save, sender=Article)
+def purge_page_cache_on_article_save(sender, instance, created, **kwargs):
+    """
+    Сбрасывает кэш страниц, на которых статья была или могла появиться.
+    Страницы тегов, где показана статья, зависят от её категории, поэтому отдельно их сбрасывать не нужно.
+    """
+    # card:article — закэшированная карточка статьи в списках (news/fragment_cache.py)
+    tags = {'catalog', f'category:{instance.category_id}', f'card:article:{instance.pk}'}
+    old_state = getattr(instance, '_old_state', None)
+    if old_state is not None:
+        tags.add(f'category:{old_state[0]}')
+    if created or old_state != (instance.category_id, instance.is_active):
+        # изменились счётчики статей в боковой панели
+        tags.add('sidebar')
+    page_cache.purge(*tags)
+
+
+@receiver(post_delete, sender=Article)
+def purge_page_cache_on_article_delete(sender, instance, **kwargs):
+    page_cache.purge('catalog', 'sidebar', f'category:{instance.category_id}', f'card:article:{instance.pk}')
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def purge_page_cache_on_tags_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Сбрасывает кэш при изменении тегов статьи (или статей тега)"""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        # instance — тег, pk_set — id статей
+        article_ids = pk_set or list(instance.article.values_list('pk', flat=True))
+        category_ids = Article.all_objects.filter(pk__in=article_ids).values_list('category_id', flat=True)
+        tags = {f'tag:{instance.pk}', *(f'category:{category_id}' for category_id in category_ids)}
+        tags.update(f'card:article:{article_id}' for article_id in article_ids)
+    else:
+        # instance — статья, pk_set — id тегов
+        tag_ids = pk_set or instance.tags.values_list('pk', flat=True)
+        tags = {f'category:{instance.category_id}', f'card:article:{instance.pk}',
+                *(f'tag:{tag_id}' for tag_id in tag_ids)}
+    # 'catalog' — ленты JSON API с тегами статей; облако тегов ('sidebar') сбрасывает обработчик выше
+    page_cache.purge('catalog', *tags)
+
+
+@receiver(post_save, sender=Article)
+def update_related_on_save(sender, instance, raw, update_fields, **kwargs):
+    """
+    Похожие статьи зависят от заголовка, текста, категории и активности (теги — в m2m_changed ниже).
+    Сохранение без изменений в них (статус проверки в админке, счётчики) пересчёт не запускает.
+    """
+    if raw or (update_fields is not None and not {'title', 'content', 'category', 'is_active'} & set(update_fields)):
+        return
+    old_state = getattr(instance, '_old_state', None)
+    if (old_state == (instance.category_id, instance.is_active)
+            and getattr(instance, '_old_text', None) == (instance.title, instance.content)):
+        return
+    related.schedule_update(instance)
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def update_related_on_tags_change(sender, instance, action, reverse, **kwargs):
+    # массовые изменения со стороны тега подхватит полный пересчёт build_related_articles
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        related.schedule_update(instance)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def purge_page_cache_for_category(sender, instance, **kwargs):
+    page_cache.purge('sidebar', f'category:{instance.pk}', f'card:category:{instance.pk}')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def purge_page_cache_for_tag(sender, instance, **kwargs):
+    # 'sidebar' — название тега есть в облаке тегов и в ответах JSON API
+    page_cache.purge('sidebar', f'tag:{instance.pk}', f'card:tag:{instance.pk}')
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def purge_sidebar_on_user_save(sender, instance, created, update_fields, **kwargs):
+    """Количество пользователей выводится на страницах сайта; last_login при входе его не меняет"""
+    if created or update_fields is None or 'is_active' in update_fields:
+        page_cache.purge('sidebar')
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def purge_sidebar_on_user_delete(sender, instance, **kwargs):
+    page_cache.purge('sidebar')
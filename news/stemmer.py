@@ -0,0 +1,66 @@
+"""
+Стеммер Портера для русского языка (алгоритм Snowball), без внешних зависимостей.
+Используется поисковым индексом в news/search.py, чтобы «кошки», «кошек» и «кошкам»
+находились по одному запросу.
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = re.compile(r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$')
+REFLEXIVE = re.compile(r'(с[яь])$')
+ADJECTIVE = re.compile(r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|ую|юю|ая|яя|ою|ею)$')
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)'
+    r'|((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$'
+)
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$'
+)
+RV = re.compile(rf'^(.*?[{VOWELS}])(.*)$')
+DERIVATIONAL = re.compile(rf'.*[^{VOWELS}]+[{VOWELS}].*ость?$')
+DERIVATIONAL_SUFFIX = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+I_ENDING = re.compile(r'и$')
+SOFT_SIGN = re.compile(r'ь$')
+DOUBLE_N = re.compile(r'нн$')
+
+
+def stem(word):
+    """Возвращает основу русского слова. Слова без гласных (и не русские) только приводятся к нижнему регистру."""
+    word = word.lower().replace('ё', 'е')
+    match = RV.match(word)
+    if not match:
+        return word
+    prefix, rv = match.groups()
+
+    # шаг 1: деепричастия, затем возвратные окончания, прилагательные/причастия, глаголы, существительные
+    result = PERFECTIVE_GERUND.sub('', rv, 1)
+    if result == rv:
+        rv = REFLEXIVE.sub('', rv, 1)
+        result = ADJECTIVE.sub('', rv, 1)
+        if result != rv:
+            rv = PARTICIPLE.sub('', result, 1)
+        else:
+            result = VERB.sub('', rv, 1)
+            rv = NOUN.sub('', rv, 1) if result == rv else result
+    else:
+        rv = result
+
+    # шаг 2: окончание «и»
+    rv = I_ENDING.sub('', rv, 1)
+
+    # шаг 3: словообразовательные суффиксы «ост»/«ость»
+    if DERIVATIONAL.match(rv):
+        rv = DERIVATIONAL_SUFFIX.sub('', rv, 1)
+
+    # шаг 4: мягкий знак, превосходная степень и двойное «н»
+    result = SOFT_SIGN.sub('', rv, 1)
+    if result == rv:
+        rv = SUPERLATIVE.sub('', rv, 1)
+        rv = DOUBLE_N.sub('н', rv, 1)
+    else:
+        rv = result
+
+    return prefix + rv
@@ -0,0 +1,71 @@
+"""
+Облако тегов для боковой панели списков новостей.
+
+Популярность тега — Tag.articles_count (количество активных статей), которое пересчитывается
+одним агрегирующим запросом и поддерживается сигналами при изменении тегов статей. Облако
+загружается вместе с навигацией (news/navigation.py) одним запросом, поэтому при рендере
+нет запросов на каждый тег.
+"""
+import math
+import random
+from functools import lru_cache
+
+from django.conf import settings
+from django.urls import reverse
+
+from .models import Tag
+
+# количество размеров шрифта в облаке: классы tag-cloud-1 … tag-cloud-5 в base.html
+WEIGHTS = 5
+
+
+def _get_size():
+    return getattr(settings, 'NEWS_TAG_CLOUD_SIZE', 30)
+
+
+@lru_cache(maxsize=4096)
+def tag_color(tag_id):
+    """
+    Цвет тега по его id. Свой генератор вместо random.seed не сбивает глобальный random,
+    а цвета остаются такими же, какие раньше давал фильтр random_color.
+    """
+    return f'#{random.Random(tag_id).randint(0, 0xFFFFFF):06x}'
+
+
+def _weight(count, low, high):
+    """Вес 1..WEIGHTS по логарифму количества статей: у популярных тегов разница не так велика"""
+    if high == low:
+        return (WEIGHTS + 1) // 2
+    return 1 + round((math.log(count) - low) / (high - low) * (WEIGHTS - 1))
+
+
+def _top_tags():
+    return Tag.objects.filter(articles_count__gt=0).order_by('-articles_count', 'name')[:_get_size()]
+
+
+def cloud_state():
+    """
+    Всё, от чего зависит облако: (id, название, количество статей) самых популярных тегов.
+    Сравнивается до и после изменения тегов статей, чтобы сбрасывать боковую панель, только когда облако изменилось.
+    """
+    return list(_top_tags().values_list('pk', 'name', 'articles_count'))
+
+
+def load_tag_cloud():
+    """Самые популярные теги (NEWS_TAG_CLOUD_SIZE штук) в алфавитном порядке, с весами и цветами"""
+    tags = list(_top_tags())
+    if not tags:
+        return []
+    low = math.log(min(tag.articles_count for tag in tags))
+    high = math.log(max(tag.articles_count for tag in tags))
+    return [
+        {
+            'tag': tag,
+            'count': tag.articles_count,
+            'weight': _weight(tag.articles_count, low, high),
+            'color': tag_color(tag.pk),
+            # ссылка считается один раз при загрузке навигации, а не на каждой странице
+            'url': reverse('news:article_by_tag', args=[tag.pk]),
+        }
+        for tag in sorted(tags, key=lambda tag: tag.name)
+    ]
@@ -0,0 +1,21 @@
+from django import template
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.contrib.admin.templatetags.base import InclusionAdminNode
+
+from ..large_changelist import month_hierarchy
+
+register = template.Library()
+
+
+def article_date_hierarchy(cl):
+    """date_hierarchy списка статей: для большой таблицы годы и месяцы берутся из ArticleMonths"""
+    if getattr(cl, 'large_table', False):
+        return month_hierarchy(cl)
+    return date_hierarchy(cl)
+
+
+@register.tag(name='article_date_hierarchy')
+def article_date_hierarchy_tag(parser, token):
+    return InclusionAdminNode(
+        parser, token, func=article_date_hierarchy, template_name='date_hierarchy.html', takes_context=False,
+    )
@@ -1,23 +1,35 @@
-import random
-
 from django import template
+from .. import fragment_cache
 from ..models import Like, Favorite
+from ..tag_cloud import tag_color
+from ..visitor_state import VisitorState
 
 register = template.Library()
 
 
 @register.filter(name='has_liked')
-def has_liked(article, ip_address):
-    return Like.objects.filter(article=article, ip_address=ip_address).exists()
+def has_liked(article, visitor_state):
+    # visitor_state загружен во view одним запросом на страницу, здесь только проверка по множеству
+    if isinstance(visitor_state, VisitorState):
+        return visitor_state.has_liked(article)
+    # для шаблонов, которые всё ещё передают IP адрес
+    return Like.objects.filter(article=article, ip_address=visitor_state).exists()
 
 
 @register.filter(name='has_favorited')
-def has_favorited(article, ip_address):
-    return Favorite.objects.filter(article=article, ip_address=ip_address).exists()
+def has_favorited(article, visitor_state):
+    if isinstance(visitor_state, VisitorState):
+        return visitor_state.has_favorited(article)
+    return Favorite.objects.filter(article=article, ip_address=visitor_state).exists()
+
+
+@register.simple_tag
+def article_cards(articles):
+    # неизменные части карточек читаются из кэша одним запросом на страницу, см. news/fragment_cache.py
+    return fragment_cache.render_cards(articles)
 
 
 @register.filter(name='random_color')
 def random_color(tag):
-    # Генерируем уникальный цвет для каждого тега на основе его ID
-    random.seed(tag.id)
-    return f'#{random.randint(0, 0xFFFFFF):06x}'
\ No newline at end of file
+    # цвет зависит только от ID тега и запоминается, глобальный random не трогаем
+    return tag_color(tag.id)
@@ -1,3 +1,1381 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import itertools
+import json
+import os
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import (
+    async_views, checks, content_flags, db_router, export, fragment_cache, large_changelist, metrics, navigation,
+    related, search, view_counter,
+)
+from . import urls as news_urls
+from .datagen import generate_news_data
+from .models import (
+    Article, ArticleFlag, ArticleMonth, Category, ContentFlag, Like, Favorite, RelatedArticle, Tag,
+)
+from .pagination import KeysetPaginator, SORT_FIELDS
+from .stemmer import stem
+from .trending import refresh_trending
+
+
+class QueryPlanTests(TestCase):
+    """
+    Регрессионные тесты планов запросов: каждый «горячий» запрос из news/views.py и шаблонных фильтров
+    должен идти по индексу, без последовательного сканирования таблицы и без отдельной сортировки.
+    Работают и на PostgreSQL, и на SQLite.
+    """
+    ARTICLES_COUNT = 3000
+    VISITORS_COUNT = 200
+    VISITOR_IP = '10.0.0.7'
+
+    @classmethod
+    def setUpTestData(cls):
+        categories = Category.objects.bulk_create(Category(name=f'Категория {i}') for i in range(10))
+        now = timezone.now()
+        articles = Article.all_objects.bulk_create(
+            Article(
+                title=f'Статья {i}',
+                content='Текст статьи',
+                category=categories[i % len(categories)],
+                publication_date=now - timedelta(minutes=i),
+                views=(i * 7919) % 1000,
+                slug=f'statya-{i}',
+                # небольшая доля неактивных статей, как в реальной базе
+                is_active=i % 20 != 0,
+            )
+            for i in range(cls.ARTICLES_COUNT)
+        )
+        likes = []
+        favorites = []
+        for visitor in range(cls.VISITORS_COUNT):
+            ip_address = f'10.0.{visitor // 250}.{visitor % 250}'
+            for article in articles[visitor::97][:10]:
+                likes.append(Like(article=article, ip_address=ip_address))
+                favorites.append(Favorite(article=article, ip_address=ip_address))
+        Like.objects.bulk_create(likes)
+        Favorite.objects.bulk_create(favorites)
+        Article.all_objects.refresh_reaction_counts()
+        refresh_trending()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.page_ids = [article.pk for article in articles[:15]]
+        cls.cursor_article = articles[len(articles) // 2]
+        cls.category = categories[3]
+
+    def assertIndexedPlan(self, queryset):
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            problems = [line for line in plan.splitlines()
+                        if 'Seq Scan' in line or line.strip().lstrip('->').strip().startswith(('Sort', 'Incremental Sort'))]
+        else:
+            problems = [line for line in plan.splitlines()
+                        if ('SCAN ' in line and 'USING' not in line) or 'TEMP B-TREE' in line]
+        self.assertFalse(problems, f'План запроса без индекса:\n{plan}\n\nSQL: {queryset.query}')
+
+    def test_catalog_first_page(self):
+        for sort in SORT_FIELDS:
+            for order in ('asc', 'desc'):
+                with self.subTest(sort=sort, order=order):
+                    paginator = KeysetPaginator(Article.objects.all(), sort, order)
+                    self.assertIndexedPlan(paginator._ordered()[:paginator.per_page + 1])
+
+    def test_catalog_cursor_pages(self):
+        for sort in SORT_FIELDS:
+            for order in ('asc', 'desc'):
+                for reverse in (False, True):
+                    with self.subTest(sort=sort, order=order, reverse=reverse):
+                        paginator = KeysetPaginator(Article.objects.all(), sort, order)
+                        # статья из середины списка; берётся через пагинатор, потому что рейтинг тренда — аннотация
+                        article = paginator._ordered()[len(self.page_ids) * 10]
+                        key = (getattr(article, sort), article.pk)
+                        queryset = paginator._ordered(reverse=reverse).filter(paginator._seek(key, reverse=reverse))
+                        self.assertIndexedPlan(queryset[:paginator.per_page + 1])
+
+    def test_category_listing(self):
+        # рейтинг тренда упорядочен индексом только для всего каталога: в категории его строки
+        # (их не больше, чем статей категории с активностью) сортируются после выборки
+        for sort in SORT_FIELDS[:-1]:
+            for order in ('asc', 'desc'):
+                with self.subTest(sort=sort, order=order):
+                    paginator = KeysetPaginator(Article.objects.filter(category=self.category), sort, order)
+                    self.assertIndexedPlan(paginator._ordered()[:paginator.per_page + 1])
+
+    def test_article_detail(self):
+        self.assertIndexedPlan(Article.objects.filter(pk=self.cursor_article.pk))
+        self.assertIndexedPlan(Article.objects.filter(slug=self.cursor_article.slug))
+
+    def test_visitor_state(self):
+        self.assertIndexedPlan(
+            Like.objects.filter(ip_address=self.VISITOR_IP, article_id__in=self.page_ids).values_list('article_id')
+        )
+        self.assertIndexedPlan(
+            Favorite.objects.filter(ip_address=self.VISITOR_IP, article_id__in=self.page_ids).values_list('article_id')
+        )
+
+    def test_visitor_has_state(self):
+        self.assertIndexedPlan(Like.objects.filter(ip_address=self.VISITOR_IP)[:1])
+        self.assertIndexedPlan(Favorite.objects.filter(ip_address=self.VISITOR_IP)[:1])
+
+    def test_favorites_page(self):
+        self.assertIndexedPlan(Article.objects.filter(favorites__ip_address=self.VISITOR_IP))
+
+    def test_like_counts(self):
+        self.assertIndexedPlan(Like.objects.filter(article_id=self.cursor_article.pk))
+
+
+class CategoryCounterTests(TestCase):
+    """Счётчики статей категорий сходятся с таблицей статей после сохранений, удалений и действий админки"""
+
+    def setUp(self):
+        self.science = Category.objects.create(name='Наука')
+        self.city = Category.objects.create(name='Город')
+
+    def assertCountsConsistent(self):
+        expected = {category.pk: category.article_set.filter(is_active=True).count() for category in Category.objects.all()}
+        self.assertEqual(dict(Category.objects.values_list('pk', 'articles_count')), expected)
+
+    def test_counts_follow_changes(self):
+        first = Article.objects.create(title='Первая', content='Текст', category=self.science)
+        second = Article.objects.create(title='Вторая', content='Текст', category=self.science)
+        self.assertCountsConsistent()
+
+        first.category = self.city
+        first.save()
+        second.is_active = False
+        second.save()
+        self.assertCountsConsistent()
+
+        second.delete()
+        first.delete()
+        self.assertCountsConsistent()
+
+    def test_uncounted_rows_do_not_go_negative(self):
+        # bulk_create, как и loaddata, сигналов не вызывает: статья в счётчике не учтена
+        [article] = Article.all_objects.bulk_create([
+            Article(title='Без счётчика', content='Текст', category=self.science, slug='bez-schetchika'),
+        ])
+        Article.all_objects.get(pk=article.pk).delete()
+        self.science.refresh_from_db()
+        self.assertEqual(self.science.articles_count, 0)
+
+    def test_admin_actions_recount(self):
+        tag = Tag.objects.create(name='космос')
+        articles = [Article.objects.create(title=f'Статья {i}', content='Текст', category=self.science) for i in range(3)]
+        for article in articles:
+            article.tags.add(tag)
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+        selected = [article.pk for article in articles[:2]]
+        self.client.post('/admin/news/article/', {'action': 'make_inactive', '_selected_action': selected})
+        self.assertCountsConsistent()
+        self.assertEqual(Category.objects.get(pk=self.science.pk).articles_count, 1)
+        self.assertEqual(Tag.objects.get(pk=tag.pk).articles_count, 1)
+
+        self.client.post('/admin/news/article/', {'action': 'make_active', '_selected_action': selected})
+        self.assertEqual(Category.objects.get(pk=self.science.pk).articles_count, 3)
+        self.assertEqual(Tag.objects.get(pk=tag.pk).articles_count, 3)
+
+        Category.objects.filter(pk=self.science.pk).update(articles_count=100)
+        call_command('rebuild_category_stats', stdout=StringIO())
+        self.assertCountsConsistent()
+
+
+@override_settings(VIEW_COUNTER_FLUSH_INTERVAL=30)
+class ViewCounterTests(TestCase):
+    """Отложенный счётчик просмотров: просмотры копятся в кэше и переносятся в БД одним UPDATE"""
+
+    def setUp(self):
+        cache.clear()
+        self.article = Article.objects.create(
+            title='Статья', content='Текст', category=Category.objects.create(name='Наука'),
+        )
+
+    def views(self):
+        return Article.all_objects.values_list('views', flat=True).get(pk=self.article.pk)
+
+    def test_buffer_and_flush(self):
+        # первый просмотр сразу сбрасывает буфер и берёт блокировку на интервал
+        view_counter.register_view(self.article.pk)
+        self.assertEqual(self.views(), 1)
+        with self.assertNumQueries(0):
+            for _ in range(5):
+                view_counter.register_view(self.article.pk)
+        self.assertEqual(self.views(), 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(view_counter.flush_views(), 1)
+        self.assertEqual(self.views(), 6)
+        # буфер пуст: повторный сброс ничего не пишет
+        with self.assertNumQueries(0):
+            self.assertEqual(view_counter.flush_views(), 0)
+
+    def test_survives_quiet_period(self):
+        view_counter.register_view(self.article.pk)
+        for _ in range(6):
+            view_counter.register_view(self.article.pk)
+        later = time.time() + 400
+        with mock.patch('time.time', return_value=later):
+            # первый просмотр после паузы длиннее интервала сбрасывает накопленное
+            view_counter.register_view(self.article.pk)
+        self.assertEqual(self.views(), 8)
+
+    def test_flush_during_increment(self):
+        view_counter.register_view(self.article.pk)
+        view_counter.register_view(self.article.pk)
+        counter_cache = view_counter._get_cache()
+        incr = counter_cache.incr
+
+        def incr_after_flush(key, *args, **kwargs):
+            # параллельный сброс удаляет ключ между add() и incr()
+            counter_cache.incr = incr
+            view_counter.flush_views()
+            return incr(key, *args, **kwargs)
+
+        with mock.patch.object(counter_cache, 'incr', incr_after_flush):
+            view_counter.register_view(self.article.pk)
+        view_counter.flush_views()
+        self.assertEqual(self.views(), 3)
+
+    def test_late_view_in_closed_generation(self):
+        view_counter.register_view(self.article.pk)
+        counter_cache = view_counter._get_cache()
+        generation = view_counter._current_generation(counter_cache)
+        view_counter.register_view(self.article.pk)
+        view_counter.flush_views()
+        # просмотр прочитал номер поколения до сброса и дописался в него уже после чтения буфера
+        view_counter._buffer_view(counter_cache, generation, self.article.pk)
+        view_counter.flush_views()
+        self.assertEqual(self.views(), 3)
+        view_counter.flush_views()
+        self.assertEqual(self.views(), 3)
+        # ключи закрытого поколения удалены, а не копятся в кэше
+        self.assertEqual([key for key in counter_cache._cache if f'{view_counter.KEY_PREFIX}:{generation}:' in key], [])
+
+    def test_deploy_check(self):
+        self.assertEqual([error.id for error in checks.check_view_counter_cache(None)], ['news.W001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp'}}
+        with self.settings(CACHES=shared):
+            self.assertEqual(checks.check_view_counter_cache(None), [])
+
+
+class SearchTests(TestCase):
+    """Стеммер, служебные слова, порядок по релевантности и обновление индекса при сохранении и удалении"""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Наука')
+        self.in_title = Article.objects.create(
+            title='Ракета стартовала', content='Запуск прошёл по плану.', category=category,
+        )
+        self.in_content = Article.objects.create(
+            title='Новости космодрома', content='Утром с космодрома ушла ракета.', category=category,
+        )
+        self.other = Article.objects.create(title='Рецепт пирога', content='Яблоки и корица.', category=category)
+        self.backend = search.get_search_backend()
+        # индекс живёт в памяти процесса и мог остаться от других тестов
+        self.backend.rebuild()
+
+    def test_stemming(self):
+        for forms, expected in (
+            (('вагон', 'вагона', 'вагонов', 'вагоном', 'вагоны'), 'вагон'),
+            (('кошка', 'кошки', 'кошке', 'кошкам'), 'кошк'),
+            (('важная', 'важнее', 'важнейшие', 'важного'), 'важн'),
+            (('ёлка', 'Ёлки'), 'елк'),
+        ):
+            for form in forms:
+                with self.subTest(form=form):
+                    self.assertEqual(stem(form), expected)
+        # слова без русских гласных не меняются, только регистр
+        self.assertEqual(stem('Python'), 'python')
+        self.assertEqual(stem('2025'), '2025')
+
+    def test_stop_words(self):
+        self.assertEqual(search.tokenize('И вот он на космодроме'), [stem('космодроме')])
+        self.assertEqual(self.backend.rank('и на в'), [])
+
+    def test_relevance_order(self):
+        # совпадение в заголовке весит больше, чем в тексте; «ракеты» находит «ракета»
+        self.assertEqual(self.backend.rank('ракеты'), [self.in_title.pk, self.in_content.pk])
+        # все слова запроса должны встретиться в статье
+        self.assertEqual(self.backend.rank('ракета космодрома'), [self.in_content.pk])
+        response = self.client.get('/news/search_news?q=ракетой')
+        self.assertEqual([article.pk for article in response.context['news']], [self.in_title.pk, self.in_content.pk])
+
+    def test_index_follows_save_and_delete(self):
+        self.other.title = 'Ракетный пирог'
+        self.other.content = 'Пирог в форме ракеты.'
+        self.other.save()
+        self.assertIn(self.other.pk, self.backend.rank('ракета'))
+        self.assertEqual(self.backend.rank('яблоки'), [])
+
+        self.in_title.delete()
+        self.assertNotIn(self.in_title.pk, self.backend.rank('ракета'))
+        self.assertEqual(self.backend.rank('стартовала'), [])
+
+
+class KeysetPaginatorTests(TestCase):
+    """Курсоры after/before: порядок при равных значениях поля, края списка и испорченные курсоры"""
+
+    def setUp(self):
+        category = Category.objects.create(name='Наука')
+        # равные просмотры у нескольких статей: порядок задаёт второй ключ (id)
+        for i, views in enumerate((5, 5, 5, 3, 3, 1, 1)):
+            Article.objects.create(title=f'Статья {i}', content='Текст', category=category, views=views)
+        self.expected = list(Article.objects.order_by('-views', '-pk').values_list('pk', flat=True))
+        self.factory = RequestFactory()
+
+    def page(self, query=''):
+        paginator = KeysetPaginator(Article.objects.all(), 'views', 'desc', per_page=3)
+        return paginator.get_page(self.factory.get(f'/news/catalog/?{query}'))
+
+    @staticmethod
+    def ids(page):
+        return [article.pk for article in page]
+
+    def test_forward_and_back(self):
+        page = self.page()
+        self.assertFalse(page.has_previous())
+        pages = [self.ids(page)]
+        while page.has_next():
+            page = self.page(page.next_query)
+            pages.append(self.ids(page))
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertEqual([len(ids) for ids in pages], [3, 3, 1])
+
+        # с последней страницы назад до первой — те же страницы в обратном порядке
+        back = []
+        while page.has_previous():
+            page = self.page(page.previous_query)
+            back.append(self.ids(page))
+        self.assertEqual(back, pages[-2::-1])
+        self.assertEqual(page.number, 1)
+        self.assertFalse(page.has_previous())
+
+    def test_page_numbers(self):
+        self.assertEqual(self.ids(self.page('page=2')), self.expected[3:6])
+        # номер за пределами списка — последняя страница
+        last = self.page('page=99')
+        self.assertEqual(self.ids(last), self.expected[-3:])
+        self.assertFalse(last.has_next())
+
+    def test_invalid_cursors(self):
+        for cursor in ('!!!', 'bm90LWEtY3Vyc29y', base64.urlsafe_b64encode(b'abc|1').decode()):
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.ids(self.page(f'after={cursor}')), self.expected[:3])
+        # подделанный, но корректный курсор — просто другое место в списке
+        cursor = base64.urlsafe_b64encode(f'5|{self.expected[0]}'.encode()).decode().rstrip('=')
+        self.assertEqual(self.ids(self.page(f'after={cursor}')), self.expected[1:4])
+
+
+class VisitorStateQueryTests(TestCase):
+    """Лайки и избранное посетителя загружаются одним запросом на страницу, а не запросом на каждую карточку"""
+    VISITOR_IP = '10.1.1.1'
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Наука')
+        tag = Tag.objects.create(name='космос')
+        for i in range(15):
+            article = Article.objects.create(title=f'Статья {i}', content='Текст', category=category)
+            article.tags.add(tag)
+            if i % 2:
+                Like.objects.create(article=article, ip_address=self.VISITOR_IP)
+            Favorite.objects.create(article=article, ip_address=self.VISITOR_IP)
+
+    def test_page_queries(self):
+        for url in ('/news/catalog/', '/news/favorites/'):
+            with self.subTest(url=url):
+                # первый запрос прогревает навигацию и карточки
+                self.client.get(url, REMOTE_ADDR=self.VISITOR_IP)
+                # статьи, их теги, лайки и избранное посетителя — на 15 карточек
+                with self.assertNumQueries(4):
+                    response = self.client.get(url, REMOTE_ADDR=self.VISITOR_IP)
+                self.assertEqual(response.content.decode().count('❤️\n'), 7)
+                self.assertContains(response, 'btn btn-danger rounded-pill', count=15)
+
+    def test_tag_page_count(self):
+        tag = Tag.objects.get()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/news/articles_by_tag/{tag.pk}', REMOTE_ADDR=self.VISITOR_IP)
+        # количество статей берётся из денормализованного Tag.articles_count, а не COUNT(*) по статьям тега
+        self.assertEqual(response.context['news_count'], 15)
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql'] and 'Articles' in query['sql']])
+
+
+class RequestMetricsTests(TestCase):
+    """Заголовок Server-Timing и предупреждения о превышении бюджета запросов"""
+
+    def setUp(self):
+        cache.clear()
+        self.article = Article.objects.create(
+            title='Статья', content='Текст', category=Category.objects.create(name='Наука'),
+        )
+
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/news/catalog/')
+        timing = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        self.assertEqual(set(timing), {'db', 'tpl', 'total', 'size'})
+        self.assertIn(f'desc="{len(queries)} queries"', timing['db'])
+        self.assertEqual(timing['size'], f'desc="{len(response.content)} bytes"')
+        with self.settings(NEWS_SERVER_TIMING=False):
+            self.assertNotIn('Server-Timing', self.client.get('/news/catalog/'))
+
+    def test_nested_render_timed_once(self):
+        inner = metrics._TimedTemplate(mock.Mock(render=lambda context, request: 'карточка'))
+        outer = metrics._TimedTemplate(mock.Mock(render=lambda context, request: inner.render()))
+        request_metrics = metrics.RequestMetrics()
+        token = metrics._current.set(request_metrics)
+        # часы сдвигаются на секунду при каждом чтении: внешний рендер — одно деление
+        clock = itertools.count()
+        try:
+            with mock.patch('time.perf_counter', lambda: next(clock)):
+                self.assertEqual(outer.render(), 'карточка')
+        finally:
+            metrics._current.reset(token)
+        self.assertEqual(request_metrics.template_time, 1)
+        self.assertEqual(request_metrics.template_depth, 0)
+
+    def test_budget_warning(self):
+        url = f'/news/catalog/{self.article.pk}/'
+        with self.assertNoLogs('news.metrics', 'WARNING'):
+            self.client.get(url)
+        with self.settings(NEWS_QUERY_BUDGETS={'news:detail_article_by_id': 1}), \
+                self.assertLogs('news.metrics', 'WARNING') as logs:
+            self.client.get(url)
+        self.assertIn('news:detail_article_by_id', logs.output[0])
+        self.assertIn('при бюджете 1', logs.output[0])
+
+    def test_streaming_queries_counted(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.get('/news/export/')
+        b''.join(response.streaming_content)
+        view_queries = int(response['Server-Timing'].split('desc="')[1].split()[0])
+        # бюджет покрывает представление, но не запросы статей и тегов при отдаче потока
+        with self.settings(NEWS_QUERY_BUDGETS={'news:export_articles': view_queries}):
+            with self.assertNoLogs('news.metrics', 'WARNING'):
+                response = self.client.get('/news/export/')
+            with self.assertLogs('news.metrics', 'WARNING') as logs:
+                b''.join(response.streaming_content)
+        self.assertIn(f'{view_queries + 2} запросов при бюджете {view_queries}', logs.output[0])
+
+    def test_admin_changelist_within_budget(self):
+        Article.objects.create(title='Пауки', content='В лесу живут пауки.', category=self.article.category)
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password'))
+        # первый запрос на холодном кэше: проверка размера таблицы для режима большой таблицы
+        with self.assertNoLogs('news.metrics', 'WARNING'):
+            self.assertEqual(self.client.get('/admin/news/article/').status_code, 200)
+
+
+class DataGenerationTests(TestCase):
+    def test_rerun_after_partial_run(self):
+        generate_news_data(3, seed=1, categories=2, tags=5, visitors=5, favorite_ratio=1)
+        # как после прерванного запуска: части статей нет, реакции остальных уже в базе
+        Article.all_objects.order_by('pk').last().delete()
+        likes, favorites = Like.objects.count(), Favorite.objects.count()
+        result = generate_news_data(3, seed=1, categories=2, tags=5, visitors=5, favorite_ratio=1)
+        self.assertEqual(Article.all_objects.count(), 3)
+        self.assertEqual(Favorite.objects.count(), Like.objects.count())
+        # в отчёте только созданные реакции, без пропущенных повторов
+        self.assertEqual(result.likes, Like.objects.count() - likes)
+        self.assertEqual(result.favorites, Favorite.objects.count() - favorites)
+
+    def test_inactive_ratio_option(self):
+        call_command('generate_news_data', articles=5, categories=2, tags=5, visitors=3, inactive_ratio=1,
+                     stdout=StringIO())
+        self.assertEqual(Article.all_objects.count(), 5)
+        self.assertFalse(Article.objects.exists())
+
+
+class BenchmarkSuiteTests(TestCase):
+    """Бенчмарк benchmark_views на маленьком наборе данных: команда отрабатывает и пишет полный JSON-отчёт"""
+
+    def test_benchmark_views_report(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command('benchmark_views', seed_articles=200, repeat=2, depth=3, json_path=path, stdout=StringIO())
+            with open(path, encoding='utf-8') as file:
+                report = json.load(file)
+
+        self.assertEqual(report['articles'], 200)
+        for sort in SORT_FIELDS:
+            for order in ('asc', 'desc'):
+                self.assertIn(f'catalog:{sort}:{order}', report['client'])
+        for name in ('catalog:cursor_page_3', 'catalog:offset_page_3', 'detail', 'favorites', 'like_toggle'):
+            result = report['client'][name]
+            self.assertGreater(result['requests'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        # после сценария like_toggle денормализованные счётчики сходятся с таблицей лайков
+        self.assertEqual(Like.objects.count(), Article.all_objects.aggregate(total=Sum('like_count'))['total'])
+
+    def test_like_toggle_restores_state(self):
+        generate_news_data(2, seed=1, visitors=5)
+        likes = set(Like.objects.values_list('article_id', 'ip_address'))
+        # статей меньше, чем повторов, и число повторов нечётное
+        call_command('benchmark_views', repeat=5, depth=1, stdout=StringIO())
+        self.assertEqual(set(Like.objects.values_list('article_id', 'ip_address')), likes)
+
+
+class PageCacheInvalidationTests(TestCase):
+    """Изменение статьи сбрасывает только страницы, которые от неё зависят"""
+
+    def setUp(self):
+        cache.clear()
+        self.science = Category.objects.create(name='Наука')
+        self.city = Category.objects.create(name='Город')
+        self.space = Tag.objects.create(name='космос')
+        self.roads = Tag.objects.create(name='дороги')
+        self.launch = Article.objects.create(title='Запуск', content='Текст', category=self.science)
+        self.launch.tags.add(self.space)
+        self.repair = Article.objects.create(title='Ремонт', content='Текст', category=self.city)
+        self.repair.tags.add(self.roads)
+        self.draft = Article.objects.create(title='Черновик', content='Текст', category=self.city, is_active=False)
+        self.urls = {
+            'main': '/',
+            'science': f'/news/articles_by_category/{self.science.pk}',
+            'city': f'/news/articles_by_category/{self.city.pk}',
+            'space': f'/news/articles_by_tag/{self.space.pk}',
+            'roads': f'/news/articles_by_tag/{self.roads.pk}',
+        }
+        for url in self.urls.values():
+            self.assertEqual(self.client.get(url)['X-Page-Cache'], 'miss')
+
+    def purged(self):
+        return {name for name, url in self.urls.items() if self.client.get(url)['X-Page-Cache'] == 'miss'}
+
+    def test_article_edit(self):
+        self.launch.title = 'Запуск ракеты'
+        self.launch.save()
+        # страница тега показывает статьи с учётом их категорий, поэтому сбрасывается вместе с категорией
+        self.assertEqual(self.purged(), {'science', 'space'})
+
+    def test_tags_of_inactive_article(self):
+        # облако тегов не изменилось: главная и чужие категории остаются в кэше
+        self.draft.tags.add(self.roads)
+        self.assertEqual(self.purged(), {'city', 'roads'})
+        self.roads.article.remove(self.draft)
+        self.assertEqual(self.purged(), {'city', 'roads'})
+
+    def test_tag_cloud_change(self):
+        # у тега стало больше статей — изменилось облако в боковой панели всех страниц
+        self.repair.tags.add(self.space)
+        self.assertEqual(self.purged(), set(self.urls))
+
+
+class ReactionCountTests(TestCase):
+    """Денормализованные like_count и favorite_count сходятся с таблицами Likes и Favorite"""
+
+    def setUp(self):
+        category = Category.objects.create(name='Наука')
+        self.first = Article.objects.create(title='Первая', content='Текст', category=category)
+        self.second = Article.objects.create(title='Вторая', content='Текст', category=category)
+
+    def counts(self, article):
+        return Article.all_objects.values_list('like_count', 'favorite_count').get(pk=article.pk)
+
+    def toggle(self, url, ip_address):
+        self.client.post(url, REMOTE_ADDR=ip_address)
+
+    def test_toggle_keeps_counts(self):
+        like_url = f'/news/like_toggle/{self.first.pk}'
+        favorite_url = f'/news/favorite/{self.first.pk}/'
+        for ip_address in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+            self.toggle(like_url, ip_address)
+        self.toggle(favorite_url, '10.0.0.1')
+        self.assertEqual(self.counts(self.first), (3, 1))
+
+        # повторный клик снимает отметку и уменьшает счётчик
+        self.toggle(like_url, '10.0.0.2')
+        self.toggle(favorite_url, '10.0.0.1')
+        self.assertEqual(self.counts(self.first), (2, 0))
+        self.assertEqual(self.counts(self.second), (0, 0))
+        self.assertEqual(Like.objects.filter(article=self.first).count(), 2)
+        self.assertFalse(Favorite.objects.exists())
+
+        # отметки удаляются вместе со статьёй
+        self.first.delete()
+        self.assertFalse(Like.objects.exists())
+
+    def test_audit_fixes_drift(self):
+        Like.objects.create(article=self.first, ip_address='10.0.0.1')
+        Favorite.objects.create(article=self.second, ip_address='10.0.0.1')
+        Article.all_objects.filter(pk=self.second.pk).update(like_count=5)
+
+        output = StringIO()
+        call_command('audit_reaction_counts', dry_run=True, stdout=output)
+        self.assertIn('Расхождений: 2', output.getvalue())
+        self.assertEqual(self.counts(self.first), (0, 0))
+
+        call_command('audit_reaction_counts', stdout=StringIO())
+        self.assertEqual(self.counts(self.first), (1, 0))
+        self.assertEqual(self.counts(self.second), (0, 1))
+        output = StringIO()
+        call_command('audit_reaction_counts', stdout=output)
+        self.assertIn('Счётчики совпадают', output.getvalue())
+
+    def test_refresh_selected_articles(self):
+        Like.objects.create(article=self.first, ip_address='10.0.0.1')
+        Like.objects.create(article=self.second, ip_address='10.0.0.1')
+        self.assertEqual(Article.all_objects.refresh_reaction_counts([self.first.pk]), 1)
+        self.assertEqual(self.counts(self.first), (1, 0))
+        self.assertEqual(self.counts(self.second), (0, 0))
+
+
+class IngestTests(TestCase):
+    """Массовая загрузка: пачки, счётчики и индекс после загрузки, повторная загрузка тех же слагов"""
+
+    def setUp(self):
+        cache.clear()
+        self.backend = search.get_search_backend()
+        self.backend.rebuild()
+        self.rows = [
+            {'title': f'Запуск ракеты {i}', 'content': 'Ракета стартовала', 'category': 'Наука',
+             'tags': ['космос', 'ракеты'] if i % 2 else ['космос'], 'slug': f'zapusk-{i}'}
+            for i in range(5)
+        ]
+
+    def test_batches_and_counters(self):
+        with CaptureQueriesContext(connection) as queries:
+            result = Article.all_objects.bulk_ingest(self.rows, batch_size=2)
+        self.assertEqual((result.created, result.skipped), (5, 0))
+        inserts = [q['sql'] for q in queries if q['sql'].startswith('INSERT INTO "Articles"')]
+        self.assertEqual(len(inserts), 3)
+
+        category = Category.objects.get(name='Наука')
+        self.assertEqual(category.articles_count, 5)
+        self.assertEqual(dict(Tag.objects.values_list('name', 'articles_count')), {'космос': 5, 'ракеты': 2})
+        self.assertEqual(len(self.backend.rank('ракеты')), 5)
+        self.assertEqual(sum(ArticleMonth.objects.values_list('articles_count', flat=True)), 5)
+
+    def test_duplicate_slugs(self):
+        Article.all_objects.bulk_ingest(self.rows[:3], batch_size=2)
+        # повторный запуск с теми же слагами и повтор слага внутри одной пачки
+        rows = self.rows + [dict(self.rows[4], title='Дубль')]
+        result = Article.all_objects.bulk_ingest(rows, batch_size=10)
+        self.assertEqual((result.created, result.skipped), (2, 4))
+        self.assertEqual(Article.all_objects.count(), 5)
+        self.assertEqual(Article.all_objects.get(slug='zapusk-4').title, 'Запуск ракеты 4')
+        self.assertEqual(Category.objects.get(name='Наука').articles_count, 5)
+
+    def test_generated_slugs(self):
+        rows = [{'title': 'Одинаковый заголовок', 'content': 'Текст', 'category': 'Наука'} for _ in range(3)]
+        self.assertEqual(Article.all_objects.bulk_ingest(rows).created, 3)
+        slugs = list(Article.all_objects.values_list('slug', flat=True))
+        self.assertEqual(len(set(slugs)), 3)
+        self.assertTrue(all(slug.startswith('odinakovyi-zagolovok-') for slug in slugs))
+
+    def test_generated_slug_clashes(self):
+        Article.all_objects.bulk_ingest([{'title': 'Занят', 'content': 'Текст', 'category': 'Наука', 'slug': 'zanyat'}])
+        rows = [{'title': 'Новая', 'content': 'Текст', 'category': 'Наука'} for _ in range(2)]
+        # первый слаг уже есть в базе, затем второй статье выпадает слаг первой
+        with mock.patch('news.ingest.generate_slug', side_effect=['zanyat', 'novaya-1', 'novaya-1', 'novaya-2']):
+            self.assertEqual(Article.all_objects.bulk_ingest(rows).created, 2)
+        self.assertEqual(set(Article.all_objects.values_list('slug', flat=True)), {'zanyat', 'novaya-1', 'novaya-2'})
+
+
+class ExportTests(TestCase):
+    """Потоковая выгрузка: ответ StreamingHttpResponse, корректные JSON Lines и CSV, запросы по порциям"""
+
+    def setUp(self):
+        category = Category.objects.create(name='Наука')
+        tags = [Tag.objects.create(name='космос'), Tag.objects.create(name='ракеты')]
+        for i in range(7):
+            article = Article.objects.create(
+                title=f'Статья {i}', content='Текст, с запятой и "кавычками"\nи переносом', category=category,
+                is_active=i != 6,
+            )
+            article.tags.add(*tags[:i % 3])
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+    def get(self, query):
+        response = self.client.get(f'/news/export/?{query}')
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return b''.join(response.streaming_content).decode()
+
+    def test_jsonl(self):
+        rows = [json.loads(line) for line in self.get('format=jsonl&is_active=1').splitlines()]
+        self.assertEqual([row['title'] for row in rows], [f'Статья {i}' for i in range(6)])
+        self.assertEqual(rows[2]['tags'], ['космос', 'ракеты'])
+        self.assertEqual(rows[0]['content'], 'Текст, с запятой и "кавычками"\nи переносом')
+
+    def test_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self.get('format=csv'))))
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[1]['tags'], 'космос')
+        self.assertEqual(rows[6]['is_active'], 'False')
+        self.assertEqual(rows[0]['content'], 'Текст, с запятой и "кавычками"\nи переносом')
+        self.assertEqual(self.client.get('/news/export/?format=xml').status_code, 400)
+
+    def test_queries_per_chunk(self):
+        # запрос статей читается порциями, теги каждой порции — одним запросом
+        for chunk_size, chunks in ((2, 4), (7, 1)):
+            with self.subTest(chunk_size=chunk_size), self.assertNumQueries(1 + chunks):
+                lines = list(export.export_lines(export.filter_articles(), 'jsonl', chunk_size=chunk_size))
+            self.assertEqual(len(lines), 7)
+
+
+class AsyncViewsTests(TestCase):
+    """
+    Асинхронные представления через AsyncClient отдают тот же контекст, что и синхронные,
+    и не трогают синхронный ORM в event loop на холодных кэшах (навигация, поисковый индекс, просмотры).
+    URL-адреса подключают представления при импорте по NEWS_ASYNC_VIEWS, поэтому здесь они подменяются на async.
+    """
+    VISITOR_IP = '10.2.2.2'
+
+    def setUp(self):
+        category = Category.objects.create(name='Наука')
+        tag = Tag.objects.create(name='космос')
+        self.articles = []
+        for i in range(3):
+            article = Article.objects.create(title=f'Ракета {i}', content='Ракета стартовала', category=category)
+            article.tags.add(tag)
+            self.articles.append(article)
+        Favorite.objects.create(article=self.articles[1], ip_address=self.VISITOR_IP)
+
+    @staticmethod
+    def cold_caches():
+        cache.clear()
+        navigation.invalidate()
+        # поисковый индекс построится из БД при первом поиске
+        search._backend = None
+
+    @contextmanager
+    def async_urls(self):
+        with ExitStack() as stack:
+            for pattern in news_urls.urlpatterns:
+                async_view = getattr(async_views, pattern.callback.__name__, None)
+                if async_view is not None:
+                    stack.enter_context(mock.patch.object(pattern, 'callback', async_view))
+            yield
+
+    def summary(self, response):
+        self.assertEqual(response.status_code, 200)
+        context = response.context
+        news = context.get('news') or [context['article']]
+        return {
+            'keys': {key for key in ('news', 'article', 'query', 'news_count', 'related_articles', 'visitor_state',
+                                     'categories_with_count', 'tag_cloud') if key in context},
+            'ids': [article.pk for article in news],
+            'favorited': sorted(context['visitor_state'].favorited_ids),
+            'news_count': context.get('news_count'),
+        }
+
+    async def test_same_context_as_sync(self):
+        article = self.articles[0]
+        # у AsyncClient адрес посетителя задаётся в ASGI scope, а не в META
+        visitor = AsyncClient(client=[self.VISITOR_IP, 0])
+        for url in ('/news/catalog/', f'/news/catalog/{article.pk}/', f'/news/catalog/{article.slug}/',
+                    '/news/search_news?q=ракеты', '/news/favorites/'):
+            with self.subTest(url=url):
+                await sync_to_async(self.cold_caches)()
+                expected = self.summary(await sync_to_async(self.client.get)(url, REMOTE_ADDR=self.VISITOR_IP))
+                await sync_to_async(self.cold_caches)()
+                with self.async_urls():
+                    response = await visitor.get(url)
+                    self.assertTrue(iscoroutinefunction(response.resolver_match.func))
+                self.assertEqual(self.summary(response), expected)
+
+    async def test_views_counted(self):
+        await sync_to_async(self.cold_caches)()
+        with self.async_urls():
+            response = await self.async_client.get(f'/news/catalog/{self.articles[0].pk}/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual((await self.async_client.get('/news/catalog/0/')).status_code, 404)
+        await sync_to_async(view_counter.flush_views)()
+        article = await Article.objects.aget(pk=self.articles[0].pk)
+        self.assertEqual(article.views, 1)
+
+
+@override_settings(NEWS_NAVIGATION_TIMEOUT=60)
+class NavigationCacheTests(TestCase):
+    """Навигация в памяти процесса сбрасывается при изменении категорий и тегов, иначе живёт до таймаута"""
+
+    def setUp(self):
+        navigation.invalidate()
+        self.category = Category.objects.create(name='Наука')
+        article = Article.objects.create(title='Статья', content='Текст', category=self.category)
+        self.tag = Tag.objects.create(name='космос')
+        article.tags.add(self.tag)
+
+    @staticmethod
+    def names():
+        data = navigation.get_navigation()
+        return ([item['category'].name for item in data['categories_with_count']],
+                [item['tag'].name for item in data['tag_cloud']])
+
+    def test_invalidated_by_changes(self):
+        self.assertEqual(self.names(), (['Наука'], ['космос']))
+        with self.assertNumQueries(0):
+            self.names()
+
+        Category.objects.create(name='Город')
+        self.assertEqual(self.names()[0], ['Город', 'Наука'])
+        tag = Tag.objects.get(pk=self.tag.pk)
+        tag.name = 'астрономия'
+        tag.save()
+        self.assertEqual(self.names()[1], ['астрономия'])
+        self.category.delete()
+        self.assertEqual(self.names(), (['Город'], []))
+
+    def test_stale_until_timeout(self):
+        self.names()
+        # так изменение выглядит для воркера, в котором purge не вызывался
+        Category.objects.filter(pk=self.category.pk).update(name='Космос')
+        self.assertEqual(self.names()[0], ['Наука'])
+        with mock.patch('time.monotonic', return_value=time.monotonic() + 61):
+            self.assertEqual(self.names()[0], ['Космос'])
+
+
+class ArticleCardCacheTests(TestCase):
+    """Карточки статей в списках берутся из кэша фрагментов и сбрасываются при изменении статьи, тега и категории"""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Наука')
+        self.tag = Tag.objects.create(name='космос')
+        self.article = Article.objects.create(title='Запуск ракеты', content='Текст', category=self.category)
+        self.article.tags.add(self.tag)
+
+    def render_card(self):
+        article = Article.objects.select_related('category').prefetch_related('tags').get(pk=self.article.pk)
+        [(_, card)] = fragment_cache.render_cards([article])
+        return card
+
+    def test_card_invalidation(self):
+        self.assertIn('Запуск ракеты', self.render_card())
+        with self.assertNumQueries(2):
+            # статья и её теги; карточка берётся из кэша
+            self.render_card()
+
+        self.tag.name = 'астрономия'
+        self.tag.save()
+        self.assertIn('астрономия', self.render_card())
+
+        self.category.name = 'Космонавтика'
+        self.category.save()
+        self.assertIn('Космонавтика', self.render_card())
+
+        self.article.title = 'Посадка ракеты'
+        self.article.save()
+        self.assertIn('Посадка ракеты', self.render_card())
+
+        self.article.tags.remove(self.tag)
+        self.assertNotIn('астрономия', self.render_card())
+
+    def test_catalog_uses_cards(self):
+        response = self.client.get('/news/catalog/', REMOTE_ADDR='192.0.2.10')
+        self.assertContains(response, 'Запуск ракеты')
+        self.assertContains(response, 'Просмотры: 0')
+
+
+class TagCloudTests(TestCase):
+    """Счётчики облака тегов сходятся с таблицей связей после любых изменений тегов и активности статей"""
+
+    def assertCountsConsistent(self):
+        expected = {tag.pk: 0 for tag in Tag.objects.all()}
+        for tag_id in Article.tags.through.objects.filter(article__is_active=True).values_list('tag_id', flat=True):
+            expected[tag_id] += 1
+        self.assertEqual(dict(Tag.objects.values_list('pk', 'articles_count')), expected)
+
+    def test_counts_follow_changes(self):
+        category = Category.objects.create(name='Наука')
+        space, cats = Tag.objects.create(name='космос'), Tag.objects.create(name='кошки')
+        first = Article.objects.create(title='Первая', content='Текст', category=category)
+        second = Article.objects.create(title='Вторая', content='Текст', category=category)
+        first.tags.add(space, cats)
+        second.tags.add(space)
+        self.assertCountsConsistent()
+
+        first.tags.remove(cats)
+        cats.article.add(second)
+        self.assertCountsConsistent()
+
+        second.is_active = False
+        second.save()
+        self.assertCountsConsistent()
+
+        first.tags.clear()
+        second.delete()
+        self.assertCountsConsistent()
+
+    def test_cloud_on_listing(self):
+        category = Category.objects.create(name='Наука')
+        tags = [Tag.objects.create(name=f'тег {i}') for i in range(3)]
+        for i in range(6):
+            article = Article.objects.create(title=f'Статья {i}', content='Текст', category=category)
+            article.tags.add(*tags[:i % 3 + 1])
+        cache.clear()
+        response = self.client.get('/news/catalog/', REMOTE_ADDR='192.0.2.10')
+        cloud = {item['tag'].name: item for item in response.context['tag_cloud']}
+        self.assertEqual(cloud['тег 0']['count'], 6)
+        self.assertEqual(cloud['тег 2']['count'], 2)
+        self.assertGreater(cloud['тег 0']['weight'], cloud['тег 2']['weight'])
+        self.assertContains(response, 'tag-cloud-5')
+
+
+class ApiTests(TestCase):
+    """JSON API: проекция полей, курсорная пагинация, условные запросы и сброс кэша ответов"""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Наука')
+        tag = Tag.objects.create(name='космос')
+        now = timezone.now()
+        self.articles = []
+        for i in range(5):
+            article = Article.objects.create(title=f'Статья {i}', content='Полный текст ' * 50, category=category)
+            Article.all_objects.filter(pk=article.pk).update(publication_date=now - timedelta(hours=i))
+            article.tags.add(tag)
+            self.articles.append(article)
+
+    def test_feed_pagination_and_fields(self):
+        response = self.client.get('/news/api/articles/?limit=2&fields=id,title,tags')
+        data = response.json()
+        self.assertEqual([item['id'] for item in data['results']], [self.articles[0].pk, self.articles[1].pk])
+        self.assertEqual(set(data['results'][0]), {'id', 'title', 'tags'})
+        self.assertEqual(data['results'][0]['tags'], [{'id': self.articles[0].tags.get().pk, 'name': 'космос'}])
+
+        ids = []
+        url = '/news/api/articles/?limit=2&fields=id'
+        while url:
+            data = self.client.get(url).json()
+            ids += [item['id'] for item in data['results']]
+            url = data['next']
+        self.assertEqual(ids, [article.pk for article in self.articles])
+
+        self.assertEqual(self.client.get('/news/api/articles/?fields=id,secret').status_code, 400)
+        self.assertEqual(self.client.get('/news/api/categories/999/articles/').status_code, 404)
+
+    def test_content_only_on_request(self):
+        with self.assertNumQueries(2) as queries:
+            item = self.client.get('/news/api/articles/?limit=1').json()['results'][0]
+        self.assertNotIn('content', item)
+        self.assertLessEqual(len(item['excerpt']), 200)
+        # колонка content встречается в запросе только внутри SUBSTR для excerpt
+        self.assertEqual(queries.captured_queries[0]['sql'].count('"Articles"."content"'), 1)
+        detail = self.client.get(f'/news/api/articles/{self.articles[0].pk}/').json()
+        self.assertEqual(detail['content'], self.articles[0].content)
+
+    def test_conditional_get_and_invalidation(self):
+        url = f'/news/api/articles/{self.articles[0].pk}/?fields=id,title'
+        response = self.client.get(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+        self.articles[0].title = 'Новый заголовок'
+        self.articles[0].save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title'], 'Новый заголовок')
+
+    def test_admin_actions_invalidate(self):
+        article = self.articles[0]
+        url = f'/news/api/articles/{article.pk}/'
+        etag = self.client.get(url)['ETag']
+        updated_at = Article.objects.get(pk=article.pk).updated_at
+        self.assertIn(article.pk, [item['id'] for item in self.client.get('/news/api/articles/').json()['results']])
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+        self.client.post('/admin/news/article/', {'action': 'make_inactive', '_selected_action': [article.pk]})
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertNotIn(article.pk, [item['id'] for item in self.client.get('/news/api/articles/').json()['results']])
+
+        self.client.post('/admin/news/article/', {'action': 'make_active', '_selected_action': [article.pk]})
+        self.assertGreater(Article.objects.get(pk=article.pk).updated_at, updated_at)
+        # updated_at сдвинулся, поэтому старый ETag больше не подходит
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class DetailConditionalGetTests(TestCase):
+    """Детальная страница отвечает 304 на повторный визит, пока статья не изменилась"""
+
+    def setUp(self):
+        cache.clear()
+        self.article = Article.objects.create(
+            title='Статья', content='Текст', category=Category.objects.create(name='Наука'),
+        )
+        self.url = f'/news/catalog/{self.article.pk}/'
+
+    def test_not_modified_until_article_changes(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertIn('private', response['Cache-Control'])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        slug_url = f'/news/catalog/{self.article.slug}/'
+        self.assertEqual(self.client.get(slug_url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        self.client.post(f'/news/like_toggle/{self.article.pk}')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get(self.url)['ETag']
+        self.article.tags.add(Tag.objects.create(name='космос'))
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_views_counted_on_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        for _ in range(3):
+            self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        call_command('flush_view_counts', stdout=StringIO())
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.views, 4)
+
+    def test_fixtures_without_updated_at(self):
+        for fixture in ('articles_3.json', 'articles_4.json'):
+            with self.subTest(fixture=fixture):
+                call_command('loaddata', os.path.join(settings.BASE_DIR, fixture), stdout=StringIO())
+                self.assertFalse(Article.all_objects.filter(updated_at__isnull=True).exists())
+
+
+class TrendingTests(TestCase):
+    """Рейтинг «в тренде»: недавняя активность важнее старой, пересчёт затрагивает только изменившиеся статьи"""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Наука')
+        now = timezone.now()
+        self.viral = Article.objects.create(
+            title='Старая вирусная', content='Текст', category=category,
+            publication_date=now - timedelta(days=30), views=1000,
+        )
+        self.fresh = Article.objects.create(title='Свежая', content='Текст', category=category, views=20)
+        self.quiet = Article.objects.create(title='Без просмотров', content='Текст', category=category)
+
+    def trending_ids(self):
+        paginator = KeysetPaginator(Article.objects.all(), 'trending', 'desc')
+        return [article.pk for article in paginator._ordered()]
+
+    def test_recent_activity_wins(self):
+        self.assertEqual(refresh_trending(), 2)
+        self.assertEqual(self.trending_ids(), [self.fresh.pk, self.viral.pk])
+        # без новой активности пересчитывать нечего
+        self.assertEqual(refresh_trending(), 0)
+
+        # всплеск активности у старой статьи возвращает её наверх
+        Article.objects.filter(pk=self.viral.pk).update(views=1100, like_count=5)
+        self.assertEqual(refresh_trending(), 1)
+        self.assertEqual(self.trending_ids(), [self.viral.pk, self.fresh.pk])
+
+    def test_trending_page(self):
+        refresh_trending()
+        response = self.client.get('/news/catalog/?sort=trending')
+        self.assertEqual([article.pk for article in response.context['news']], [self.fresh.pk, self.viral.pk])
+
+        # закэшированная страница сбрасывается после пересчёта
+        Article.objects.filter(pk=self.quiet.pk).update(favorite_count=10)
+        refresh_trending()
+        response = self.client.get('/news/catalog/?sort=trending')
+        self.assertEqual(response.context['news'][0].pk, self.quiet.pk)
+
+
+class RelatedArticlesTests(TestCase):
+    """Похожие статьи по тегам и тексту: полный пересчёт и обновление после сохранения статьи"""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Наука')
+        self.space = Tag.objects.create(name='космос')
+        self.food = Tag.objects.create(name='кулинария')
+        self.launch = self.create('Запуск ракеты к Марсу', 'Ракета стартовала к Марсу с космодрома.', self.space, category)
+        self.rover = self.create('Марсоход прислал снимки', 'Снимки поверхности Марса от марсохода.', self.space, category)
+        self.pie = self.create('Рецепт яблочного пирога', 'Тесто, яблоки и корица для пирога.', self.food, category)
+
+    @staticmethod
+    def create(title, content, tag, category):
+        article = Article.objects.create(title=title, content=content, category=category)
+        article.tags.add(tag)
+        return article
+
+    def related_ids(self, article):
+        return [item['related_id'] for item in related.related_articles(article.pk)]
+
+    def test_build(self):
+        self.assertEqual(related.build_related(), 2)
+        self.assertEqual(self.related_ids(self.launch), [self.rover.pk])
+        self.assertEqual(self.related_ids(self.pie), [])
+
+        response = self.client.get(f'/news/catalog/{self.launch.pk}/')
+        self.assertContains(response, 'Похожие новости')
+        self.assertContains(response, 'Марсоход прислал снимки')
+
+    def test_updated_on_save(self):
+        related.build_related()
+        with self.captureOnCommitCallbacks(execute=True):
+            landing = self.create('Посадка ракеты на Марс', 'Ракета села на Марс.', self.space, self.launch.category)
+        self.assertEqual(self.related_ids(landing)[0], self.launch.pk)
+        self.assertIn(landing.pk, self.related_ids(self.launch))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            landing.is_active = False
+            landing.save()
+        self.assertNotIn(landing.pk, self.related_ids(self.launch))
+        self.assertFalse(RelatedArticle.objects.filter(article=landing).exists())
+
+    def test_updated_by_admin_actions(self):
+        related.build_related()
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/admin/news/article/', {'action': 'make_inactive', '_selected_action': [self.rover.pk]})
+        self.assertNotIn(self.rover.pk, self.related_ids(self.launch))
+        self.assertFalse(RelatedArticle.objects.filter(article=self.rover).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/admin/news/article/', {'action': 'make_active', '_selected_action': [self.rover.pk]})
+        self.assertEqual(self.related_ids(self.launch), [self.rover.pk])
+
+    def test_not_updated_without_relevant_changes(self):
+        # свежий экземпляр: пересчёт, запланированный при создании в setUp, в тесте не выполнялся
+        launch = Article.objects.get(pk=self.launch.pk)
+        with mock.patch.object(related, 'update_related') as update, self.captureOnCommitCallbacks(execute=True):
+            launch.status = True
+            launch.save()
+            launch.save(update_fields=['views'])
+        update.assert_not_called()
+
+        with mock.patch.object(related, 'update_related') as update, self.captureOnCommitCallbacks(execute=True):
+            launch.content = 'Ракета стартовала к Марсу.'
+            launch.save()
+        update.assert_called_once_with(launch.pk)
+
+    @override_settings(NEWS_RELATED_UPDATE_ON_SAVE=False)
+    def test_update_on_save_disabled(self):
+        launch = Article.objects.get(pk=self.launch.pk)
+        with mock.patch.object(related, 'update_related') as update, self.captureOnCommitCallbacks(execute=True):
+            launch.title = 'Запуск ракеты'
+            launch.save()
+            launch.tags.add(self.food)
+        update.assert_not_called()
+
+
+class ReactionToggleTests(TestCase):
+    def setUp(self):
+        self.article = Article.objects.create(
+            title='Статья', content='Текст', category=Category.objects.create(name='Наука'),
+        )
+        self.like_url = f'/news/like_toggle/{self.article.pk}'
+        self.favorite_url = f'/news/favorite/{self.article.pk}/'
+
+    def test_json_toggle(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.like_url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json(), {'article_id': self.article.pk, 'liked': True, 'like_count': 1})
+        # статья не загружается: меняется только счётчик, а читается он уже после переключения
+        article_selects = [q['sql'] for q in queries if q['sql'].startswith('SELECT') and 'FROM "Articles"' in q['sql']]
+        self.assertEqual(len(article_selects), 1)
+        self.assertIn('"Articles"."like_count"', article_selects[0])
+
+        response = self.client.post(self.like_url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json(), {'article_id': self.article.pk, 'liked': False, 'like_count': 0})
+
+        response = self.client.post(self.favorite_url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json(), {'article_id': self.article.pk, 'favorited': True, 'favorite_count': 1})
+        self.assertEqual(Favorite.objects.count(), 1)
+
+    def test_form_submit_redirects(self):
+        self.assertRedirects(self.client.post(self.like_url), '/news/catalog/', fetch_redirect_response=False)
+        self.assertEqual(self.client.get(self.like_url).status_code, 405)
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.like_count, Like.objects.count())
+
+    def test_inactive_article(self):
+        Article.all_objects.filter(pk=self.article.pk).update(is_active=False)
+        self.assertEqual(self.client.post(self.like_url, HTTP_ACCEPT='application/json').status_code, 404)
+        self.assertEqual(self.client.post('/news/like_toggle/0').status_code, 404)
+        self.assertFalse(Like.objects.exists())
+
+
+class ContentFlagTests(TestCase):
+    """Ключевые слова админки: совпадения при сохранении, загрузке и backfill, фильтр и колонка списка статей"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Природа')
+        self.spiders = Article.objects.create(title='Лес', content='В лесу живут пауки.', category=self.category)
+        self.birds = Article.objects.create(title='Птицы', content='Птицы вьют гнёзда.', category=self.category)
+        # флаг создан миграцией; статьи выше появились до подсчёта совпадений
+        self.flag = ContentFlag.objects.get(keyword=content_flags.SPIDERS_KEYWORD)
+        ArticleFlag.objects.all().delete()
+        self.admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def flagged_ids(self):
+        return set(ArticleFlag.objects.filter(flag=self.flag).values_list('article_id', flat=True))
+
+    def test_backfill_save_and_ingest(self):
+        self.assertEqual(content_flags.backfill(chunk_size=1), 1)
+        self.flag.refresh_from_db()
+        self.assertTrue(self.flag.is_ready)
+        self.assertEqual(self.flagged_ids(), {self.spiders.pk})
+
+        self.birds.content = 'Птицы едят пауки и мух.'
+        self.birds.save()
+        self.spiders.content = 'В лесу тихо.'
+        self.spiders.save()
+        self.assertEqual(self.flagged_ids(), {self.birds.pk})
+
+        Article.all_objects.bulk_ingest([{'title': 'Сад', 'content': 'Садовые пауки', 'category': 'Природа'}])
+        self.assertEqual(len(self.flagged_ids()), 2)
+
+    def test_admin_changelist(self):
+        self.client.force_login(self.admin)
+        # пока совпадения не посчитаны, фильтр ищет слово в тексте
+        response = self.client.get('/admin/news/article/?has_spiders=yes')
+        self.assertEqual([a.pk for a in response.context['cl'].result_list], [self.spiders.pk])
+
+        content_flags.backfill()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/news/article/?has_spiders=no')
+        self.assertEqual([a.pk for a in response.context['cl'].result_list], [self.birds.pk])
+        self.assertContains(response, 'Пауки внутри')
+        self.assertFalse([q['sql'] for q in queries if 'LIKE' in q['sql'] and '"content"' in q['sql']])
+
+        response = self.client.get(f'/admin/news/article/?content_flag={self.flag.pk}')
+        self.assertEqual([a.pk for a in response.context['cl'].result_list], [self.spiders.pk])
+
+
+@override_settings(NEWS_ADMIN_LARGE_TABLE_ROWS=1, NEWS_ADMIN_COUNT_LIMIT=10)
+class LargeChangelistTests(TestCase):
+    """Список статей в админке в режиме большой таблицы: курсор, оценка количества, месяцы, поиск"""
+
+    def setUp(self):
+        start = timezone.now().replace(year=2025, month=3, day=20, hour=12)
+        rows = [
+            {'title': f'Новость {number}', 'content': 'Обычный текст', 'category': 'Город',
+             'publication_date': start + timedelta(days=number)}
+            for number in range(24)
+        ]
+        rows.append({'title': 'Марсоход', 'content': 'Марсоход прислал снимки', 'category': 'Наука',
+                     'publication_date': start})
+        Article.all_objects.bulk_ingest(rows)
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+    def months(self):
+        return dict(ArticleMonth.objects.values_list('month', 'articles_count'))
+
+    def test_months(self):
+        self.assertEqual(self.months(), {date(2025, 3, 1): 13, date(2025, 4, 1): 12})
+        article = Article.objects.create(title='Май', content='Текст', category=Category.objects.first(),
+                                         publication_date=timezone.now().replace(year=2025, month=5, day=2))
+        Article.all_objects.filter(title='Новость 0').delete()
+        self.assertEqual(self.months(), {date(2025, 3, 1): 12, date(2025, 4, 1): 12, date(2025, 5, 1): 1})
+        article.delete()
+        months = self.months()
+        self.assertEqual(large_changelist.rebuild_months(), 2)
+        self.assertEqual(self.months(), {month: count for month, count in months.items() if count})
+
+    def test_months_not_below_zero(self):
+        # статьи из loaddata (raw) в ArticleMonths не учтены
+        ArticleMonth.objects.filter(month=date(2025, 4, 1)).update(articles_count=0)
+        Article.all_objects.filter(title='Новость 23').delete()
+        self.assertEqual(self.months(), {date(2025, 3, 1): 13, date(2025, 4, 1): 0})
+
+    def test_keyset_pages(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/news/article/')
+        cl = response.context['cl']
+        self.assertEqual([a.title for a in cl.result_list][:2], ['Новость 23', 'Новость 22'])
+        self.assertEqual(cl.result_count_label, 'больше 10')
+        # ни одного COUNT(*) по всей таблице и ни одного DISTINCT по датам
+        self.assertFalse([q['sql'] for q in queries if 'COUNT(*)' in q['sql'] and 'LIMIT' not in q['sql']
+                          and '"Articles"' in q['sql']])
+        self.assertFalse([q['sql'] for q in queries if 'DISTINCT' in q['sql']])
+        self.assertContains(response, 'Март 2025')
+
+        response = self.client.get(f'/admin/news/article/?{cl.keyset_page.next_query}')
+        cl = response.context['cl']
+        self.assertEqual([a.title for a in cl.result_list], ['Новость 3', 'Новость 2', 'Новость 1', 'Марсоход', 'Новость 0'])
+        self.assertFalse(cl.keyset_page.has_next())
+        self.assertNotIn('after', cl.get_query_string())
+
+        response = self.client.get('/admin/news/article/?q=марсоход')
+        self.assertEqual([a.title for a in response.context['cl'].result_list], ['Марсоход'])
+        self.assertEqual(response.context['cl'].result_count_label, '1')
+
+
+@override_settings(NEWS_DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(TransactionTestCase):
+    """
+    Маршрутизатор реплик на двух базах: основная — тестовая default, реплика — отдельный файл SQLite,
+    в который данные попадают только явно, поэтому «отставание» реплики видно в ответах.
+    TransactionTestCase, потому что внутри transaction.atomic (а TestCase держит default в нём)
+    маршрутизатор читает только из основной базы. Реплики нет в настройках, с которыми стартует
+    тестовый раннер, поэтому она добавляется в setUpClass и только тогда разрешается в databases.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        replica = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': os.path.join(cls.directory.name, 'replica.sqlite3')}
+        connections.settings['replica'] = connections.configure_settings(
+            {'default': connections.settings['default'], 'replica': replica}
+        )['replica']
+        cls.databases = {'default', 'replica'}
+        call_command('migrate', database='replica', verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        cls.directory.cleanup()
+        cls.databases = {'default'}
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        navigation.invalidate()
+        db_router._unavailable_until.clear()
+        category = Category.objects.create(name='Наука')
+        self.article = Article.objects.create(title='Статья', content='Текст из основной базы', category=category)
+        self.url = f'/news/catalog/{self.article.pk}/'
+        # на реплику ещё не доехало последнее изменение текста
+        Category.objects.using('replica').bulk_create([Category(pk=category.pk, name='Наука')])
+        Article.all_objects.using('replica').bulk_create([Article(
+            pk=self.article.pk, title='Статья', slug=self.article.slug, content='Текст с реплики',
+            category_id=category.pk, publication_date=self.article.publication_date,
+            updated_at=self.article.updated_at,
+        )])
+
+    def test_read_your_writes(self):
+        self.assertContains(self.client.get(self.url), 'Текст с реплики')
+
+        response = self.client.post(f'/news/like_toggle/{self.article.pk}')
+        self.assertIn(db_router.STICKY_COOKIE, response.cookies)
+        self.assertTrue(Like.objects.filter(article=self.article).exists())
+        # после записи браузер читает из основной базы
+        self.assertContains(self.client.get(self.url), 'Текст из основной базы')
+
+        self.client.cookies.pop(db_router.STICKY_COOKIE)
+        self.assertContains(self.client.get(self.url), 'Текст с реплики')
+
+    def test_outside_requests_use_primary(self):
+        self.assertEqual(Article.objects.get(pk=self.article.pk).content, 'Текст из основной базы')
+
+    def test_fallback_to_primary(self):
+        with mock.patch.object(connections['replica'], 'ensure_connection', side_effect=OperationalError('down')), \
+                self.assertLogs('news.db_router', 'WARNING'):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Текст из основной базы')
+        # реплика исключена на NEWS_REPLICA_RETRY_INTERVAL секунд и не проверяется на каждом запросе
+        self.assertIn('replica', db_router._unavailable_until)
+        self.assertContains(self.client.get(self.url), 'Текст из основной базы')
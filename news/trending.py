@@ -0,0 +1,117 @@
+"""
+Рейтинг «в тренде»: просмотры, лайки и избранное с экспоненциальным затуханием.
+
+Каждая единица активности весит NEWS_TRENDING_WEIGHTS и теряет половину веса за
+NEWS_TRENDING_HALF_LIFE_HOURS часов, поэтому старые популярные статьи со временем уступают место новым.
+У лайков и избранного нет времени создания, поэтому новой активностью считается прирост счётчиков
+статьи с прошлого пересчёта (ArticleTrend.*_seen); для статьи, которая попадает в рейтинг впервые,
+накопленная активность относится к дате публикации.
+
+Хранится не сам рейтинг, а логарифм суммы весов, умноженных на 2 ** (часы с TRENDING_EPOCH / период
+полураспада). У всех статей этот множитель со временем растёт одинаково, поэтому порядок строк по score
+совпадает с порядком текущих рейтингов: refresh_trending обновляет только статьи с новой активностью,
+а страница ?sort=trending читает таблицу ArticleTrends по индексу (score, article_id).
+"""
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import page_cache
+from .models import Article, ArticleTrend
+from .view_counter import flush_views
+
+TRENDING_SORT = 'trending'
+# точка отсчёта для score; менять её нельзя — сохранённые значения станут несравнимы с новыми
+TRENDING_EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+BATCH_SIZE = 500
+
+
+def _get_half_life_hours():
+    return getattr(settings, 'NEWS_TRENDING_HALF_LIFE_HOURS', 24)
+
+
+def _get_weights():
+    return {'views': 1, 'likes': 10, 'favorites': 20, **getattr(settings, 'NEWS_TRENDING_WEIGHTS', {})}
+
+
+def _log_weight(points, when):
+    """Логарифм веса активности points, случившейся в момент when"""
+    hours = (when - TRENDING_EPOCH).total_seconds() / 3600
+    return math.log(points) + hours / _get_half_life_hours() * math.log(2)
+
+
+def _log_add(a, b):
+    """log(exp(a) + exp(b)) без переполнения"""
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def with_trending_score(queryset):
+    """Статьи из рейтинга с его значением в поле trending — для сортировки ?sort=trending"""
+    return queryset.filter(trend__isnull=False).annotate(trending=F('trend__score'))
+
+
+def depends_on_sort(request, sort):
+    """Закэшированная страница с сортировкой по рейтингу сбрасывается после каждого пересчёта"""
+    if sort == TRENDING_SORT:
+        page_cache.depends_on(request, TRENDING_SORT)
+
+
+def refresh_trending(now=None):
+    """
+    Добавляет в ArticleTrends активность, накопившуюся с прошлого запуска.
+    Читает только статьи, у которых вырос хотя бы один счётчик, и записывает их одним upsert на пачку.
+    Возвращает количество обновлённых статей.
+    """
+    now = now or timezone.now()
+    # просмотры из буфера, иначе они попадут в рейтинг только при следующем запуске
+    flush_views()
+    weights = _get_weights()
+    changed = (
+        Article.objects
+        .filter(
+            Q(trend__isnull=True) & (Q(views__gt=0) | Q(like_count__gt=0) | Q(favorite_count__gt=0))
+            | Q(views__gt=F('trend__views_seen')) | Q(like_count__gt=F('trend__likes_seen'))
+            | Q(favorite_count__gt=F('trend__favorites_seen'))
+        )
+        .values_list('pk', 'publication_date', 'views', 'like_count', 'favorite_count',
+                     'trend__score', 'trend__views_seen', 'trend__likes_seen', 'trend__favorites_seen')
+    )
+
+    trends = []
+    for pk, published, views, likes, favorites, score, views_seen, likes_seen, favorites_seen in changed.iterator():
+        if score is None:
+            # статья впервые попала в рейтинг: вся её активность считается случившейся при публикации
+            when, views_seen, likes_seen, favorites_seen = min(published, now), 0, 0, 0
+        else:
+            when = now
+        points = (
+            weights['views'] * max(views - views_seen, 0)
+            + weights['likes'] * max(likes - likes_seen, 0)
+            + weights['favorites'] * max(favorites - favorites_seen, 0)
+        )
+        if points > 0:
+            score = _log_add(score, _log_weight(points, when))
+        if score is None:
+            # активность только с нулевым весом (см. NEWS_TRENDING_WEIGHTS)
+            continue
+        trends.append(ArticleTrend(
+            article_id=pk, score=score,
+            # снятый лайк не уменьшает рейтинг, а повторный лайк не засчитывается дважды
+            views_seen=max(views, views_seen), likes_seen=max(likes, likes_seen),
+            favorites_seen=max(favorites, favorites_seen),
+        ))
+
+    for start in range(0, len(trends), BATCH_SIZE):
+        ArticleTrend.objects.bulk_create(
+            trends[start:start + BATCH_SIZE], update_conflicts=True, unique_fields=['article'],
+            update_fields=['score', 'views_seen', 'likes_seen', 'favorites_seen'],
+        )
+    if trends:
+        page_cache.purge(TRENDING_SORT)
+    return len(trends)
@@ -1,19 +1,30 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, views
+
+# под ASGI читающие страницы обслуживают асинхронные версии представлений (см. news/async_views.py)
+read_views = async_views if getattr(settings, 'NEWS_ASYNC_VIEWS', False) else views
 
 
 app_name = 'news'
 
 # будет иметь префикс в urlах /news/
 urlpatterns = [
-    path('catalog/', views.get_all_news, name='catalog'),
-    path('catalog/<int:article_id>/', views.get_detail_article_by_id, name='detail_article_by_id'),
-    path('catalog/<slug:title>/', views.get_detail_article_by_title, name='detail_article_by_title'),
+    path('catalog/', read_views.get_all_news, name='catalog'),
+    path('catalog/<int:article_id>/', read_views.get_detail_article_by_id, name='detail_article_by_id'),
+    path('catalog/<slug:title>/', read_views.get_detail_article_by_title, name='detail_article_by_title'),
     path('articles_by_tag/<int:tag_id>', views.get_articles_by_tag, name='article_by_tag' ),
     path('articles_by_category/<int:category_id>', views.get_articles_by_category, name='article_by_category'),
-    path("search_news", views.search_news, name="search_news"),
+    path("search_news", read_views.search_news, name="search_news"),
     path("like_toggle/<int:article_id>", views.like_toggle, name="like_toggle"),
     path('favorite/<int:article_id>/', views.toggle_favorite, name='toggle_favorite'),
-    path('favorites/', views.favorites, name='favorites'),
+    path('favorites/', read_views.favorites, name='favorites'),
     path('add/', views.add_article, name='add_article'),
+    path('export/', views.export_articles, name='export_articles'),
+    # JSON API только для чтения (news/api.py)
+    path('api/articles/', api.article_list, name='api_articles'),
+    path('api/articles/<int:article_id>/', api.article_detail, name='api_article'),
+    path('api/categories/<int:category_id>/articles/', api.category_articles, name='api_category_articles'),
+    path('api/tags/<int:tag_id>/articles/', api.tag_articles, name='api_tag_articles'),
+    path('api/search/', api.search, name='api_search'),
 ]
@@ -0,0 +1,125 @@
+"""
+Отложенный (write-behind) счётчик просмотров статей.
+
+Вместо UPDATE на каждый просмотр инкременты копятся в кэше Django, а раз в
+VIEW_COUNTER_FLUSH_INTERVAL секунд записываются в Article.views одним UPDATE.
+
+Буфер разбит на поколения: при сбросе номер поколения увеличивается, новые
+просмотры пишутся уже в следующее поколение, а старое целиком переносится в БД.
+Поэтому при падении кэша теряется не больше одного интервала просмотров.
+
+Ключи буфера хранятся без срока жизни: после долгой паузы без просмотров они
+дождутся следующего сброса (первого просмотра после паузы или команды
+flush_view_counts), а не истекут вместе с накопленными просмотрами.
+
+Просмотр, который прочитал номер поколения до сброса, может дописаться в уже
+закрытое поколение после того, как сброс прочитал его буфер. Поэтому сброс
+не удаляет только что закрытое поколение, а вычитает из его счётчиков
+перенесённое в БД; остаток и сами ключи забирает следующий сброс, когда
+поколение закрыто уже целый интервал.
+
+Чтобы команда flush_view_counts видела просмотры всех воркеров, кэш
+VIEW_COUNTER_CACHE должен быть общим (memcached, redis, файловый и т.д.);
+с LocMemCache у каждого процесса свой буфер, поэтому manage.py check --deploy
+предупреждает о нём (news/checks.py).
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Case, F, Value, When
+
+from .models import Article
+
+KEY_PREFIX = 'news:views'
+# сколько статей обновлять одним UPDATE, чтобы не упереться в лимит параметров запроса
+FLUSH_BATCH_SIZE = 500
+
+
+def _get_cache():
+    return caches[getattr(settings, 'VIEW_COUNTER_CACHE', 'default')]
+
+
+def _get_flush_interval():
+    return getattr(settings, 'VIEW_COUNTER_FLUSH_INTERVAL', 30)
+
+
+def _current_generation(cache):
+    cache.add(f'{KEY_PREFIX}:generation', 1, timeout=None)
+    return cache.get(f'{KEY_PREFIX}:generation', 1)
+
+
+def _buffer_view(cache, generation, article_id):
+    count_key = f'{KEY_PREFIX}:{generation}:count:{article_id}'
+    if not cache.add(count_key, 1, timeout=None):
+        cache.incr(count_key)
+        return
+    # первый просмотр статьи в этом поколении: запоминаем её id в списке слотов
+    slots_key = f'{KEY_PREFIX}:{generation}:slots'
+    cache.add(slots_key, 0, timeout=None)
+    slot = cache.incr(slots_key)
+    cache.set(f'{KEY_PREFIX}:{generation}:slot:{slot}', article_id, timeout=None)
+
+
+def register_view(article_id):
+    """
+    Учитывает один просмотр статьи в буфере.
+    Если с прошлого сброса прошло больше интервала, заодно сбрасывает буфер в БД.
+    """
+    cache = _get_cache()
+    generation = _current_generation(cache)
+    try:
+        _buffer_view(cache, generation, article_id)
+    except ValueError:
+        # incr() не нашёл ключ: параллельный сброс только что удалил это поколение,
+        # поэтому просмотр записывается уже в следующее
+        _buffer_view(cache, _current_generation(cache), article_id)
+
+    # add() атомарен, поэтому сбрасывать буфер будет только один запрос за интервал
+    if cache.add(f'{KEY_PREFIX}:flush_lock', 1, timeout=_get_flush_interval()):
+        flush_views()
+
+
+def _read_generation(cache, generation):
+    """Буфер поколения: ({ключ счётчика: (id статьи, просмотров)}, все ключи поколения)"""
+    slots_key = f'{KEY_PREFIX}:{generation}:slots'
+    slots_count = cache.get(slots_key, 0)
+    slot_keys = [f'{KEY_PREFIX}:{generation}:slot:{slot}' for slot in range(1, slots_count + 1)]
+    article_ids = list(cache.get_many(slot_keys).values())
+    count_keys = {f'{KEY_PREFIX}:{generation}:count:{article_id}': article_id for article_id in article_ids}
+    counts = {key: (count_keys[key], count) for key, count in cache.get_many(count_keys).items() if count}
+    return counts, [slots_key, *slot_keys, *count_keys]
+
+
+def flush_views():
+    """
+    Переносит накопленные просмотры в Article.views.
+    Возвращает количество обновлённых статей.
+    """
+    cache = _get_cache()
+    generation = _current_generation(cache)
+    # все новые просмотры с этого момента попадут в следующее поколение
+    try:
+        cache.incr(f'{KEY_PREFIX}:generation')
+    except ValueError:
+        cache.set(f'{KEY_PREFIX}:generation', generation + 1, timeout=None)
+
+    closed, _ = _read_generation(cache, generation)
+    # поколение, закрытое прошлым сбросом: просмотры, опоздавшие к нему, и его ключи
+    previous, previous_keys = _read_generation(cache, generation - 1)
+    pending = {}
+    for article_id, count in [*closed.values(), *previous.values()]:
+        pending[article_id] = pending.get(article_id, 0) + count
+
+    updated = 0
+    pending_items = list(pending.items())
+    for start in range(0, len(pending_items), FLUSH_BATCH_SIZE):
+        batch = pending_items[start:start + FLUSH_BATCH_SIZE]
+        increment = Case(*[When(pk=article_id, then=Value(count)) for article_id, count in batch], default=Value(0))
+        updated += Article.all_objects.filter(pk__in=[article_id for article_id, _ in batch]).update(
+            views=F('views') + increment
+        )
+
+    # decr, а не delete: просмотры, дописанные после чтения, останутся до следующего сброса
+    for key, (_, count) in closed.items():
+        cache.decr(key, count)
+    cache.delete_many(previous_keys)
+    return updated
@@ -1,79 +1,42 @@
-from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
-from django.http import HttpResponse, HttpResponseRedirect
-from django.shortcuts import render, get_object_or_404, redirect
-from django.db.models import F, Q
+from datetime import date
 
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import (
+    Http404, HttpResponse, HttpResponseRedirect, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse,
+)
+from django.shortcuts import render, get_object_or_404, redirect
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.views.decorators.http import require_POST
+
+from .conditional import is_conditional, not_modified, set_validators
+from .export import CONTENT_TYPES, FORMATS, export_lines, filter_articles
 from .forms import ArticleForm
 from .models import Article, Tag, Category, Like, Favorite
+from .page_cache import cache_page_with_tags, depends_on, depends_on_articles, mark_visitor_state_changed
+from .pagination import KeysetPaginator, get_sort_params, paginate_by_number
+from .related import related_articles
+from .search import get_search_backend
+from .trending import depends_on_sort
+from .view_counter import register_view
+from .visitor_state import VisitorState
 
-"""
-Информация в шаблоны будет браться из базы данных
-Но пока, мы сделаем переменные, куда будем записывать информацию, которая пойдет в 
-контекст шаблона
-"""
-# Пример данных для новостей
 
-def get_categories_with_news_count():
-    """
-    Возвращает список категорий с количеством новостей в каждой категории.
-    """
-    categories = Category.objects.all()
-    categories_with_count = []
-    for category in categories:
-        news_count = Article.objects.filter(category=category).count()
-        categories_with_count.append({
-            'category': category,
-            'news_count': news_count,
-        })
-    return categories_with_count
-info = {
-    "users_count": 5,
-    "news_count": 10,
-    "categories" : Category.objects.all(),
-    "menu": [
-        {"title": "Главная",
-         "url": "/",
-         "url_name": "index"},
-        {"title": "О проекте",
-         "url": "/about/",
-         "url_name": "about"},
-        {"title": "Каталог",
-         "url": "/news/catalog/",
-         "url_name": "news:catalog"},
-        {"title": "Избранное",
-         "url": "/news/favorites/",
-         "url_name": "news:favorites"},
-    ],
-}
-
-# def get_categories_with_news_count():
-#     """
-#     Возвращает список категорий с количеством новостей в каждой категории.
-#     """
-#     categories = Category.objects.all()
-#     categories_with_count = []
-#     for category in categories:
-#         news_count = Article.objects.filter(category=category).count()
-#         categories_with_count.append({
-#             'category': category,
-#             'news_count': news_count,
-#         })
-#     return categories_with_count
+@cache_page_with_tags('sidebar')
 def main(request):
     """
     Представление рендерит шаблон main.html
     """
-    categories_with_count = get_categories_with_news_count()
-    context = {**info, 'categories_with_count': categories_with_count}
-    return render(request, 'main.html', context=context)
+    return render(request, 'main.html')
    
 
 
+@cache_page_with_tags('sidebar')
 def about(request):
     """Представление рендерит шаблон about.html"""
-    categories_with_count = get_categories_with_news_count()
-    context = {**info, 'categories_with_count': categories_with_count }
-    return render(request, 'about.html', context=context)
+    return render(request, 'about.html')
 
 
 def catalog(request):
@@ -105,50 +68,32 @@ def get_category_by_name(request, slug):
     return HttpResponse(f"Категория {slug}")
 
 
+@cache_page_with_tags('catalog', 'sidebar')
 def get_all_news(request):
     """Функция для отображения страницы "Каталог"
     будет возвращать рендер шаблона /templates/news/catalog.html
-    - **`sort`** - ключ для указания типа сортировки с возможными значениями: `publication_date`, `views`.
+    - **`sort`** - ключ для указания типа сортировки с возможными значениями: `publication_date`, `views`, `like_count`, `trending`.
     - **`order`** - опциональный ключ для указания направления сортировки с возможными значениями: `asc`, `desc`. По умолчанию `desc`.
     1. Сортировка по дате добавления в убывающем порядке (по умолчанию): `/news/catalog/`
     2. Сортировка по количеству просмотров в убывающем порядке: `/news/catalog/?sort=views`
     3. Сортировка по количеству просмотров в возрастающем порядке: `/news/catalog/?sort=views&order=asc`
     4. Сортировка по дате добавления в возрастающем порядке: `/news/catalog/?sort=publication_date&order=asc`
+    5. Сортировка по популярности (количеству лайков) в убывающем порядке: `/news/catalog/?sort=like_count`
+    6. Статьи «в тренде» (недавняя активность, см. news/trending.py): `/news/catalog/?sort=trending`
     """
 
-    # считаем параметры из GET-запроса
-    sort = request.GET.get('sort', 'publication_date')  # по умолчанию сортируем по дате загрузки
-    order = request.GET.get('order', 'desc')  # по умолчанию сортируем по убыванию
-
-    # Проверяем дали ли мы разрешение на сортировку по этому полю
-    valid_sort_fields = {'publication_date', 'views'}
-    if sort not in valid_sort_fields:
-        sort = 'publication_date'
-
-    # Обрабатываем направление сортировки
-    if order == 'asc':
-        order_by = sort
-    else:
-        order_by = f'-{sort}'
-
-    articles = Article.objects.select_related('category').prefetch_related('tags').order_by(order_by)
+    # считаем и проверяем параметры из GET-запроса
+    sort, order = get_sort_params(request)
+    depends_on_sort(request, sort)
 
+    articles = Article.objects.select_related('category').prefetch_related('tags')
+    # курсорная пагинация: ссылки на соседние страницы не зависят от глубины, COUNT(*) не нужен
+    paginated_news = KeysetPaginator(articles, sort, order).get_page(request)
+    depends_on_articles(request, paginated_news)
 
-    paginator = Paginator(articles, 15)
-    page = request.GET.get('page')
-    paginated_news = paginator.page(paginator.num_pages)
-    try:
-        paginated_news = paginator.page(page)
-    except PageNotAnInteger:
-        # Если параметр page не является числом, выводим первую страницу
-        paginated_news = paginator.page(1)
-    except EmptyPage:
-        # Если страница выходит за пределы доступных, выводим последнюю
-        paginated_news = paginator.page(paginator.num_pages)
-    categories_with_count = get_categories_with_news_count()
-    context = {**info,
-               'news': paginated_news,
-               'news_count': len(articles),
+    # news_count (все активные статьи) приходит из контекстного процессора навигации
+    context = {'news': paginated_news,
+               'visitor_state': VisitorState.load(request.META.get('REMOTE_ADDR'), paginated_news),
                'user_ip': request.META.get('REMOTE_ADDR'),
 
                    }
@@ -160,63 +105,73 @@ def get_detail_article_by_id(request, article_id):
     """
     Возвращает детальную информацию по новости для представления
     """
-    Article.objects.filter(pk=article_id).update(views=F('views') + 1)
+    if is_conditional(request):
+        # повторный визит: 304 после одного индексного запроса, просмотр всё равно учитывается
+        response = not_modified(request, id=article_id)
+        if response is not None:
+            register_view(article_id)
+            return response
     article = get_object_or_404(Article, id=article_id)
+    # просмотр попадает в буфер и будет записан в БД при ближайшем сбросе
+    register_view(article.pk)
 
-    context = {**info, 'article': article, 'user_ip': request.META.get('REMOTE_ADDR'),}
+    context = {'article': article,
+               'related_articles': related_articles(article.pk),
+               'visitor_state': VisitorState.load(request.META.get('REMOTE_ADDR'), [article]),
+               'user_ip': request.META.get('REMOTE_ADDR'),}
 
-    return render(request, 'news/article_detail.html', context=context)
+    response = render(request, 'news/article_detail.html', context=context)
+    return set_validators(response, article.pk, article.updated_at)
 
 
 def get_detail_article_by_title(request, title):
     """
     Возвращает детальную информацию по новости для представления
     """
+    if is_conditional(request):
+        response = not_modified(request, slug=title)
+        if response is not None:
+            return response
 
     article = get_object_or_404(Article, slug=title)
 
-    context = {**info, 'article': article, 'user_ip': request.META.get('REMOTE_ADDR'),}
+    context = {'article': article,
+               'related_articles': related_articles(article.pk),
+               'visitor_state': VisitorState.load(request.META.get('REMOTE_ADDR'), [article]),
+               'user_ip': request.META.get('REMOTE_ADDR'),}
 
-    return render(request, 'news/article_detail.html', context=context)
+    response = render(request, 'news/article_detail.html', context=context)
+    return set_validators(response, article.pk, article.updated_at)
 
 
+@cache_page_with_tags('sidebar')
 def get_articles_by_tag(request, tag_id):
-
+    depends_on(request, f'tag:{tag_id}')
     tag = get_object_or_404(Tag, id=tag_id)
-    articles = Article.objects.filter(tags=tag)
-    context = {**info, 'news': articles, 'news_count': len(articles), 'user_ip': request.META.get('REMOTE_ADDR'),}
-    paginator = Paginator(articles, 15)
-    page = request.GET.get('page')
-
-    try:
-        paginated_news = paginator.page(page)
-    except PageNotAnInteger:
-        # Если параметр page не является числом, выводим первую страницу
-        paginated_news = paginator.page(1)
-    except EmptyPage:
-        # Если страница выходит за пределы доступных, выводим последнюю
-        paginated_news = paginator.page(paginator.num_pages)
+    sort, order = get_sort_params(request)
+    depends_on_sort(request, sort)
+    articles = Article.objects.filter(tags=tag).select_related('category').prefetch_related('tags')
+    paginated_news = KeysetPaginator(articles, sort, order).get_page(request)
+    depends_on_articles(request, paginated_news)
+    context = {'news': paginated_news, 'news_count': tag.articles_count,
+               'visitor_state': VisitorState.load(request.META.get('REMOTE_ADDR'), paginated_news),
+               'user_ip': request.META.get('REMOTE_ADDR'),}
     return render(request, 'news/catalog.html', context=context)
 
 
+@cache_page_with_tags('sidebar')
 def get_articles_by_category(request, category_id):
+    depends_on(request, f'category:{category_id}')
     category = get_object_or_404(Category, id=category_id)
-    articles = Article.objects.filter(category=category)
-    paginator = Paginator(articles, 15)
-    page = request.GET.get('page')
-
-    try:
-        paginated_news = paginator.page(page)
-    except PageNotAnInteger:
-        # Если параметр page не является числом, выводим первую страницу
-        paginated_news = paginator.page(1)
-    except EmptyPage:
-        # Если страница выходит за пределы доступных, выводим последнюю
-        paginated_news = paginator.page(paginator.num_pages)
-    context = {**info,
-               'news': paginated_news,
-               'news_count': len(articles),
+    sort, order = get_sort_params(request)
+    depends_on_sort(request, sort)
+    articles = Article.objects.filter(category=category).select_related('category').prefetch_related('tags')
+    paginated_news = KeysetPaginator(articles, sort, order).get_page(request)
+    depends_on_articles(request, paginated_news)
+    context = {'news': paginated_news,
+               'news_count': category.articles_count,
                'current_category': category,
+               'visitor_state': VisitorState.load(request.META.get('REMOTE_ADDR'), paginated_news),
                'user_ip': request.META.get('REMOTE_ADDR'),
 
                }
@@ -224,57 +179,84 @@ def get_articles_by_category(request, category_id):
 
 def search_news(request):
     query = request.GET.get('q')
-    articles = Article.objects.all()
+    articles = Article.objects.select_related('category').prefetch_related('tags')
 
     if query:
-        # Создаем сложный запрос с использованием Q для поиска в title и content
-        articles = articles.filter(
-            Q(title__icontains=query) |  # Поиск в заголовке (без учета регистра)
-            Q(content__icontains=query)  # Поиск в содержимом (без учета регистра)
-        ).distinct()
-    paginator = Paginator(articles, 15)
-    page = request.GET.get('page')
-
-    try:
-        paginated_news = paginator.page(page)
-    except PageNotAnInteger:
-        # Если параметр page не является числом, выводим первую страницу
-        paginated_news = paginator.page(1)
-    except EmptyPage:
-        # Если страница выходит за пределы доступных, выводим последнюю
-        paginated_news = paginator.page(paginator.num_pages)
+        # Полнотекстовый поиск со стеммингом, результаты отсортированы по релевантности
+        articles = get_search_backend().search(articles, query)
+    else:
+        articles = articles.order_by('-publication_date', '-id')
+    # у релевантности нет ключа для курсора, поэтому листаем по номеру страницы, но без COUNT(*)
+    paginated_news = paginate_by_number(request, articles)
     context = {
         'news': paginated_news,
         'query': query,
+        'visitor_state': VisitorState.load(request.META.get('REMOTE_ADDR'), paginated_news),
         'user_ip': request.META.get('REMOTE_ADDR'),
     }
     return render(request, 'news/catalog.html', context=context)
 
-def like_toggle(request, article_id):
-    article = get_object_or_404(Article, id=article_id)
-    ip_address = request.META.get('REMOTE_ADDR')
-    if Like.objects.filter(article_id=article_id, ip_address=ip_address).exists():
-        Like.objects.filter(article_id=article_id, ip_address=ip_address).delete()
-    else:
-        Like.objects.create(article_id=article_id, ip_address=ip_address)
+def _wants_json(request):
+    # fetch со страниц шлёт Accept: application/json, обычная отправка формы — text/html
+    return request.accepts('application/json') and not request.accepts('text/html')
 
 
+def _toggle_reaction(model, counter, article_id, ip_address):
+    """
+    Переключает лайк или избранное посетителя и счётчик статьи в одной транзакции, не загружая статью:
+    DELETE отметки, при её отсутствии — INSERT, затем UPDATE счётчика. Возвращает True, если отметка поставлена.
+    Одновременные клики упираются в уникальность (article, ip_address): повторная вставка не проходит
+    и счётчик не увеличивается дважды. Если активной статьи нет, UPDATE не находит строку и всё откатывается.
+    """
+    with transaction.atomic():
+        deleted, _ = model.objects.filter(article_id=article_id, ip_address=ip_address).delete()
+        if deleted:
+            delta = Greatest(F(counter) - 1, 0)
+        else:
+            try:
+                with transaction.atomic():
+                    model.objects.create(article_id=article_id, ip_address=ip_address)
+                delta = F(counter) + 1
+            except IntegrityError:
+                # отметку только что поставил параллельный запрос этого же посетителя
+                delta = F(counter)
+        # updated_at — чтобы браузер не показал из своего кэша страницу со старой отметкой (news/conditional.py)
+        if not Article.objects.filter(pk=article_id).update(**{counter: delta}, updated_at=timezone.now()):
+            raise Http404('Статья не найдена')
+    # у посетителя появились (или пропали) отметки — его страницы больше нельзя брать из общего кэша
+    mark_visitor_state_changed(ip_address)
+    return not deleted
+
+
+def _reaction_response(article_id, state_field, active, counter):
+    count = Article.all_objects.filter(pk=article_id).values_list(counter, flat=True).get()
+    return JsonResponse({'article_id': article_id, state_field: active, counter: count})
+
+
+@require_POST
+def like_toggle(request, article_id):
+    """Лайк/снятие лайка; на запрос с Accept: application/json отвечает {"liked": ..., "like_count": ...}"""
+    liked = _toggle_reaction(Like, 'like_count', article_id, request.META.get('REMOTE_ADDR'))
+    if _wants_json(request):
+        return _reaction_response(article_id, 'liked', liked, 'like_count')
     return redirect("news:catalog")
 
 
 def favorites(request):
     ip_address = request.META.get('REMOTE_ADDR')
-    favorite_articles = Article.objects.filter(favorites__ip_address=ip_address)
-    context = {**info, 'articles': favorite_articles, 'news_count': len(favorite_articles), 'page_obj': favorite_articles, 'user_ip': request.META.get('REMOTE_ADDR'), }
+    favorite_articles = Article.objects.filter(favorites__ip_address=ip_address).select_related('category').prefetch_related('tags')
+    context = {'news': favorite_articles, 'news_count': len(favorite_articles),
+               'visitor_state': VisitorState.load(ip_address, favorite_articles),
+               'user_ip': request.META.get('REMOTE_ADDR'), }
     return render(request, 'news/catalog.html', context=context)
 
 
+@require_POST
 def toggle_favorite(request, article_id):
-    article = get_object_or_404(Article, pk=article_id)
-    ip_address = request.META.get('REMOTE_ADDR')
-    favorite, created = Favorite.objects.get_or_create(article=article, ip_address=ip_address)
-    if not created:
-        favorite.delete()
+    """Избранное; на запрос с Accept: application/json отвечает {"favorited": ..., "favorite_count": ...}"""
+    favorited = _toggle_reaction(Favorite, 'favorite_count', article_id, request.META.get('REMOTE_ADDR'))
+    if _wants_json(request):
+        return _reaction_response(article_id, 'favorited', favorited, 'favorite_count')
     return redirect('news:detail_article_by_id', article_id=article_id)
 
 
@@ -295,6 +277,32 @@ def add_article(request):
     else:
         form = ArticleForm()
 
-    context = {'form': form, 'menu': info['menu']}
+    context = {'form': form}
 
     return render(request, 'news/add_article.html', context=context)
+
+
+@staff_member_required
+def export_articles(request):
+    """
+    Потоковая выгрузка статей: ?format=jsonl|csv&category=<id>&date_from=YYYY-MM-DD&date_to=YYYY-MM-DD&is_active=1|0
+    Ответ отдаётся по мере чтения из БД, поэтому размер таблицы не влияет на память процесса.
+    """
+    export_format = request.GET.get('format', 'jsonl')
+    if export_format not in FORMATS:
+        return HttpResponseBadRequest('Неизвестный формат выгрузки')
+    try:
+        category_id = int(request.GET['category']) if request.GET.get('category') else None
+        date_from = date.fromisoformat(request.GET['date_from']) if request.GET.get('date_from') else None
+        date_to = date.fromisoformat(request.GET['date_to']) if request.GET.get('date_to') else None
+    except ValueError:
+        return HttpResponseBadRequest('Неверный параметр фильтра')
+    is_active = {'1': True, '0': False}.get(request.GET.get('is_active'))
+
+    queryset = filter_articles(category_id=category_id, date_from=date_from, date_to=date_to, is_active=is_active)
+    response = StreamingHttpResponse(
+        export_lines(queryset, export_format),
+        content_type=f'{CONTENT_TYPES[export_format]}; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="articles.{export_format}"'
+    return response
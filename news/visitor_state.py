@@ -0,0 +1,42 @@
+from .models import Like, Favorite
+
+
+class VisitorState:
+    """
+    Лайки и избранное текущего посетителя (по IP) для статей на странице.
+    Загружается один раз на запрос — по одному запросу на лайки и на избранное,
+    после чего фильтры has_liked/has_favorited только проверяют вхождение во множество.
+    """
+
+    def __init__(self, liked_ids=(), favorited_ids=()):
+        self.liked_ids = set(liked_ids)
+        self.favorited_ids = set(favorited_ids)
+
+    @classmethod
+    def load(cls, ip_address, articles):
+        article_ids = [article.pk for article in articles]
+        if not ip_address or not article_ids:
+            return cls()
+        liked_ids = Like.objects.filter(ip_address=ip_address, article_id__in=article_ids) \
+            .values_list('article_id', flat=True)
+        favorited_ids = Favorite.objects.filter(ip_address=ip_address, article_id__in=article_ids) \
+            .values_list('article_id', flat=True)
+        return cls(liked_ids, favorited_ids)
+
+    @classmethod
+    async def aload(cls, ip_address, articles):
+        """Асинхронный вариант load для async views"""
+        article_ids = [article.pk for article in articles]
+        if not ip_address or not article_ids:
+            return cls()
+        liked_ids = Like.objects.filter(ip_address=ip_address, article_id__in=article_ids) \
+            .values_list('article_id', flat=True)
+        favorited_ids = Favorite.objects.filter(ip_address=ip_address, article_id__in=article_ids) \
+            .values_list('article_id', flat=True)
+        return cls([pk async for pk in liked_ids], [pk async for pk in favorited_ids])
+
+    def has_liked(self, article):
+        return article.pk in self.liked_ids
+
+    def has_favorited(self, article):
+        return article.pk in self.favorited_ids